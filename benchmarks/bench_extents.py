@@ -0,0 +1,68 @@
+"""外包矩形计算基准测试
+
+对比 ezdxf.bbox.extents 与 dxf_extents.fast_extents（exact / hull 两种模式）
+在 data/ 目录下示例文件上的耗时。
+
+用法：
+    python benchmarks/bench_extents.py [DXF文件 ...] [--repeat N]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ezdxf
+from ezdxf import bbox
+
+from dxf_extents import fast_extents
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def best_time(func, repeat):
+    """多次运行取最短耗时（秒）"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="外包矩形计算基准测试")
+    parser.add_argument("files", nargs="*", help="DXF文件（默认使用 data/ 下的示例文件）")
+    parser.add_argument("--repeat", type=int, default=5, help="每种方式的重复次数")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(DATA_DIR, '*.dxf')))
+    if not files:
+        print("没有找到DXF文件")
+        return
+
+    print(f"{'文件':<16}{'实体数':>8}{'ezdxf(ms)':>12}{'exact(ms)':>12}{'hull(ms)':>12}"
+          f"{'exact加速':>10}{'hull加速':>10}{'最大偏差':>10}")
+    totals = [0.0, 0.0, 0.0]
+    for file_path in files:
+        msp = ezdxf.readfile(file_path).modelspace()
+        t_ref, ref = best_time(lambda: bbox.extents(msp), args.repeat)
+        t_exact, exact = best_time(lambda: fast_extents(msp, 'exact'), args.repeat)
+        t_hull, _ = best_time(lambda: fast_extents(msp, 'hull'), args.repeat)
+        deviation = max(abs(a - b) for a, b in zip(
+            (*ref.extmin, *ref.extmax), (*exact.extmin, *exact.extmax)))
+        totals[0] += t_ref
+        totals[1] += t_exact
+        totals[2] += t_hull
+        print(f"{os.path.basename(file_path):<16}{len(msp):>8}{t_ref * 1000:>12.2f}"
+              f"{t_exact * 1000:>12.2f}{t_hull * 1000:>12.2f}"
+              f"{t_ref / t_exact:>9.1f}x{t_ref / t_hull:>9.1f}x{deviation:>10.4f}")
+    print(f"{'合计':<16}{'':>8}{totals[0] * 1000:>12.2f}{totals[1] * 1000:>12.2f}"
+          f"{totals[2] * 1000:>12.2f}{totals[0] / totals[1]:>9.1f}x{totals[0] / totals[2]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
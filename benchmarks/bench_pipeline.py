@@ -0,0 +1,151 @@
+"""完整流程基准测试
+
+用 synthetic.py 生成的合成零件，分别统计处理流程各阶段的耗时：
+read_dxf_files、calculate_bounding_boxes、pack_rectangles、create_merged_dxf、
+DXFRenderer.render_placements_to_image 和 DXFRenderer.render_final_result_with_annotations
+（matplotlib 和 raster 两种后端），以及 DXFRenderer.render_layout_preview（缩略图拼贴，冷/热缓存）。
+结果写入JSON文件，便于在不同版本之间比较。
+
+零件数大于文件数时，零件按数量平均分配给各文件（见 read_dxf_files 的 quantities）。
+
+用法：
+    python benchmarks/bench_pipeline.py [--parts 10,100,1000,10000] [--files N]
+        [--entities N] [--spline-ratio R] [--text-ratio R] [--algorithm grid]
+        [--output-mode flatten] [--no-render] [--repeat N] [--json 结果.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import ezdxf
+import numpy as np
+
+from dxf_processor import DXFProcessor
+from dxf_renderer import DXFRenderer
+from synthetic import generate_parts, split_quantities
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'dxf_merge_bench')
+
+
+def run_pipeline(paths, quantities, args, work_dir):
+    """执行一次完整流程，返回 (各阶段耗时（秒）, 附加信息)"""
+    timings = {}
+    processor = DXFProcessor()
+
+    def timed(stage, func, *func_args, **kwargs):
+        start = time.perf_counter()
+        result = func(*func_args, **kwargs)
+        timings[stage] = time.perf_counter() - start
+        return result
+
+    if not timed('read_dxf_files', processor.read_dxf_files, paths,
+                 workers=args.workers, quantities=quantities):
+        raise RuntimeError(f"读取DXF文件失败: {processor.load_errors}")
+    if not timed('calculate_bounding_boxes', processor.calculate_bounding_boxes,
+                 extents_mode=args.extents):
+        raise RuntimeError("计算外包矩形失败")
+    placements = timed('pack_rectangles', processor.pack_rectangles,
+                       args.container, args.container, args.gap,
+                       multi_sheet=True, algorithm=args.algorithm)
+
+    output_path = os.path.join(work_dir, 'merged.dxf')
+    if not timed('create_merged_dxf', processor.create_merged_dxf, placements, output_path,
+                 args.container, args.container, output_mode=args.output_mode):
+        raise RuntimeError("创建合并文件失败")
+
+    if args.render:
+        timed('render_placements_to_image', DXFRenderer.render_placements_to_image,
+              placements, args.container, args.container,
+              os.path.join(work_dir, 'placement_preview.png'))
+        result_doc = ezdxf.readfile(output_path)
+        timed('render_final_result_with_annotations', DXFRenderer.render_final_result_with_annotations,
+              result_doc, placements, os.path.join(work_dir, 'annotated_result_preview.png'))
+        timed('render_final_result_with_annotations_raster', DXFRenderer.render_final_result_with_annotations,
+              result_doc, placements, os.path.join(work_dir, 'annotated_result_preview_raster.png'),
+              backend='raster')
+        # 缩略图拼贴：第一次渲染并缓存各图形，第二次（相当于重新排样后）全部命中缓存
+        DXFRenderer.get_thumbnail_cache().clear()
+        for stage in ('render_layout_preview_cold', 'render_layout_preview_warm'):
+            timed(stage, DXFRenderer.render_layout_preview, placements, args.container, args.container,
+                  os.path.join(work_dir, 'annotated_result_preview_thumbnails.png'))
+
+    info = {
+        'sheets': len({p.get('sheet', 0) for p in placements}),
+        'placements': len(placements),
+        'output_bytes': os.path.getsize(output_path),
+    }
+    return timings, info
+
+
+def main():
+    parser = argparse.ArgumentParser(description="完整流程基准测试")
+    parser.add_argument("--parts", default="10,100,1000",
+                        help="逗号分隔的零件数列表（例如 10,100,1000,10000）")
+    parser.add_argument("--files", type=int, default=100,
+                        help="不同零件文件数的上限，零件数更多时按数量重复使用")
+    parser.add_argument("--entities", type=int, default=200, help="每个零件文件的实体数")
+    parser.add_argument("--spline-ratio", type=float, default=0.1, help="样条曲线所占比例")
+    parser.add_argument("--text-ratio", type=float, default=0.05, help="文字所占比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--container", type=float, default=300.0, help="容器边长（mm）")
+    parser.add_argument("--gap", type=float, default=2.0, help="图形间隙（mm）")
+    parser.add_argument("--algorithm", default="grid", help="排样算法")
+    parser.add_argument("--extents", default="ezdxf", help="外包矩形计算方式")
+    parser.add_argument("--output-mode", default="flatten", help="合并文件输出方式")
+    parser.add_argument("--workers", type=int, default=None, help="读取文件的进程数")
+    parser.add_argument("--no-render", dest="render", action="store_false", help="不统计预览图渲染")
+    parser.add_argument("--repeat", type=int, default=1, help="每个规模的重复次数（取最短耗时）")
+    parser.add_argument("--json", default="bench_pipeline.json", help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    data_dir = os.path.join(CACHE_DIR, f"e{args.entities}_s{args.spline_ratio}"
+                                       f"_t{args.text_ratio}_seed{args.seed}")
+    runs = []
+    for parts in [int(value) for value in args.parts.split(',')]:
+        files = min(parts, args.files)
+        paths = generate_parts(data_dir, files, args.entities, args.spline_ratio,
+                               args.text_ratio, args.seed)
+        quantities = split_quantities(parts, files)
+
+        best = {}
+        info = {}
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as work_dir:
+                timings, info = run_pipeline(paths, quantities, args, work_dir)
+            for stage, seconds in timings.items():
+                best[stage] = min(best.get(stage, float('inf')), seconds)
+
+        run = {'parts': parts, 'files': files, 'entities_per_file': args.entities,
+               'stages': best, 'total': sum(best.values()), **info}
+        runs.append(run)
+        print(f"\n零件数 {parts}（{files} 个文件）:")
+        for stage, seconds in best.items():
+            print(f"  {stage:<40}{seconds * 1000:>12.1f} ms")
+        print(f"  {'合计':<40}{run['total'] * 1000:>12.1f} ms")
+
+    result = {
+        'benchmark': 'pipeline',
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'ezdxf': ezdxf.__version__,
+            'numpy': np.__version__,
+        },
+        'config': {key: value for key, value in vars(args).items() if key != 'json'},
+        'runs': runs,
+    }
+    with open(args.json, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
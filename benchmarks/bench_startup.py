@@ -0,0 +1,92 @@
+"""启动耗时基准测试
+
+每次都在新的 Python 进程中测量（冷启动，不受已导入模块的影响）：
+- import main / import gui_app 的导入耗时，以及 -X importtime 报告中累计耗时最高的模块
+- python main.py --help 的总耗时
+- 不生成预览的普通合并（main.py 输入... 输出 --no-preview）的总耗时
+结果写入JSON文件，便于在不同版本之间比较导入开销。
+
+用法：
+    python benchmarks/bench_startup.py [--repeat N] [--top N] [--json 结果.json]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+
+
+def wall_time(command, repeat):
+    """在新进程中多次运行命令，返回耗时中位数（秒）"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def import_report(module, top):
+    """用 -X importtime 导入模块，返回 (模块自身的累计导入耗时(秒), 累计耗时最高的若干模块)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    # 每行格式："import time: 自身耗时(us) | 累计耗时(us) | 缩进的模块名"，缩进表示导入层级
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), depth, int(cumulative) / 1e6))
+    total = next((seconds for name, depth, seconds in entries if name == module and depth == 0), 0.0)
+    # 只列出被测模块直接或间接导入的前两层，避免子模块重复计入
+    heaviest = sorted((entry for entry in entries if 1 <= entry[1] <= 2), key=lambda entry: entry[2], reverse=True)
+    return total, [{'module': name, 'seconds': seconds} for name, _, seconds in heaviest[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测量的重复次数（取中位数）")
+    parser.add_argument("--top", type=int, default=8, help="列出导入耗时最高的模块数")
+    parser.add_argument("--json", default=None, help="结果保存路径")
+    args = parser.parse_args()
+
+    results = {'python': platform.python_version(), 'platform': platform.platform(), 'imports': {}}
+    for module in ('main', 'gui_app'):
+        try:
+            seconds, heaviest = import_report(module, args.top)
+        except subprocess.CalledProcessError as e:
+            print(f"导入 {module} 失败: {e}")
+            continue
+        results['imports'][module] = {'seconds': seconds, 'heaviest': heaviest}
+        print(f"import {module:<10} {seconds * 1000:8.1f} ms")
+        for item in heaviest:
+            print(f"    {item['module']:<40} {item['seconds'] * 1000:8.1f} ms")
+
+    results['help_seconds'] = wall_time([sys.executable, 'main.py', '--help'], args.repeat)
+    print(f"main.py --help          {results['help_seconds'] * 1000:8.1f} ms")
+
+    inputs = sorted(glob.glob(os.path.join(DATA_DIR, '*.dxf')))
+    if inputs:
+        with tempfile.TemporaryDirectory() as work_dir:
+            output_path = os.path.join(work_dir, 'merged.dxf')
+            results['merge_seconds'] = wall_time([sys.executable, 'main.py'] + inputs +
+                                                 [output_path, '--no-preview'], args.repeat)
+        print(f"合并 {len(inputs)} 个文件（无预览） {results['merge_seconds'] * 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""合成DXF零件生成器
+
+生成尺寸、实体数量和实体类型比例可控的零件DXF文件，供基准测试使用。
+每个零件由一个外轮廓、若干孔（圆）、直线、圆弧、样条曲线和文字组成。
+
+用法：
+    python benchmarks/synthetic.py 输出目录 [--files N] [--entities N]
+                                   [--spline-ratio R] [--text-ratio R] [--seed N]
+"""
+import argparse
+import os
+import random
+from typing import List
+
+import ezdxf
+
+# 零件外轮廓尺寸范围（mm）
+MIN_SIZE = 5.0
+MAX_SIZE = 40.0
+
+
+def generate_part(file_path: str, entities: int = 200, spline_ratio: float = 0.1,
+                  text_ratio: float = 0.05, seed: int = 0):
+    """生成一个零件DXF文件
+
+    entities 为模型空间实体总数（含外轮廓），spline_ratio 和 text_ratio 为样条曲线
+    和文字在其中所占的比例，其余为圆、直线和圆弧。
+    """
+    rng = random.Random(seed)
+    width = rng.uniform(MIN_SIZE, MAX_SIZE)
+    height = rng.uniform(MIN_SIZE, MAX_SIZE)
+    origin_x = rng.uniform(-500.0, 500.0)
+    origin_y = rng.uniform(-500.0, 500.0)
+
+    doc = ezdxf.new('R2010')
+    msp = doc.modelspace()
+    msp.add_lwpolyline([(origin_x, origin_y), (origin_x + width, origin_y),
+                        (origin_x + width, origin_y + height), (origin_x, origin_y + height)],
+                       close=True)
+
+    def point(margin=0.0):
+        return (origin_x + rng.uniform(margin, width - margin),
+                origin_y + rng.uniform(margin, height - margin))
+
+    count = max(entities - 1, 0)
+    splines = int(round(count * spline_ratio))
+    texts = int(round(count * text_ratio))
+    others = max(count - splines - texts, 0)
+    radius_limit = max(min(width, height) / 10.0, 0.2)
+
+    for _ in range(splines):
+        msp.add_spline([(*point(), 0.0) for _ in range(rng.randint(4, 8))])
+    for _ in range(texts):
+        msp.add_text("PART", height=min(width, height) / 20.0).set_placement(point(radius_limit * 2))
+    for i in range(others):
+        kind = i % 3
+        if kind == 0:
+            radius = rng.uniform(0.1, radius_limit)
+            msp.add_circle(point(radius), radius)
+        elif kind == 1:
+            msp.add_line(point(), point())
+        else:
+            radius = rng.uniform(0.1, radius_limit)
+            start = rng.uniform(0.0, 360.0)
+            msp.add_arc(point(radius), radius, start, start + rng.uniform(30.0, 300.0))
+
+    doc.saveas(file_path)
+
+
+def generate_parts(directory: str, files: int, entities: int = 200, spline_ratio: float = 0.1,
+                   text_ratio: float = 0.05, seed: int = 0) -> List[str]:
+    """在目录中生成 files 个零件文件，返回文件路径列表
+
+    已存在的同名文件直接复用，因此不同参数的零件应生成到不同目录。
+    """
+    os.makedirs(directory, exist_ok=True)
+    width = max(len(str(files)), 4)
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"part_{i:0{width}d}.dxf")
+        if not os.path.exists(path):
+            generate_part(path, entities, spline_ratio, text_ratio, seed=seed * 1000003 + i)
+        paths.append(path)
+    return paths
+
+
+def split_quantities(parts: int, files: int) -> List[int]:
+    """把 parts 个零件尽量平均地分配给 files 个文件"""
+    base, extra = divmod(parts, files)
+    return [base + (1 if i < extra else 0) for i in range(files)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成DXF零件生成器")
+    parser.add_argument("directory", help="输出目录")
+    parser.add_argument("--files", type=int, default=10, help="生成的文件数")
+    parser.add_argument("--entities", type=int, default=200, help="每个文件的实体数")
+    parser.add_argument("--spline-ratio", type=float, default=0.1, help="样条曲线所占比例")
+    parser.add_argument("--text-ratio", type=float, default=0.05, help="文字所占比例")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+
+    paths = generate_parts(args.directory, args.files, args.entities,
+                           args.spline_ratio, args.text_ratio, args.seed)
+    total = sum(os.path.getsize(path) for path in paths)
+    print(f"已生成 {len(paths)} 个文件，共 {total / (1024 * 1024):.1f} MB: {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
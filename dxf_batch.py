@@ -0,0 +1,340 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+from dxf_processor import DXFProcessor, _load_dxf_document, _measure_entities
+
+# 清单中没有指定时使用的默认值
+DEFAULT_JOB = {
+    'container': (100.0, 100.0),
+    'gap': 8.0,
+    'algorithm': 'grid',
+    'multi_sheet': False,
+    'sheet_output': 'offset',
+    'output_mode': 'flatten',
+}
+
+# 每个作业进程缓存的已反序列化文档（按文件路径），多个作业共用同一输入时只反序列化一次
+_worker_documents = {}
+
+# 每个作业进程保存的输入文件解析结果（按文件路径），由进程池初始化函数设置，
+# 这样序列化后的文档只向每个进程发送一次，而不是随每个作业发送
+_worker_payloads = {}
+
+
+def split_quantity(arg: str) -> Tuple[str, int]:
+    """解析 文件:数量 形式的输入参数，没有数量后缀时数量为1"""
+    path, sep, count = arg.rpartition(":")
+    if sep and path and count.isdigit() and int(count) > 0:
+        return path, int(count)
+    return arg, 1
+
+
+def _parse_inputs(value) -> List[Tuple[str, int]]:
+    """把清单中的输入列表统一为 [(路径, 数量)]
+
+    JSON 中可以是字符串（可带 :数量 后缀）或 {"path": ..., "quantity": ...}；
+    CSV 中为分号分隔的字符串。
+    """
+    if isinstance(value, str):
+        value = [item.strip() for item in value.split(';') if item.strip()]
+    inputs = []
+    for item in value:
+        if isinstance(item, dict):
+            inputs.append((item['path'], int(item.get('quantity', 1))))
+        else:
+            inputs.append(split_quantity(str(item)))
+    return inputs
+
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return bool(value)
+
+
+def load_manifest(manifest_path: str, defaults: Optional[Dict] = None) -> List[Dict]:
+    """读取作业清单（.json 或 .csv），返回作业列表
+
+    每个作业包含 inputs、output，以及可选的 container/width/height、gap、algorithm、
+    multi_sheet、sheet_output、output_mode 和 name；没有指定的项使用 defaults。
+    清单中的相对路径相对于清单文件所在目录。
+    JSON 清单为作业数组，或 {"jobs": [...]}；CSV 清单每行一个作业，inputs 列用分号分隔多个文件。
+    """
+    base = dict(DEFAULT_JOB, **(defaults or {}))
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    if manifest_path.lower().endswith('.csv'):
+        with open(manifest_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = [{key.strip(): value for key, value in row.items() if key and value not in (None, '')}
+                    for row in csv.DictReader(f)]
+    else:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        rows = data.get('jobs', []) if isinstance(data, dict) else data
+
+    jobs = []
+    for number, row in enumerate(rows, 1):
+        job = dict(base)
+        if 'container' in row:
+            container = row['container']
+            if isinstance(container, str):
+                container = container.lower().replace('x', ',').split(',')
+            job['container'] = (float(container[0]), float(container[1]))
+        if 'width' in row or 'height' in row:
+            job['container'] = (float(row.get('width', job['container'][0])),
+                                float(row.get('height', job['container'][1])))
+        if 'gap' in row:
+            job['gap'] = float(row['gap'])
+        for key in ('algorithm', 'sheet_output', 'output_mode'):
+            if key in row:
+                job[key] = row[key]
+        if 'multi_sheet' in row:
+            job['multi_sheet'] = _parse_bool(row['multi_sheet'])
+        if 'inputs' not in row or 'output' not in row:
+            raise ValueError(f"作业 {number} 缺少 inputs 或 output")
+        job['inputs'] = [(os.path.join(base_dir, path), quantity)
+                         for path, quantity in _parse_inputs(row['inputs'])]
+        job['output'] = os.path.join(base_dir, row['output'])
+        job['name'] = row.get('name') or os.path.basename(job['output'])
+        jobs.append(job)
+    return jobs
+
+
+def _prepare_input(file_path: str, extents_mode: str = 'ezdxf'):
+    """进程池工作函数：解析输入文件并计算外包矩形
+
+    返回 (载荷, 错误信息)，载荷包含序列化后的文档（作业进程反序列化比重新解析快得多）
+    以及外包矩形、实体数量和图层列表。
+    """
+    doc, error = _load_dxf_document(file_path)
+    if doc is None:
+        return None, error
+    try:
+        msp = doc.modelspace()
+        extents = _measure_entities(msp, extents_mode)
+        if not extents.has_data:
+            return None, "没有找到几何实体"
+        return {
+            'doc': pickle.dumps(doc, protocol=pickle.HIGHEST_PROTOCOL),
+            'extmin': tuple(extents.extmin),
+            'extmax': tuple(extents.extmax),
+            'entity_count': len(msp),
+            'layers': sorted({entity.dxf.layer for entity in msp}),
+        }, None
+    except Exception as e:
+        return None, str(e)
+
+
+def _init_worker(payloads: Dict[str, Dict]):
+    """进程池初始化函数：保存全部输入文件的解析结果"""
+    global _worker_payloads
+    _worker_payloads = payloads
+
+
+def _run_job(job: Dict, payloads: Optional[Dict[str, Dict]] = None) -> Dict:
+    """进程池工作函数：执行一个合并作业，返回结果摘要
+
+    payloads 为输入文件的解析结果，None 表示使用 _init_worker 设置的进程内副本。
+    """
+    payloads = _worker_payloads if payloads is None else payloads
+    start = time.perf_counter()
+    result = {'name': job['name'], 'output': job['output'], 'ok': False, 'error': None,
+              'outputs': [], 'parts': sum(quantity for _, quantity in job['inputs']), 'sheets': 0}
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            processor = DXFProcessor()
+            quantities = {}
+            for path, quantity in job['inputs']:
+                quantities[path] = quantities.get(path, 0) + quantity
+            for path, quantity in quantities.items():
+                payload = payloads[path]
+                doc = _worker_documents.get(path)
+                if doc is None:
+                    doc = pickle.loads(payload['doc'])
+                    _worker_documents[path] = doc
+                processor.documents.append({
+                    'doc': doc,
+                    'file_path': path,
+                    'name': os.path.basename(path),
+                    'quantity': quantity,
+                    # 外包矩形已在解析时算好，calculate_bounding_boxes 直接使用
+                    'index_entry': payload,
+                })
+            if not processor.calculate_bounding_boxes():
+                raise RuntimeError("计算外包矩形失败")
+            width, height = job['container']
+            placements = processor.pack_rectangles(width, height, job['gap'],
+                                                   multi_sheet=job['multi_sheet'],
+                                                   algorithm=job['algorithm'])
+            result['sheets'] = len({p.get('sheet', 0) for p in placements})
+            output_dir = os.path.dirname(os.path.abspath(job['output']))
+            os.makedirs(output_dir, exist_ok=True)
+            if not processor.create_merged_dxf(placements, job['output'], width, height,
+                                               sheet_output=job['sheet_output'],
+                                               output_mode=job['output_mode']):
+                raise RuntimeError("创建合并文件失败")
+            result['outputs'] = processor.output_paths
+            result['ok'] = True
+    except Exception as e:
+        lines = log.getvalue().strip().splitlines()
+        result['error'] = f"{e}" + (f"（{lines[-1]}）" if lines else "")
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_manifest(manifest_path: str, workers: Optional[int] = None, defaults: Optional[Dict] = None,
+                 extents_mode: str = 'ezdxf') -> Dict:
+    """执行作业清单中的全部作业，返回汇总信息
+
+    所有作业用到的输入文件先去重，在进程池中各解析一次；
+    之后各作业在进程池中并发执行，共用解析结果（每个作业进程只接收一次）。
+    作业进程出错时该作业记为失败；进程池损坏时尚未完成的解析或作业退回串行执行。
+    返回的 results 按清单中的作业顺序排列。
+    """
+    start = time.perf_counter()
+    jobs = load_manifest(manifest_path, defaults)
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+
+    # 1. 去重后并行解析全部输入文件
+    unique_paths = sorted({path for job in jobs for path, _ in job['inputs']})
+    print(f"共 {len(jobs)} 个作业，{len(unique_paths)} 个不同的输入文件")
+    prepare = partial(_prepare_input, extents_mode=extents_mode)
+    prepared = {}
+    if workers > 1 and len(unique_paths) > 1:
+        executor = None
+        try:
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(unique_paths)))
+            futures = [executor.submit(prepare, path) for path in unique_paths]
+        except Exception as e:
+            print(f"并行解析不可用，改为串行解析: {e}")
+            futures = []
+        serial_paths = [] if futures else list(unique_paths)
+        broken = None
+        for path, future in zip(unique_paths, futures):
+            try:
+                prepared[path] = future.result()
+            except BrokenProcessPool as e:
+                # 解析进程异常退出后进程池不可再用，尚未解析完的文件（其中之一导致了退出）退回串行解析
+                broken = e
+                serial_paths.append(path)
+            except Exception as e:
+                # 解析结果无法在进程间传递等错误：该文件记为读取失败
+                prepared[path] = (None, f"解析进程出错: {e!r}")
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if broken is not None:
+            print(f"解析进程异常退出，以下文件改为串行解析: {', '.join(serial_paths)}（{broken!r}）")
+    else:
+        serial_paths = unique_paths
+    for path in serial_paths:
+        prepared[path] = prepare(path)
+    payloads = {}
+    input_errors = {}
+    for path in unique_paths:
+        payload, error = prepared[path]
+        if payload is None:
+            input_errors[path] = error
+            print(f"读取文件失败 {path}: {error}")
+        else:
+            payloads[path] = payload
+    parse_seconds = time.perf_counter() - start
+
+    # 2. 并发执行作业，输入文件有错误的作业直接记为失败
+    # 结果按作业序号保存，汇总时按清单顺序排列（与完成先后无关）
+    job_results = {}
+    runnable = []
+    for index, job in enumerate(jobs):
+        bad = [path for path, _ in job['inputs'] if path in input_errors]
+        if bad:
+            job_results[index] = _failed_job(job, f"输入文件读取失败: {', '.join(bad)}")
+        else:
+            runnable.append((index, job))
+
+    if workers > 1 and len(runnable) > 1:
+        executor = None
+        try:
+            executor = ProcessPoolExecutor(max_workers=min(workers, len(runnable)),
+                                           initializer=_init_worker, initargs=(payloads,))
+            futures = [executor.submit(_run_job, job) for _, job in runnable]
+        except Exception as e:
+            # 进程池不可用（如受限环境）时退回串行处理
+            print(f"并行处理不可用，改为串行处理: {e}")
+            futures = []
+        serial = [] if futures else list(runnable)
+        broken = False
+        for (index, job), future in zip(runnable, futures):
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                # 作业进程异常退出（如内存不足被终止）后进程池不可再用，
+                # 尚未得到结果的作业（包括这一个）退回串行执行
+                if not broken:
+                    print(f"进程池已损坏，未完成的作业改为串行处理: {e!r}")
+                    broken = True
+                serial.append((index, job))
+                continue
+            except Exception as e:
+                # 作业参数或结果无法在进程间传递等错误：该作业记为失败，其余作业继续
+                result = _failed_job(job, f"作业进程出错: {e!r}")
+            job_results[index] = result
+            _print_job_result(result)
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+    else:
+        serial = runnable
+    for index, job in serial:
+        job_results[index] = _run_job(job, payloads)
+        _print_job_result(job_results[index])
+    results = [job_results[index] for index in range(len(jobs))]
+
+    elapsed = time.perf_counter() - start
+    succeeded = [r for r in results if r['ok']]
+    summary = {
+        'jobs': len(jobs),
+        'succeeded': len(succeeded),
+        'failed': len(jobs) - len(succeeded),
+        'unique_inputs': len(unique_paths),
+        'parts': sum(r['parts'] for r in succeeded),
+        'parse_seconds': parse_seconds,
+        'seconds': elapsed,
+        'jobs_per_second': len(jobs) / elapsed if elapsed > 0 else 0.0,
+        'parts_per_second': sum(r['parts'] for r in succeeded) / elapsed if elapsed > 0 else 0.0,
+        'failures': [{'name': r['name'], 'error': r['error']} for r in results if not r['ok']],
+        'results': results,
+    }
+    _print_summary(summary)
+    return summary
+
+
+def _failed_job(job: Dict, error: str) -> Dict:
+    """没有执行或执行中断的作业的结果摘要"""
+    return {'name': job['name'], 'output': job['output'], 'ok': False, 'error': error, 'outputs': [],
+            'parts': 0, 'sheets': 0, 'seconds': 0.0}
+
+
+def _print_job_result(result: Dict):
+    if result['ok']:
+        print(f"[完成] {result['name']}: {result['parts']} 个图形，{result['sheets']} 个版面，"
+              f"{result['seconds']:.2f} 秒")
+    else:
+        print(f"[失败] {result['name']}: {result['error']}")
+
+
+def _print_summary(summary: Dict):
+    print("\n批处理汇总:")
+    print(f"  作业: {summary['jobs']}（成功 {summary['succeeded']}，失败 {summary['failed']}）")
+    print(f"  输入文件: {summary['unique_inputs']} 个，解析耗时 {summary['parse_seconds']:.2f} 秒")
+    print(f"  总耗时: {summary['seconds']:.2f} 秒，吞吐量 {summary['jobs_per_second']:.2f} 作业/秒，"
+          f"{summary['parts_per_second']:.1f} 图形/秒")
+    for failure in summary['failures']:
+        print(f"  失败: {failure['name']}: {failure['error']}")
@@ -0,0 +1,367 @@
+"""基于NumPy的快速外包矩形计算
+
+与 ezdxf.bbox.extents 逐个实体求包围盒不同，这里先把所有实体的顶点、
+圆弧参数和曲线控制点批量收集到数组中，最后一次性向量化求极值。
+
+精度模式：
+    'exact' - 样条、椭圆等曲线按弦高误差展开为折线后参与计算，
+              误差不超过 FLATTEN_DISTANCE
+    'hull'  - 样条取控制点、椭圆取外接范围、文字按字高和字符数估算，速度最快，
+              结果可能大于真实外包矩形（文字框约为实际宽度的 2 倍，见 _collect_text）
+直线、多段线（含凸度圆弧）、圆和圆弧在两种模式下都按解析方式精确计算
+（ezdxf 用贝塞尔曲线近似圆弧，两者可能相差约 0.01 个图纸单位）。
+无法处理的实体（块引用、标注、非标准拉伸方向等）退回 ezdxf.bbox.extents。
+"""
+import math
+from typing import Iterable
+
+import numpy as np
+from ezdxf import bbox
+from ezdxf.math import BoundingBox, Vec3
+
+EXTENTS_MODES = ('exact', 'hull')
+
+# 曲线展开的最大弦高误差（图纸单位）
+FLATTEN_DISTANCE = 0.01
+
+# 'hull' 模式下估算文字宽度时每个字符的宽度（相对于字高），取常见字体中最宽字符（W、M、@ 等）的宽度，
+# 使估算的文字框不小于实际范围
+TEXT_WIDTH_FACTOR = 1.4
+
+
+class _Collector:
+    """收集点和圆弧参数，最后统一做向量化归约"""
+
+    def __init__(self):
+        self.points = []  # [(x, y, z), ...]
+        # 圆弧：圆心、半径、起始角（弧度）、逆时针扫过的角度
+        self.arc_cx = []
+        self.arc_cy = []
+        self.arc_r = []
+        self.arc_start = []
+        self.arc_span = []
+        # 凸度线段：起点、终点、凸度
+        self.bulge_segments = []  # [(x1, y1, x2, y2, bulge), ...]
+        self.fallback = []
+
+    def add_arc(self, cx, cy, r, start_deg, end_deg):
+        span = (end_deg - start_deg) % 360.0
+        if span == 0.0:
+            span = 360.0
+        self.arc_cx.append(cx)
+        self.arc_cy.append(cy)
+        self.arc_r.append(r)
+        self.arc_start.append(math.radians(start_deg))
+        self.arc_span.append(math.radians(span))
+
+    def add_vertices(self, vertices, closed):
+        """添加 (x, y, bulge) 顶点序列，凸度不为0的线段记为圆弧"""
+        count = len(vertices)
+        if count == 0:
+            return
+        self.points.extend((x, y, 0.0) for x, y, _ in vertices)
+        last = count if closed else count - 1
+        for i in range(last):
+            x1, y1, b = vertices[i]
+            if b:
+                x2, y2, _ = vertices[(i + 1) % count]
+                self.bulge_segments.append((x1, y1, x2, y2, b))
+
+    def extents(self) -> BoundingBox:
+        mins = []
+        maxs = []
+
+        if self.points:
+            pts = np.asarray(self.points, dtype=np.float64)
+            mins.append(pts.min(axis=0))
+            maxs.append(pts.max(axis=0))
+
+        cx = self.arc_cx
+        cy = self.arc_cy
+        r = self.arc_r
+        start = self.arc_start
+        span = self.arc_span
+        if self.bulge_segments:
+            seg = np.asarray(self.bulge_segments, dtype=np.float64)
+            x1, y1, x2, y2, b = seg.T
+            theta = 4.0 * np.arctan(b)
+            dx = x2 - x1
+            dy = y2 - y1
+            chord = np.hypot(dx, dy)
+            valid = chord > 0.0
+            half = theta[valid] / 2.0
+            cot = np.cos(half) / np.sin(half)
+            bcx = (x1[valid] + x2[valid]) / 2.0 - dy[valid] / 2.0 * cot
+            bcy = (y1[valid] + y2[valid]) / 2.0 + dx[valid] / 2.0 * cot
+            br = chord[valid] / (2.0 * np.abs(np.sin(half)))
+            # 逆时针圆弧从起点出发，顺时针圆弧等价于从终点出发的逆时针圆弧
+            sx = np.where(theta[valid] > 0, x1[valid], x2[valid])
+            sy = np.where(theta[valid] > 0, y1[valid], y2[valid])
+            bstart = np.arctan2(sy - bcy, sx - bcx)
+            cx = np.concatenate([np.asarray(cx, dtype=np.float64), bcx])
+            cy = np.concatenate([np.asarray(cy, dtype=np.float64), bcy])
+            r = np.concatenate([np.asarray(r, dtype=np.float64), br])
+            start = np.concatenate([np.asarray(start, dtype=np.float64), bstart])
+            span = np.concatenate([np.asarray(span, dtype=np.float64), np.abs(theta[valid])])
+
+        if len(r):
+            cx = np.asarray(cx, dtype=np.float64)
+            cy = np.asarray(cy, dtype=np.float64)
+            r = np.asarray(r, dtype=np.float64)
+            start = np.asarray(start, dtype=np.float64)
+            span = np.asarray(span, dtype=np.float64)
+            end = start + span
+            # 端点
+            ex = np.concatenate([cx + r * np.cos(start), cx + r * np.cos(end)])
+            ey = np.concatenate([cy + r * np.sin(start), cy + r * np.sin(end)])
+            arc_min = [ex.min(), ey.min()]
+            arc_max = [ex.max(), ey.max()]
+            # 圆弧扫过的坐标轴方向（0°, 90°, 180°, 270°）
+            quadrants = np.arange(4) * (math.pi / 2.0)
+            delta = np.mod(quadrants[None, :] - start[:, None], 2.0 * math.pi)
+            inside = delta <= span[:, None] + 1e-12
+            qx = cx[:, None] + r[:, None] * np.cos(quadrants)[None, :]
+            qy = cy[:, None] + r[:, None] * np.sin(quadrants)[None, :]
+            if inside.any():
+                arc_min = [min(arc_min[0], qx[inside].min()), min(arc_min[1], qy[inside].min())]
+                arc_max = [max(arc_max[0], qx[inside].max()), max(arc_max[1], qy[inside].max())]
+            mins.append(np.array(arc_min + [0.0]))
+            maxs.append(np.array(arc_max + [0.0]))
+
+        result = BoundingBox()
+        if mins:
+            result.extend([Vec3(np.min(mins, axis=0)), Vec3(np.max(maxs, axis=0))])
+        if self.fallback:
+            fallback_box = bbox.extents(self.fallback)
+            if fallback_box.has_data:
+                result.extend([fallback_box.extmin, fallback_box.extmax])
+        return result
+
+
+def _is_planar(entity) -> bool:
+    """实体的拉伸方向是否为默认的 (0, 0, 1)，即OCS与WCS一致"""
+    extrusion = entity.dxf.get('extrusion')
+    return extrusion is None or Vec3(extrusion).isclose((0, 0, 1))
+
+
+def _collect_hatch(entity, collector: _Collector, exact: bool) -> bool:
+    if not _is_planar(entity):
+        return False
+    for boundary in entity.paths:
+        if hasattr(boundary, 'vertices'):
+            collector.add_vertices([(v[0], v[1], v[2] if len(v) > 2 else 0.0)
+                                    for v in boundary.vertices], boundary.is_closed)
+            continue
+        for edge in boundary.edges:
+            edge_type = type(edge).__name__
+            if edge_type == 'LineEdge':
+                collector.points.append((edge.start[0], edge.start[1], 0.0))
+                collector.points.append((edge.end[0], edge.end[1], 0.0))
+            elif edge_type == 'ArcEdge':
+                # ezdxf 加载时已将顺时针圆弧转换为逆时针
+                collector.add_arc(edge.center[0], edge.center[1], edge.radius,
+                                  edge.start_angle, edge.end_angle)
+            elif edge_type == 'EllipseEdge':
+                ellipse = edge.construction_tool()
+                if exact:
+                    collector.points.extend(
+                        (p.x, p.y, 0.0) for p in ellipse.vertices(
+                            ellipse.params(_segment_count(ellipse.major_axis.magnitude))))
+                else:
+                    _add_square(collector, ellipse.center, ellipse.major_axis.magnitude)
+            elif edge_type == 'SplineEdge':
+                points = edge.control_points or edge.fit_points
+                if exact and edge.control_points:
+                    from ezdxf.math import BSpline
+                    spline = BSpline(edge.control_points, order=edge.degree + 1,
+                                     knots=edge.knot_values,
+                                     weights=edge.weights if edge.weights else None)
+                    points = list(spline.flattening(FLATTEN_DISTANCE))
+                collector.points.extend((p[0], p[1], 0.0) for p in points)
+            else:
+                return False
+    return True
+
+
+def _segment_count(radius: float) -> int:
+    """按弦高误差估算整圆展开所需的分段数"""
+    if radius <= FLATTEN_DISTANCE:
+        return 8
+    return max(8, int(math.ceil(math.pi / math.acos(1.0 - FLATTEN_DISTANCE / radius))))
+
+
+def _add_square(collector: _Collector, center, half_size: float):
+    collector.points.append((center[0] - half_size, center[1] - half_size, center[2]))
+    collector.points.append((center[0] + half_size, center[1] + half_size, center[2]))
+
+
+# 'hull' 模式下估算 ALIGNED 文字缩放后的字高时使用的最小平均字宽系数
+TEXT_MIN_WIDTH_FACTOR = 0.25
+
+# MTEXT 行距（相对于字高，行距系数为1时）
+MTEXT_LINE_SPACING = 5.0 / 3.0
+
+# 'hull' 模式下文字在基线以下预留的下伸部分高度（相对于字高）
+TEXT_DESCENDER = 0.35
+
+
+def _add_text_box(collector: _Collector, origin, rotation: float, left: float, bottom: float,
+                  right: float, top: float):
+    """添加以 origin 为原点、旋转 rotation（弧度）的局部矩形 [left, right] x [bottom, top] 的四个角点"""
+    cos_a, sin_a = math.cos(rotation), math.sin(rotation)
+    for x, y in ((left, bottom), (right, bottom), (left, top), (right, top)):
+        collector.points.append((origin[0] + x * cos_a - y * sin_a, origin[1] + x * sin_a + y * cos_a,
+                                 origin[2]))
+
+
+def _collect_text(entity, collector: _Collector) -> bool:
+    """'hull' 模式下按字高和字符数估算文字范围（不测量字体）
+
+    与精确计算一样按对齐点、对齐方式和旋转角放置文字框，只是宽度按每个字符
+    TEXT_WIDTH_FACTOR 个字高估算。常见字体的平均字宽约为 0.7 个字高，因此普通文字的
+    文字框约为实际宽度的 2 倍（全是 i、l 等窄字符时可达 3~4 倍），高度约大 5%；
+    两端对齐（FIT/ALIGNED）的文字宽度是准确的。没有指定列宽的 MTEXT 按不换行估算。
+    """
+    dxf = entity.dxf
+    if not _is_planar(entity):
+        return False
+    if entity.dxftype() == 'TEXT':
+        height = dxf.get('height', 1.0)
+        halign, valign = dxf.get('halign', 0), dxf.get('valign', 0)
+        width = len(dxf.text) * height * dxf.get('width', 1.0) * TEXT_WIDTH_FACTOR
+        rotation = math.radians(dxf.get('rotation', 0.0))
+        origin = dxf.insert
+        if halign in (3, 5) and dxf.hasattr('align_point'):
+            # 两端对齐（ALIGNED/FIT）：文字位于插入点和对齐点之间
+            span = dxf.align_point - dxf.insert
+            width = span.magnitude
+            rotation = math.atan2(span.y, span.x)
+            left = 0.0
+            if halign == 3 and dxf.text:
+                # ALIGNED 按宽度等比缩放字高，按最窄的字宽估算缩放后的字高
+                height = max(height, width / (len(dxf.text) * dxf.get('width', 1.0) * TEXT_MIN_WIDTH_FACTOR))
+        else:
+            if (halign, valign) != (0, 0) and dxf.hasattr('align_point'):
+                origin = dxf.align_point
+            left = -width * {1: 0.5, 2: 1.0, 4: 0.5}.get(halign, 0.0)
+        # 文字框高度为字高加下伸部分；对齐点相对于基线的位置：基线、底部（下伸部分底端）、
+        # 中部（字高一半）、顶部（字高），MIDDLE 对齐时上下都留出下伸部分
+        descender = TEXT_DESCENDER * height
+        if halign == 4:
+            bottom, top = -height / 2 - descender, height / 2 + descender
+        else:
+            bottom = {1: 0.0, 2: -height / 2 - descender, 3: -height - descender}.get(valign, -descender)
+            top = bottom + height + descender
+        _add_text_box(collector, origin, rotation, left, bottom, left + width, top)
+        return True
+
+    height = dxf.get('char_height', 1.0)
+    char_width = height * TEXT_WIDTH_FACTOR
+    lines = entity.plain_text().split('\n')
+    if dxf.get('width', 0.0) > 0:
+        # 指定了列宽：文字按列宽换行
+        width = dxf.width
+        count = sum(max(1, math.ceil(len(line) * char_width / width)) for line in lines)
+    else:
+        width = max((len(line) for line in lines), default=0) * char_width
+        count = len(lines)
+    total = height * (1 + TEXT_DESCENDER + (count - 1) * MTEXT_LINE_SPACING * dxf.get('line_spacing_factor', 1.0))
+    attachment = dxf.get('attachment_point', 1) - 1
+    left = -width * (attachment % 3) / 2
+    top = total * (attachment // 3) / 2
+    _add_text_box(collector, dxf.insert, math.radians(entity.get_rotation()), left, top - total,
+                  left + width, top)
+    return True
+
+
+def _collect_entity(entity, collector: _Collector, exact: bool) -> bool:
+    """收集单个实体的几何数据，无法快速处理时返回False"""
+    dxftype = entity.dxftype()
+    dxf = entity.dxf
+    if dxftype == 'LINE':
+        collector.points.append(tuple(dxf.start))
+        collector.points.append(tuple(dxf.end))
+        return True
+    if dxftype == 'POINT':
+        collector.points.append(tuple(dxf.location))
+        return True
+    if dxftype in ('SOLID', 'TRACE', '3DFACE'):
+        collector.points.extend(tuple(v) for v in entity.wcs_vertices())
+        return True
+    if not _is_planar(entity) and dxftype not in ('SPLINE', 'ELLIPSE', 'TEXT', 'MTEXT'):
+        return False
+    if dxftype == 'LWPOLYLINE':
+        elevation = dxf.get('elevation', 0.0)
+        if elevation:
+            return False
+        collector.add_vertices(entity.get_points('xyb'), entity.closed)
+        return True
+    if dxftype == 'POLYLINE':
+        if not entity.is_2d_polyline:
+            collector.points.extend(tuple(v.dxf.location) for v in entity.vertices)
+            return True
+        if dxf.get('elevation', Vec3()).z:
+            return False
+        collector.add_vertices([(v.dxf.location.x, v.dxf.location.y, v.dxf.get('bulge', 0.0))
+                                for v in entity.vertices], entity.is_closed)
+        return True
+    if dxftype == 'CIRCLE':
+        center = dxf.center
+        if center.z:
+            return False
+        _add_square(collector, center, dxf.radius)
+        return True
+    if dxftype == 'ARC':
+        center = dxf.center
+        if center.z:
+            return False
+        collector.add_arc(center.x, center.y, dxf.radius, dxf.start_angle, dxf.end_angle)
+        return True
+    if dxftype == 'ELLIPSE':
+        if exact:
+            collector.points.extend(tuple(p) for p in entity.flattening(FLATTEN_DISTANCE))
+        else:
+            center = Vec3(dxf.center)
+            major = Vec3(dxf.major_axis)
+            minor = major.cross(Vec3(dxf.extrusion)).normalize(major.magnitude * dxf.ratio)
+            # 外切平行四边形的四个角点
+            for sx, sy in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+                collector.points.append(tuple(center + major * sx + minor * sy))
+        return True
+    if dxftype == 'SPLINE':
+        # 仅有拟合点的样条也先转换为控制点形式，控制点的凸包总能包住曲线
+        spline = entity.construction_tool()
+        if exact:
+            collector.points.extend(tuple(p) for p in spline.flattening(FLATTEN_DISTANCE))
+        else:
+            collector.points.extend(tuple(p) for p in spline.control_points)
+        return True
+    if dxftype == 'HATCH':
+        return _collect_hatch(entity, collector, exact)
+    if dxftype in ('TEXT', 'MTEXT') and not exact:
+        return _collect_text(entity, collector)
+    return False
+
+
+def fast_extents(entities: Iterable, mode: str = 'exact') -> BoundingBox:
+    """批量计算一组实体的外包矩形
+
+    Args:
+        entities: 实体集合（如模型空间）
+        mode: 精度模式，'exact' 或 'hull'
+
+    Returns:
+        ezdxf.math.BoundingBox，与 ezdxf.bbox.extents 的返回值用法相同
+    """
+    if mode not in EXTENTS_MODES:
+        raise ValueError(f"未知的外包矩形计算模式: {mode}")
+    exact = mode == 'exact'
+    collector = _Collector()
+    for entity in entities:
+        try:
+            handled = _collect_entity(entity, collector, exact)
+        except Exception:
+            handled = False
+        if not handled:
+            collector.fallback.append(entity)
+    return collector.extents()
@@ -0,0 +1,342 @@
+"""紧凑的图形几何存储（低内存模式）
+
+ezdxf 的每个实体对象都带有属性命名空间、句柄等开销，完整文档占用的内存通常是几何数据本身的
+几十倍。GeometryStore 把一个图形模型空间中的实体转换为：
+- kinds：每个实体的类型编码（uint8）
+- styles / style_ids：去重后的非几何属性（图层、颜色、线型等），每个实体只保存一个索引
+- points：全部坐标 (N, 2)，float64；values：半径、角度、凸度、节点等数值参数，float64
+- point_starts / value_starts：每个实体在 points / values 中的起止位置
+转换后即可释放完整文档，生成合并文件时由 emit() 直接写出实体；
+放置矩阵为XY平面内的旋转加平移时，坐标和角度用NumPy一次性变换，不再逐个实体调用 transform。
+
+只有能无损表示的实体才转换为数组：拉伸方向为 (0, 0, 1)、坐标的Z为0、属性都在白名单中、
+没有扩展字典等附加数据（XDATA 只能包含不随变换改变的组码，填充的渐变色只能为 kind 0，
+即普通实体填充）。其余实体（文字、块引用、标注、非实体填充等）以脱离源文档的
+实体副本保存（_EntityRecord），写出时复制一次。
+"""
+import math
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from ezdxf.entities.gradient import Gradient
+from ezdxf.lldxf.types import DXFVertex
+from ezdxf.math import Matrix44
+
+# 实体类型编码
+KIND_LINE = 0
+KIND_POINT = 1
+KIND_CIRCLE = 2
+KIND_ARC = 3
+KIND_ELLIPSE = 4
+KIND_LWPOLYLINE = 5
+KIND_SPLINE = 6
+KIND_HATCH = 7
+KIND_RECORD = 8
+
+# 与几何无关、可以原样保存在 styles 中的通用属性
+STYLE_KEYS = frozenset(('layer', 'color', 'linetype', 'lineweight', 'ltscale', 'invisible', 'true_color',
+                        'color_name', 'transparency', 'shadow_mode', 'thickness'))
+
+# 各类型实体的几何属性（单独编码）和额外允许保存在 styles 中的属性
+GEOMETRY_KEYS = {
+    'LINE': ({'start', 'end'}, set()),
+    'POINT': ({'location'}, set()),
+    'CIRCLE': ({'center', 'radius'}, set()),
+    'ARC': ({'center', 'radius', 'start_angle', 'end_angle'}, set()),
+    'ELLIPSE': ({'center', 'major_axis', 'ratio', 'start_param', 'end_param'}, set()),
+    'LWPOLYLINE': ({'count'}, {'flags', 'const_width', 'elevation'}),
+    'SPLINE': ({'n_knots', 'n_control_points', 'n_fit_points'},
+               {'degree', 'flags', 'knot_tolerance', 'control_point_tolerance', 'fit_tolerance'}),
+    'HATCH': ({'n_seed_points'}, {'pattern_name', 'solid_fill', 'associative', 'hatch_style', 'pattern_type',
+                                  'pixel_size', 'elevation'}),
+}
+
+# 所有实体都忽略的属性（写出时重新分配）
+IGNORED_KEYS = frozenset(('handle', 'owner', 'extrusion'))
+
+# XDATA 中随实体变换的坐标、位移和方向组码
+TRANSFORMED_XDATA_CODES = range(1011, 1014)
+
+
+class _EntityRecord:
+    """无法转换为数组的实体：保存一个脱离源文档的实体副本"""
+    __slots__ = ('entity',)
+
+    def __init__(self, entity):
+        copied = entity.copy()
+        # 副本默认引用源文档和源实体，断开后源文档才能被释放；扩展字典属于源文档，不保留
+        copied.doc = None
+        copied.set_source_of_copy(None)
+        copied.extension_dict = None
+        self.entity = copied
+
+
+def _is_2d(*vectors) -> bool:
+    return all(vector.z == 0 for vector in vectors)
+
+
+class _Builder:
+    """逐个实体追加到列表，最后转换为数组"""
+
+    def __init__(self):
+        self.kinds = []
+        self.style_ids = []
+        self.styles = {}
+        self.points = []
+        self.values = []
+        self.point_starts = [0]
+        self.value_starts = [0]
+        self.records = []
+
+    def style_of(self, entity) -> Optional[Dict]:
+        """实体的非几何属性（XDATA 记为 '_xdata'）；含有白名单之外的属性时返回None"""
+        dxftype = entity.dxftype()
+        geometry_keys, extra_keys = GEOMETRY_KEYS[dxftype]
+        style = {}
+        for key, value in entity.dxf.all_existing_dxf_attribs().items():
+            if key in IGNORED_KEYS or key in geometry_keys:
+                continue
+            if key not in STYLE_KEYS and key not in extra_keys:
+                return None
+            style[key] = value
+        if entity.xdata is not None and entity.xdata.data:
+            xdata = []
+            for appid, tags in entity.xdata.data.items():
+                values = []
+                for tag in tags[1:]:  # 第一个是应用名（1001）
+                    if tag.code in TRANSFORMED_XDATA_CODES:
+                        return None
+                    values.append((tag.code, tuple(tag.value) if isinstance(tag, DXFVertex) else tag.value))
+                xdata.append((appid, tuple(values)))
+            style['_xdata'] = tuple(xdata)
+        return style
+
+    def add(self, kind: int, style: Dict, points, values):
+        key = tuple(sorted(style.items()))
+        self.kinds.append(kind)
+        self.style_ids.append(self.styles.setdefault(key, len(self.styles)))
+        self.points.extend(points)
+        self.values.extend(values)
+        self.point_starts.append(len(self.points))
+        self.value_starts.append(len(self.values))
+
+    def add_record(self, entity):
+        self.add(KIND_RECORD, {}, [], [len(self.records)])
+        self.records.append(_EntityRecord(entity))
+
+    def add_entity(self, entity):
+        if not self._add_compact(entity):
+            self.add_record(entity)
+
+    def _add_compact(self, entity) -> bool:
+        """把实体转换为数组表示，不能无损表示时返回False"""
+        dxftype = entity.dxftype()
+        if dxftype not in GEOMETRY_KEYS or entity.appdata or entity.reactors or entity.has_extension_dict:
+            return False
+        dxf = entity.dxf
+        if dxf.hasattr('extrusion') and not dxf.extrusion.isclose((0, 0, 1)):
+            return False
+        style = self.style_of(entity)
+        if style is None:
+            return False
+
+        if dxftype == 'LINE':
+            if not _is_2d(dxf.start, dxf.end):
+                return False
+            self.add(KIND_LINE, style, [dxf.start.vec2, dxf.end.vec2], [])
+        elif dxftype == 'POINT':
+            if not _is_2d(dxf.location):
+                return False
+            self.add(KIND_POINT, style, [dxf.location.vec2], [])
+        elif dxftype == 'CIRCLE':
+            if not _is_2d(dxf.center):
+                return False
+            self.add(KIND_CIRCLE, style, [dxf.center.vec2], [dxf.radius])
+        elif dxftype == 'ARC':
+            if not _is_2d(dxf.center):
+                return False
+            self.add(KIND_ARC, style, [dxf.center.vec2], [dxf.radius, dxf.start_angle, dxf.end_angle])
+        elif dxftype == 'ELLIPSE':
+            if not _is_2d(dxf.center, dxf.major_axis):
+                return False
+            # 长轴是方向向量，只旋转不平移，所以放在 values 中
+            self.add(KIND_ELLIPSE, style, [dxf.center.vec2],
+                     [dxf.major_axis.x, dxf.major_axis.y, dxf.ratio, dxf.start_param, dxf.end_param])
+        elif dxftype == 'LWPOLYLINE':
+            vertices = entity.get_points('xyseb')
+            self.add(KIND_LWPOLYLINE, style, [(x, y) for x, y, _, _, _ in vertices],
+                     [value for _, _, start_width, end_width, bulge in vertices
+                      for value in (start_width, end_width, bulge)])
+        elif dxftype == 'SPLINE':
+            control_points = list(entity.control_points)
+            if entity.fit_point_count() or dxf.hasattr('start_tangent') or dxf.hasattr('end_tangent') or \
+                    not _is_2d(*control_points):
+                return False
+            knots = list(entity.knots)
+            self.add(KIND_SPLINE, style, [point.vec2 for point in control_points],
+                     [len(knots)] + knots + list(entity.weights))
+        elif dxftype == 'HATCH':
+            if style.get('solid_fill') != 1 or style.get('associative', 0):
+                return False
+            if entity.gradient is not None:
+                # kind 0 的渐变色记录不影响显示，与填充方向无关，原样保留
+                if entity.gradient.kind != 0:
+                    return False
+                style['_gradient'] = tuple(sorted(vars(entity.gradient).items()))
+            points = []
+            values = [len(entity.paths)]
+            for path in entity.paths:
+                if type(path).__name__ != 'PolylinePath':
+                    return False
+                values.extend((len(path.vertices), path.path_type_flags, path.is_closed))
+                values.extend(bulge for _, _, bulge in path.vertices)
+                points.extend((x, y) for x, y, _ in path.vertices)
+            points.extend(entity.seeds)
+            self.add(KIND_HATCH, style, points, values)
+        else:
+            return False
+        return True
+
+    def build(self) -> 'GeometryStore':
+        store = GeometryStore()
+        store.kinds = np.array(self.kinds, dtype=np.uint8)
+        store.style_ids = np.array(self.style_ids, dtype=np.uint32)
+        store.styles = tuple(dict(key) for key in self.styles)
+        store.points = np.array(self.points, dtype=np.float64).reshape(-1, 2)
+        store.values = np.array(self.values, dtype=np.float64)
+        store.point_starts = np.array(self.point_starts, dtype=np.int32)
+        store.value_starts = np.array(self.value_starts, dtype=np.int32)
+        store.records = tuple(self.records)
+        return store
+
+
+def _rigid_transform(matrix: Matrix44) -> Optional[Tuple[float, np.ndarray, np.ndarray]]:
+    """矩阵为XY平面内的旋转加平移时返回 (旋转角度, 2x2线性部分, 平移)，否则返回None"""
+    ux, uy, uz, origin = matrix.ux, matrix.uy, matrix.uz, matrix.origin
+    if ux.z or uy.z or origin.z or not uz.isclose((0, 0, 1)):
+        return None
+    linear = np.array([[ux.x, ux.y], [uy.x, uy.y]], dtype=np.float64)
+    if not np.allclose(linear @ linear.T, np.eye(2)) or np.linalg.det(linear) < 0:
+        return None
+    return math.degrees(math.atan2(ux.y, ux.x)), linear, np.array([origin.x, origin.y])
+
+
+class GeometryStore:
+    """一个图形模型空间实体的紧凑表示，见模块说明"""
+    __slots__ = ('kinds', 'style_ids', 'styles', 'points', 'values', 'point_starts', 'value_starts',
+                 'records')
+
+    @classmethod
+    def from_entities(cls, entities) -> 'GeometryStore':
+        builder = _Builder()
+        for entity in entities:
+            builder.add_entity(entity)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @property
+    def nbytes(self) -> int:
+        """数组占用的字节数（不含以实体副本保存的实体）"""
+        return sum(array.nbytes for array in (self.kinds, self.style_ids, self.points, self.values,
+                                              self.point_starts, self.value_starts))
+
+    def emit(self, layout, matrix: Optional[Matrix44] = None) -> Tuple[int, int]:
+        """把全部实体写入 layout（模型空间或块定义），并应用变换矩阵（为None时原样写出）
+
+        返回 (写出的实体数, 失败的实体数)。
+        """
+        points = self.points
+        angle = 0.0
+        linear = None
+        rigid = _rigid_transform(matrix) if matrix is not None else None
+        if rigid is not None:
+            angle, linear, offset = rigid
+            points = points @ linear + offset
+        # 不是平面旋转加平移的矩阵：按原坐标写出后再逐个实体变换
+        per_entity = matrix if matrix is not None and rigid is None else None
+
+        copied = failed = 0
+        point_starts, value_starts = self.point_starts, self.value_starts
+        for index, kind in enumerate(self.kinds.tolist()):
+            pts = points[point_starts[index]:point_starts[index + 1]].tolist()
+            values = self.values[value_starts[index]:value_starts[index + 1]].tolist()
+            attribs = dict(self.styles[self.style_ids[index]])
+            entity = None
+            try:
+                if kind == KIND_RECORD:
+                    record = self.records[int(values[0])].entity.copy()
+                    if matrix is not None:
+                        record.transform(matrix)
+                    layout.add_entity(record)
+                else:
+                    xdata = attribs.pop('_xdata', ())
+                    entity = self._emit_one(layout, kind, pts, values, attribs, angle, linear)
+                    for appid, tags in xdata:
+                        entity.set_xdata(appid, list(tags))
+                    if per_entity is not None:
+                        entity.transform(per_entity)
+                copied += 1
+            except Exception as e:
+                # 已写入但变换失败的实体要删除，与复制源实体时的行为一致
+                if entity is not None and entity.is_alive:
+                    layout.delete_entity(entity)
+                failed += 1
+                print(f"写出实体失败（类型编码 {kind}）: {e}")
+        return copied, failed
+
+    @staticmethod
+    def _emit_one(layout, kind: int, pts: List, values: List, attribs: Dict, angle: float, linear):
+        if kind == KIND_LINE:
+            return layout.add_line(pts[0], pts[1], dxfattribs=attribs)
+        if kind == KIND_POINT:
+            return layout.add_point(pts[0], dxfattribs=attribs)
+        if kind == KIND_CIRCLE:
+            return layout.add_circle(pts[0], values[0], dxfattribs=attribs)
+        if kind == KIND_ARC:
+            radius, start_angle, end_angle = values
+            return layout.add_arc(pts[0], radius, start_angle + angle, end_angle + angle, dxfattribs=attribs)
+        if kind == KIND_ELLIPSE:
+            axis_x, axis_y, ratio, start_param, end_param = values
+            if linear is not None:
+                axis_x, axis_y = (np.array([axis_x, axis_y]) @ linear).tolist()
+            return layout.add_ellipse(pts[0], (axis_x, axis_y, 0.0), ratio, start_param, end_param,
+                                      dxfattribs=attribs)
+        if kind == KIND_LWPOLYLINE:
+            vertices = [(x, y, values[3 * i], values[3 * i + 1], values[3 * i + 2])
+                        for i, (x, y) in enumerate(pts)]
+            return layout.add_lwpolyline(vertices, format='xyseb', close=bool(attribs.get('flags', 0) & 1),
+                                         dxfattribs=attribs)
+        if kind == KIND_SPLINE:
+            knot_count = int(values[0])
+            spline = layout.add_spline(dxfattribs=attribs)
+            spline.control_points = [(x, y, 0.0) for x, y in pts]
+            spline.knots = values[1:1 + knot_count]
+            spline.weights = values[1 + knot_count:]
+            return spline
+        if kind == KIND_HATCH:
+            gradient = attribs.pop('_gradient', None)
+            color = attribs.pop('color', None)
+            hatch = layout.add_hatch(color=256 if color is None else color, dxfattribs=attribs)
+            if color is None:
+                # add_hatch 总是写入颜色，源实体没有颜色属性时去掉
+                hatch.dxf.discard('color')
+            if gradient is not None:
+                hatch.gradient = Gradient()
+                for key, value in gradient:
+                    setattr(hatch.gradient, key, value)
+            position = 1
+            start = 0
+            for _ in range(int(values[0])):
+                count, flags, closed = (int(value) for value in values[position:position + 3])
+                bulges = values[position + 3:position + 3 + count]
+                hatch.paths.add_polyline_path([(x, y, bulge) for (x, y), bulge
+                                               in zip(pts[start:start + count], bulges)],
+                                              is_closed=bool(closed), flags=flags)
+                position += 3 + count
+                start += count
+            if start < len(pts):
+                hatch.set_seed_points(pts[start:])
+            return hatch
+        raise ValueError(f"未知的实体类型编码: {kind}")
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence
+
+
+# 外包矩形计算方式的精确程度：只复用由同等或更精确的方式算出的索引项。
+# 'ezdxf' 与 'exact' 都按真实几何计算（差别在 0.01 个图纸单位以内），视为同等精确；
+# 'hull' 是偏大的估算
+EXTENTS_PRECISION = {'hull': 0, 'ezdxf': 1, 'exact': 1}
+
+
+def file_content_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """计算文件内容的SHA-1摘要"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DXFIndex:
+    """DXF文件元数据索引
+
+    以JSON文件的形式持久化每个输入文件的外包矩形、宽高、实体数量和图层列表。
+    索引以文件的绝对路径为键，并记录文件大小、修改时间和内容摘要：
+    大小和修改时间都未变化时直接命中；仅修改时间变化时再比较内容摘要，
+    内容相同仍视为命中（例如文件被重新复制过）。
+    每个索引项记录算出外包矩形的方式（extents_mode），见 accepts()。
+    """
+
+    # 版本 2 起索引项记录 extents_mode，旧索引中的项来源不明，整体丢弃
+    VERSION = 2
+
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.normcase(os.path.abspath(file_path))
+
+    def load(self):
+        """从磁盘加载索引，文件不存在或版本不符时使用空索引"""
+        self.entries = {}
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.VERSION:
+                self.entries = data.get('files', {})
+        except Exception as e:
+            print(f"读取索引文件失败 {self.index_path}: {e}")
+
+    def save(self):
+        """将索引写回磁盘（先写临时文件再替换，避免写入中断损坏索引）"""
+        if not self.dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'files': self.entries}, f,
+                      ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def lookup(self, file_path: str) -> Optional[Dict]:
+        """查找文件的索引项，文件已变化或不在索引中时返回None"""
+        entry = self.entries.get(self._key(file_path))
+        if entry is None:
+            return None
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if stat.st_size != entry['size']:
+            return None
+        if stat.st_mtime_ns != entry['mtime_ns']:
+            if file_content_hash(file_path) != entry['sha1']:
+                return None
+            entry['mtime_ns'] = stat.st_mtime_ns
+            self.dirty = True
+        return entry
+
+    @staticmethod
+    def accepts(entry: Dict, extents_mode: str) -> bool:
+        """索引项的外包矩形能否用于 extents_mode：要求由同等或更精确的方式算出
+
+        没有 extents_mode 的项（批处理、服务等按请求的方式现算的记录）视为可用。
+        """
+        produced = entry.get('extents_mode')
+        if produced is None:
+            return True
+        return EXTENTS_PRECISION.get(produced, 0) >= EXTENTS_PRECISION.get(extents_mode, 1)
+
+    def update(self, file_path: str, extmin: Sequence[float], extmax: Sequence[float],
+               entity_count: int, layers: List[str], extents_mode: str = 'ezdxf') -> Dict:
+        """写入或更新文件的索引项，extents_mode 为算出外包矩形的方式"""
+        stat = os.stat(file_path)
+        entry = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': file_content_hash(file_path),
+            'extmin': [float(v) for v in extmin],
+            'extmax': [float(v) for v in extmax],
+            'width': float(extmax[0] - extmin[0]),
+            'height': float(extmax[1] - extmin[1]),
+            'entity_count': entity_count,
+            'layers': sorted(layers),
+            'extents_mode': extents_mode,
+        }
+        self.entries[self._key(file_path)] = entry
+        self.dirty = True
+        return entry
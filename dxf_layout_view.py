@@ -0,0 +1,122 @@
+"""在 Tk 画布上直接绘制排样结果
+
+LayoutCanvas 把每个放置的图形画成一个矩形画布项（不经过 matplotlib，也不读写文件），
+用于图形界面的实时排样：修改容器尺寸或间隙后重新排样，只需移动已有的画布项。
+画布项按需创建并在多次绘制之间复用，图形数量不变时每次重绘只更新坐标。
+"""
+import tkinter as tk
+from typing import Dict, List, Optional, Tuple
+
+# 每个源文件使用的填充色（按文件首次出现的顺序循环使用）
+PALETTE = ('#8ecae6', '#ffb703', '#90be6d', '#f4a261', '#cdb4db',
+           '#e76f51', '#a8dadc', '#f9c74f', '#b5838d', '#84a59d')
+
+# 矩形在画布上的宽和高都不小于该值（像素）时才显示文件名
+LABEL_MIN_PX = 40
+
+# 图形数量超过该值时不显示文件名
+MAX_LABELS = 300
+
+
+def _placement_rect(placement: Dict) -> Tuple[float, float, float, float]:
+    """放置后的外包矩形 (x, y, 宽, 高)，坐标已加上版面原点"""
+    origin_x, origin_y = placement.get('sheet_origin', (0.0, 0.0))
+    box = placement['box']
+    if placement.get('rotation', 0) % 180 == 90:
+        width, height = box['height'], box['width']
+    else:
+        width, height = box['width'], box['height']
+    return placement['position'][0] + origin_x, placement['position'][1] + origin_y, width, height
+
+
+class LayoutCanvas:
+    """在画布上按适应窗口的比例绘制容器边框和各图形的外包矩形，画布大小变化时自动重绘"""
+
+    def __init__(self, canvas: tk.Canvas, margin: int = 10, tag: str = 'layout'):
+        self.canvas = canvas
+        self.margin = margin
+        self.tag = tag
+        self.placements: Optional[List[Dict]] = None
+        self.container_size = (0.0, 0.0)
+        # 复用的画布项：容器边框、图形矩形和文件名
+        self.sheet_items: List[int] = []
+        self.rect_items: List[int] = []
+        self.label_items: List[int] = []
+        canvas.bind("<Configure>", self.on_configure, add='+')
+
+    def show(self, placements: List[Dict], container_width: float, container_height: float):
+        """显示排样结果"""
+        self.placements = placements
+        self.container_size = (container_width, container_height)
+        self.draw()
+
+    def clear(self):
+        """删除全部画布项"""
+        self.placements = None
+        self.canvas.delete(self.tag)
+        self.sheet_items, self.rect_items, self.label_items = [], [], []
+
+    def _resize_pool(self, items: List[int], count: int, create) -> List[int]:
+        """把画布项列表调整为 count 个，多余的删除，不足的用 create() 创建"""
+        while len(items) > count:
+            self.canvas.delete(items.pop())
+        while len(items) < count:
+            items.append(create())
+        return items
+
+    def draw(self):
+        if self.placements is None:
+            return
+        canvas = self.canvas
+        container_width, container_height = self.container_size
+        origins = sorted({placement.get('sheet', 0): placement.get('sheet_origin', (0.0, 0.0))
+                          for placement in self.placements}.items())
+        sheets = [(x, y, container_width, container_height) for _, (x, y) in origins] or \
+            [(0.0, 0.0, container_width, container_height)]
+        rects = [_placement_rect(placement) for placement in self.placements]
+
+        # 适应画布大小，DXF的Y轴向上，画布的Y轴向下
+        min_x = min(x for x, _, _, _ in sheets + rects)
+        min_y = min(y for _, y, _, _ in sheets + rects)
+        max_x = max(x + w for x, _, w, _ in sheets + rects)
+        max_y = max(y + h for _, y, _, h in sheets + rects)
+        canvas_width = max(canvas.winfo_width(), 2 * self.margin + 1)
+        canvas_height = max(canvas.winfo_height(), 2 * self.margin + 1)
+        scale = min((canvas_width - 2 * self.margin) / max(max_x - min_x, 1e-9),
+                    (canvas_height - 2 * self.margin) / max(max_y - min_y, 1e-9))
+        left = (canvas_width - (max_x - min_x) * scale) / 2
+        top = (canvas_height - (max_y - min_y) * scale) / 2
+
+        def to_canvas(x, y, w, h):
+            return (left + (x - min_x) * scale, top + (max_y - y - h) * scale,
+                    left + (x + w - min_x) * scale, top + (max_y - y) * scale)
+
+        self._resize_pool(self.sheet_items, len(sheets), lambda: canvas.create_rectangle(
+            0, 0, 0, 0, outline='black', dash=(4, 2), tags=self.tag))
+        for item, sheet in zip(self.sheet_items, sheets):
+            canvas.coords(item, *to_canvas(*sheet))
+
+        self._resize_pool(self.rect_items, len(rects), lambda: canvas.create_rectangle(
+            0, 0, 0, 0, outline='#333333', tags=self.tag))
+        colors = {}
+        for item, rect, placement in zip(self.rect_items, rects, self.placements):
+            doc_info = placement['box']['doc_info']
+            color = colors.setdefault(id(doc_info), PALETTE[len(colors) % len(PALETTE)])
+            canvas.coords(item, *to_canvas(*rect))
+            canvas.itemconfigure(item, fill=color)
+
+        labels = []
+        if len(rects) <= MAX_LABELS:
+            for rect, placement in zip(rects, self.placements):
+                x0, y0, x1, y1 = to_canvas(*rect)
+                if x1 - x0 >= LABEL_MIN_PX and y1 - y0 >= LABEL_MIN_PX / 2:
+                    labels.append(((x0 + x1) / 2, (y0 + y1) / 2, placement['box']['doc_info']['name']))
+        self._resize_pool(self.label_items, len(labels), lambda: canvas.create_text(
+            0, 0, fill='black', tags=self.tag))
+        for item, (x, y, text) in zip(self.label_items, labels):
+            canvas.coords(item, x, y)
+            canvas.itemconfigure(item, text=text)
+        canvas.tag_raise(self.tag)
+
+    def on_configure(self, event):
+        self.draw()
@@ -0,0 +1,55 @@
+"""零件外轮廓提取
+
+真实外形排样（dxf_packers 中的 'shape'）需要每个图形的轮廓，而不只是外包矩形。
+part_outline 把模型空间实体（块引用先展开）按容差展平为折线，坐标相对于外包矩形
+左下角。排样器把这些折线栅格化为占用格子，并填充外轮廓围住的区域，
+因此这里不需要区分外轮廓、内部的孔和文字。
+
+展平容差取图形长边的 OUTLINE_TOLERANCE 倍，折线上相距小于容差的连续点合并为一个，
+排样精度由排样器的格子大小决定，更细的折线只会增加栅格化的耗时。
+"""
+from typing import Iterable, List, Sequence
+
+import numpy as np
+from ezdxf import disassemble
+
+# 展平曲线的容差（相对于图形长边）
+OUTLINE_TOLERANCE = 1 / 500
+
+
+def _simplify(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """去掉与前一点距离小于容差的点（保留首尾两点）"""
+    if len(points) <= 2:
+        return points
+    step = np.hypot(*np.diff(points, axis=0).T)
+    keep = np.concatenate([[True], step >= tolerance])
+    keep[-1] = True
+    return points[keep]
+
+
+def part_outline(entities: Iterable, extmin: Sequence[float], width: float, height: float) -> List[np.ndarray]:
+    """提取图形轮廓：返回折线列表，每条折线为 (N, 2) 的坐标数组，相对于外包矩形左下角
+
+    entities 为模型空间（或实体列表），extmin、width、height 为图形的外包矩形。
+    无法转换为轮廓的实体会引发异常，调用方应改用外包矩形排样。
+    """
+    tolerance = max(width, height, 1e-9) * OUTLINE_TOLERANCE
+    origin = np.array([extmin[0], extmin[1]], dtype=np.float64)
+    outline = []
+    for primitive in disassemble.to_primitives(disassemble.recursive_decompose(entities), tolerance):
+        if primitive.is_empty:
+            continue
+        if primitive.path is not None:
+            polylines = [list(path.flattening(tolerance)) for path in primitive.path.sub_paths()]
+        elif primitive.mesh is not None:
+            vertices = primitive.mesh.vertices
+            polylines = [[vertices[index] for index in face] + [vertices[face[0]]]
+                         for face in primitive.mesh.faces if face]
+        else:
+            polylines = [list(primitive.vertices())]
+        for polyline in polylines:
+            if not polyline:
+                continue
+            points = np.array([(vertex.x, vertex.y) for vertex in polyline], dtype=np.float64)
+            outline.append(_simplify(points - origin, tolerance))
+    return outline
@@ -0,0 +1,873 @@
+"""排样算法
+
+所有排样器实现同一个接口 RectanglePacker.pack(boxes, container_width,
+container_height, gap, multi_sheet)，boxes 为外包矩形字典列表或 BoxTable，
+返回 PlacementTable（见 dxf_records）。其中每个元素按 placement 字典的方式访问，
+可直接交给 create_merged_dxf 和 DXFRenderer：
+
+    {'box': box, 'position': (x, y), 'rotation': 0, 'sheet': n, 'sheet_origin': (x, y)}
+
+宽、高、面积的计算、排序以及行列最大尺寸等归约都在 NumPy 数组上完成。
+
+'grid'     - 网格排样（默认），多版面时按行（货架式）填充
+'maxrects' - MaxRects 最短边优先，空闲矩形集合以 NumPy 数组存储
+'skyline'  - Skyline 最低水平线优先，轮廓线以 NumPy 数组存储
+'shape'    - 真实外形排样，按图形轮廓的占用格子放置，碰撞检测用 FFT 互相关
+"""
+import math
+
+import numpy as np
+
+from dxf_records import BoxTable, PlacementTable, as_box_table
+
+# 多版面合并到同一文件时，相邻版面之间的间距
+SHEET_SPACING = 20.0
+
+# 浮点比较容差
+EPSILON = 1e-9
+
+# MaxRects / Skyline 多版面排样时同时保持打开的版面数。
+# 更早的版面不再尝试放入图形，使排样耗时与版面数无关
+MAX_OPEN_SHEETS = 8
+# 轮廓线段数不超过该值时区间最大值直接用广播比较计算
+RANGE_MAX_BROADCAST = 64
+
+# 真实外形排样时版面长边划分的格子数（格子越小越精确，耗时随格子总数增长）
+NEST_RESOLUTION = 400
+# 真实外形排样尝试的旋转角度（逆时针）
+NEST_ROTATIONS = (0, 90, 180, 270)
+
+
+class RectanglePacker:
+    """排样器基类"""
+
+    name = ''
+
+    def pack(self, boxes, container_width: float, container_height: float,
+             gap: float, multi_sheet: bool = False) -> PlacementTable:
+        """对外包矩形排样
+
+        Args:
+            boxes: DXFProcessor.calculate_bounding_boxes 得到的外包矩形列表，或 BoxTable
+            container_width: 容器宽度
+            container_height: 容器高度
+            gap: 图形之间的间隙
+            multi_sheet: 放不下时是否溢出到新的版面
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _sheet_placements(table: BoxTable, items, sheets, xs, ys, container_width: float,
+                          container_height: float, rotations=None) -> PlacementTable:
+        """把每个图形的 (序号, 版面, x, y[, 旋转角度]) 转换为排样结果，版面内的图形整体居中
+
+        版面从0开始连续编号，结果按版面排列，同一版面内保持放入的顺序。
+        """
+        items = np.asarray(items, dtype=np.int64)
+        sheets = np.asarray(sheets, dtype=np.int64)
+        order = np.argsort(sheets, kind='stable')
+        items, sheets = items[order], sheets[order]
+        xs = np.asarray(xs, dtype=np.float64)[order]
+        ys = np.asarray(ys, dtype=np.float64)[order]
+        rotations = np.asarray(rotations, dtype=np.int64)[order] if rotations is not None else 0
+        records = table.records[items]
+        if not len(items):
+            return PlacementTable.build(table.boxes, records['box'], xs, ys)
+
+        # 旋转90°/270°的图形宽高互换
+        turned = np.asarray(rotations) % 180 == 90
+        widths = np.where(turned, records['height'], records['width'])
+        heights = np.where(turned, records['width'], records['height'])
+        # 每个版面已用区域的宽高：按版面分段求最大值
+        starts = np.flatnonzero(np.diff(sheets, prepend=-1))
+        used_width = np.maximum.reduceat(xs + widths, starts)
+        used_height = np.maximum.reduceat(ys + heights, starts)
+        offset_x = ((container_width - used_width) / 2)[sheets]
+        offset_y = ((container_height - used_height) / 2)[sheets]
+        if len(starts) > 1:
+            print(f"共使用 {len(starts)} 个版面")
+        return PlacementTable.build(table.boxes, records['box'], xs + offset_x, ys + offset_y,
+                                    rotation=rotations, sheet=sheets,
+                                    origin_x=sheets * (container_width + SHEET_SPACING))
+
+    @staticmethod
+    def _overflow_placements(table: BoxTable, leftover, container_width: float, gap: float) -> PlacementTable:
+        """单版面模式下容器放不下的图形，依次排列在容器右侧"""
+        print(f"警告: 容器放不下 {len(leftover)} 个图形，已排列在容器右侧")
+        records = table.records[np.asarray(leftover, dtype=np.int64)]
+        xs = np.cumsum(np.concatenate([[container_width + gap], records['width'] + gap]))[:-1]
+        return PlacementTable.build(table.boxes, records['box'], xs, 0.0)
+
+
+def _grid_extent(widths: np.ndarray, heights: np.ndarray, grid_cols: int, grid_rows: int):
+    """按行优先把图形放入 grid_cols 列的网格，返回 (每列最大宽度, 每行最大高度)
+
+    grid_rows 可能多于实际需要的行数，多出的行高度为0。
+    """
+    count = len(widths)
+    used_rows = -(-count // grid_cols)
+    cells = np.zeros(used_rows * grid_cols)
+    cells[:count] = widths
+    col_widths = cells.reshape(used_rows, grid_cols).max(axis=0)
+    cells[:count] = heights
+    row_heights = np.zeros(grid_rows)
+    row_heights[:used_rows] = cells.reshape(used_rows, grid_cols).max(axis=1)
+    return col_widths, row_heights
+
+
+class GridPacker(RectanglePacker):
+    """网格排样算法 - 从左到右，从上到下排列，然后整体居中
+
+    每次调整网格时的行列最大尺寸都通过一次 reshape 后的向量化归约得到。
+    """
+
+    name = 'grid'
+
+    def pack(self, boxes, container_width, container_height, gap, multi_sheet=False):
+        table = as_box_table(boxes)
+        if multi_sheet:
+            return self._pack_sheets(table, container_width, container_height, gap)
+
+        count = len(table)
+        if not count:
+            return PlacementTable.build(table.boxes, [], [], [])
+
+        # 按面积降序排序（面积相同时保持原顺序）
+        order = np.argsort(-table.records['area'], kind='stable')
+        widths = table.records['width'][order]
+        heights = table.records['height'][order]
+
+        # 估算网格尺寸
+        grid_cols = max(1, int(math.sqrt(count * widths.mean() / heights.mean() * container_height / container_width)))
+        grid_rows = max(1, math.ceil(count / grid_cols))
+
+        # 第一行是面积最大的 grid_cols 个图形，总宽度不小于它们的宽度之和加间隙；
+        # 这个下界随列数单调增加，一旦超过容器宽度，再增加列数也放不下
+        first_row_width = np.cumsum(widths) + gap * np.arange(count)
+
+        # 动态调整网格大小直到能容纳所有图形
+        while True:
+            col_widths, row_heights = _grid_extent(widths, heights, grid_cols, grid_rows)
+            total_width = float(col_widths.sum()) + (grid_cols - 1) * gap
+            total_height = float(row_heights.sum()) + (grid_rows - 1) * gap
+            width_fits = total_width <= container_width
+            height_fits = total_height <= container_height
+
+            # 检查是否适合容器
+            if width_fits and height_fits:
+                break
+
+            # 如果不适合，增加网格尺寸
+            if not width_fits:
+                grid_cols += 1
+            if not height_fits:
+                rows = max(1, math.ceil(count / grid_cols))
+                if width_fits and rows == grid_rows:
+                    # 行数已经不能再减少，增加一列（否则网格不再变化）
+                    grid_cols += 1
+                    rows = max(1, math.ceil(count / grid_cols))
+                grid_rows = rows
+
+            # 避免无限循环
+            if grid_cols > count or first_row_width[grid_cols - 1] > container_width + EPSILON:
+                grid_cols = count
+                grid_rows = 1
+                break
+
+        # 重新计算行列最大尺寸，并计算整体偏移以居中放置
+        col_widths, row_heights = _grid_extent(widths, heights, grid_cols, grid_rows)
+        total_width = float(col_widths.sum()) + (grid_cols - 1) * gap
+        total_height = float(row_heights.sum()) + (grid_rows - 1) * gap
+        offset_x = (container_width - total_width) / 2
+        offset_y = (container_height - total_height) / 2
+
+        # 每列左边和每行下边的坐标，图形在网格单元内居中放置
+        col_x = np.cumsum(np.concatenate([[offset_x], col_widths + gap]))[:-1]
+        row_y = np.cumsum(np.concatenate([[offset_y], row_heights + gap]))[:-1]
+        index = np.arange(count)
+        cols = index % grid_cols
+        rows = index // grid_cols
+        xs = col_x[cols] + (col_widths[cols] - widths) / 2
+        ys = row_y[rows] + (row_heights[rows] - heights) / 2
+        return PlacementTable.build(table.boxes, table.records['box'][order], xs, ys)
+
+    def _pack_sheets(self, table, container_width, container_height, gap):
+        """多版面排样 - 按高度降序逐行（货架式）填充，当前版面放不下时开启新版面
+
+        排序 O(n log n)，放置 O(n)。尺寸超过容器的图形单独占用一个版面。
+        """
+        order = np.lexsort((-table.records['width'], -table.records['height']))
+        widths = table.records['width'][order].tolist()
+        heights = table.records['height'][order].tolist()
+
+        items, sheets, xs, ys = [], [], [], []
+        oversized = []
+        sheet = -1
+        x = y = row_height = 0.0
+        for item, width, height in zip(order.tolist(), widths, heights):
+            if width > container_width or height > container_height:
+                print(f"警告: 文件 {table.box(item)['doc_info']['name']} 的尺寸超出容器，单独放置在一个版面上")
+                oversized.append(item)
+                continue
+
+            # 当前行放不下时换行
+            if sheet >= 0 and x > 0 and x + width > container_width:
+                y += row_height + gap
+                x = 0.0
+                row_height = 0.0
+            # 当前版面放不下时开启新版面
+            if sheet < 0 or y + height > container_height:
+                sheet += 1
+                x = y = row_height = 0.0
+
+            items.append(item)
+            sheets.append(sheet)
+            xs.append(x)
+            ys.append(y)
+            x += width + gap
+            row_height = max(row_height, height)
+
+        items += oversized
+        sheets += range(sheet + 1, sheet + 1 + len(oversized))
+        xs += [0.0] * len(oversized)
+        ys += [0.0] * len(oversized)
+        return self._sheet_placements(table, items, sheets, xs, ys, container_width, container_height)
+
+
+class _SheetSelector:
+    """在已打开的版面中挑选可能放得下图形的版面
+
+    只尝试最近打开的 MAX_OPEN_SHEETS 个版面，并用空闲区域的最大宽高、剩余面积
+    以及最近一次放不下的尺寸（空闲区域只会减少，不小于该尺寸的图形同样放不下）
+    快速排除放不下的版面。
+    """
+
+    def __init__(self, bin_width: float, bin_height: float):
+        self.bin_area = bin_width * bin_height
+        self.sheets = []
+        self.free_width = []
+        self.free_height = []
+        self.free_area = []
+        self.failed_width = []
+        self.failed_height = []
+
+    def add(self, sheet, width: float, height: float):
+        self.sheets.append(sheet)
+        sheet_free_width, sheet_free_height = sheet.free_size()
+        self.free_width.append(sheet_free_width)
+        self.free_height.append(sheet_free_height)
+        self.free_area.append(self.bin_area - width * height)
+        self.failed_width.append(math.inf)
+        self.failed_height.append(math.inf)
+
+    def candidates(self, width: float, height: float):
+        first_open = max(0, len(self.sheets) - MAX_OPEN_SHEETS)
+        fits = ((np.asarray(self.free_width[first_open:]) >= width - EPSILON) &
+                (np.asarray(self.free_height[first_open:]) >= height - EPSILON) &
+                (np.asarray(self.free_area[first_open:]) >= width * height - EPSILON) &
+                ~((width >= np.asarray(self.failed_width[first_open:])) &
+                  (height >= np.asarray(self.failed_height[first_open:]))))
+        return np.flatnonzero(fits) + first_open
+
+    def failed(self, index: int, width: float, height: float):
+        if width * height < self.failed_width[index] * self.failed_height[index]:
+            self.failed_width[index] = width
+            self.failed_height[index] = height
+
+    def placed(self, index: int, width: float, height: float):
+        self.free_width[index], self.free_height[index] = self.sheets[index].free_size()
+        self.free_area[index] -= width * height
+
+
+class _FreeSheetPacker(RectanglePacker):
+    """MaxRects / Skyline 的公共流程：按尺寸降序，依次放入第一个放得下的版面
+
+    间隙通过把每个图形和容器都扩大 gap 来实现，这样图形之间恰好相隔 gap，
+    而图形可以贴着容器边缘。
+    """
+
+    def _new_sheet(self, width: float, height: float):
+        raise NotImplementedError
+
+    def _new_selector(self, width: float, height: float) -> _SheetSelector:
+        return _SheetSelector(width, height)
+
+    @staticmethod
+    def _sort_order(records: np.ndarray) -> np.ndarray:
+        """按面积、长边降序（相同时保持原顺序）"""
+        return np.lexsort((-np.maximum(records['width'], records['height']), -records['area']))
+
+    def pack(self, boxes, container_width, container_height, gap, multi_sheet=False):
+        table = as_box_table(boxes)
+        order = self._sort_order(table.records)
+        widths = table.records['width'][order] + gap
+        heights = table.records['height'][order] + gap
+        # 每个图形之后尚未放置的图形的最小宽度和最小高度，版面可以据此丢弃再也用不上的空闲区域
+        later_widths = np.append(np.minimum.accumulate(widths[::-1])[::-1][1:], np.inf).tolist()
+        later_heights = np.append(np.minimum.accumulate(heights[::-1])[::-1][1:], np.inf).tolist()
+        widths, heights = widths.tolist(), heights.tolist()
+        bin_width = container_width + gap
+        bin_height = container_height + gap
+
+        selector = self._new_selector(bin_width, bin_height)
+        items, sheets, xs, ys = [], [], [], []
+        oversized = []
+        leftover = []
+        for item, width, height, later_width, later_height in zip(order.tolist(), widths, heights,
+                                                                  later_widths, later_heights):
+            if width > bin_width + EPSILON or height > bin_height + EPSILON:
+                if multi_sheet:
+                    print(f"警告: 文件 {table.box(item)['doc_info']['name']} 的尺寸超出容器，单独放置在一个版面上")
+                    oversized.append(item)
+                else:
+                    leftover.append(item)
+                continue
+
+            placed = False
+            for index in selector.candidates(width, height):
+                sheet = selector.sheets[index]
+                position = sheet.find(width, height)
+                if position is None:
+                    selector.failed(index, width, height)
+                    continue
+                sheet.place(position[0], position[1], width, height, later_width, later_height)
+                items.append(item)
+                sheets.append(int(index))
+                xs.append(position[0])
+                ys.append(position[1])
+                selector.placed(index, width, height)
+                placed = True
+                break
+            if placed:
+                continue
+
+            if selector.sheets and not multi_sheet:
+                leftover.append(item)
+                continue
+
+            sheet = self._new_sheet(bin_width, bin_height)
+            position = sheet.find(width, height)
+            sheet.place(position[0], position[1], width, height, later_width, later_height)
+            selector.add(sheet, width, height)
+            items.append(item)
+            sheets.append(len(selector.sheets) - 1)
+            xs.append(position[0])
+            ys.append(position[1])
+
+        opened = len(selector.sheets)
+        items += oversized
+        sheets += range(opened, opened + len(oversized))
+        xs += [0.0] * len(oversized)
+        ys += [0.0] * len(oversized)
+        placements = self._sheet_placements(table, items, sheets, xs, ys, container_width, container_height)
+        if leftover:
+            placements = PlacementTable.concat(
+                [placements, self._overflow_placements(table, leftover, container_width, gap)])
+        return placements
+
+
+def _no_greater(a: np.ndarray, b: np.ndarray, tolerance: float = EPSILON) -> np.ndarray:
+    """逐行（可广播）判断 a 的四个分量是否都不大于 b + tolerance
+
+    按列比较后相与，比在 (…, 4) 的布尔数组上做 all(axis=-1) 快数倍（最后一维很短时归约开销占大头）。
+    """
+    return ((a[..., 0] <= b[..., 0] + tolerance) & (a[..., 1] <= b[..., 1] + tolerance) &
+            (a[..., 2] <= b[..., 2] + tolerance) & (a[..., 3] <= b[..., 3] + tolerance))
+
+
+class _MaxRectsSheet:
+    """MaxRects 版面：所有极大空闲矩形保存在一个 (n, 4) 的 NumPy 数组中
+
+    每行存储 (x1, y1, -x2, -y2)，这样“A 包含 B”等价于 A 的四个分量都不大于 B，
+    包含和相交测试都只需一次广播比较。各空闲矩形的宽度和高度在每次放置后计算一次并缓存，
+    供 find、版面选择和下一次放置共用。
+    """
+
+    __slots__ = ('rects', 'widths', 'heights')
+
+    def __init__(self, width: float, height: float):
+        self._update(np.array([[0.0, 0.0, -float(width), -float(height)]]))
+
+    def _update(self, rects: np.ndarray):
+        self.rects = rects
+        self.widths = -rects[:, 2] - rects[:, 0]
+        self.heights = -rects[:, 3] - rects[:, 1]
+
+    def sizes(self):
+        """各空闲矩形的宽度和高度"""
+        return self.widths, self.heights
+
+    def free_size(self):
+        if not len(self.rects):
+            return 0.0, 0.0
+        widths, heights = self.sizes()
+        return float(widths.max()), float(heights.max())
+
+    def find(self, width: float, height: float):
+        """最短边优先（BSSF）：选择放入后剩余短边最小的空闲矩形"""
+        widths, heights = self.sizes()
+        leftover_w = widths - width
+        leftover_h = heights - height
+        candidates = np.flatnonzero((leftover_w >= -EPSILON) & (leftover_h >= -EPSILON))
+        if not candidates.size:
+            return None
+        leftover_w = leftover_w[candidates]
+        leftover_h = leftover_h[candidates]
+        short_side = np.minimum(leftover_w, leftover_h)
+        long_side = np.maximum(leftover_w, leftover_h)
+        best = candidates[np.lexsort((long_side, short_side))[0]]
+        return float(self.rects[best, 0]), float(self.rects[best, 1])
+
+    def place(self, x: float, y: float, width: float, height: float,
+              min_width: float = 0.0, min_height: float = 0.0):
+        """占用矩形区域，切分与之相交的空闲矩形并去除被包含的空闲矩形
+
+        宽度小于 min_width 或高度小于 min_height（之后的图形都放不进）的空闲矩形直接丢弃。
+        它们不会再被 find 选中，被它们包含的新矩形同样放不进任何图形，因此结果不变，
+        而空闲矩形数（每次放置的向量运算量）通常减少一半以上。
+        """
+        rects = self.rects
+        right = x + width
+        top = y + height
+        hit = _no_greater(rects, np.array([right, top, -x, -y]), -EPSILON)
+        useless = (self.widths < min_width - EPSILON) | (self.heights < min_height - EPSILON)
+        if not hit.any():
+            if useless.any():
+                self._update(rects[~useless])
+            return
+
+        # 每个相交的空闲矩形切出左、右、下、上四个部分，去掉面积为0的部分
+        pieces = np.repeat(rects[hit][None, :, :], 4, axis=0)
+        pieces[0, :, 2] = -x
+        pieces[1, :, 0] = right
+        pieces[2, :, 3] = -y
+        pieces[3, :, 1] = top
+        pieces = pieces.reshape(-1, 4)
+        pieces = pieces[(-pieces[:, 2] - pieces[:, 0] > max(min_width - EPSILON, EPSILON)) &
+                        (-pieces[:, 3] - pieces[:, 1] > max(min_height - EPSILON, EPSILON))]
+        rest = rects[~(hit | useless)]
+
+        if len(pieces):
+            # 新矩形之间互相包含（完全相同时保留序号较小的一个）
+            contains = _no_greater(pieces[None, :, :], pieces[:, None, :])
+            np.fill_diagonal(contains, False)
+            order = np.arange(len(pieces))
+            inside = (contains & (~contains.T | (order[None, :] < order[:, None]))).any(axis=1)
+
+            # 包含某个新矩形的旧矩形的每个分量都不大于新矩形各分量的最大值，先按此筛选。
+            # 旧矩形不会被新矩形包含：新矩形位于某个被切分的旧矩形内，
+            # 而空闲矩形集合中原本就没有互相包含的矩形
+            near = _no_greater(rest, pieces.max(axis=0))
+            if near.any():
+                inside |= _no_greater(rest[near][None, :, :], pieces[:, None, :]).any(axis=1)
+            pieces = pieces[~inside]
+
+        self._update(np.concatenate([rest, pieces]))
+
+
+class _MaxRectsSelector(_SheetSelector):
+    """汇总所有版面的空闲矩形尺寸，一次向量化查询即可找到第一个放得下的版面"""
+
+    def __init__(self, bin_width: float, bin_height: float):
+        super().__init__(bin_width, bin_height)
+        self.widths = np.empty(0)
+        self.heights = np.empty(0)
+        self.owners = np.empty(0, dtype=np.int64)
+
+    def add(self, sheet, width, height):
+        super().add(sheet, width, height)
+        self._refresh(len(self.sheets) - 1)
+
+    def candidates(self, width, height):
+        fits = np.flatnonzero((self.widths >= width - EPSILON) & (self.heights >= height - EPSILON))
+        if not fits.size:
+            return []
+        return [int(self.owners[fits].min())]
+
+    def placed(self, index, width, height):
+        super().placed(index, width, height)
+        self._refresh(index)
+
+    def _refresh(self, index: int):
+        sheet = self.sheets[index]
+        widths, heights = sheet.sizes()
+        if len(self.sheets) == 1:
+            self.widths, self.heights = widths, heights
+            self.owners = np.zeros(len(widths), dtype=np.int64)
+            return
+        keep = self.owners != index
+        self.widths = np.concatenate([self.widths[keep], widths])
+        self.heights = np.concatenate([self.heights[keep], heights])
+        self.owners = np.concatenate([self.owners[keep], np.full(len(widths), index)])
+
+
+class MaxRectsPacker(_FreeSheetPacker):
+    """MaxRects 排样算法（最短边优先），空间利用率高，适合尺寸差异较大的图形
+
+    多版面时对所有版面做首次适应，版面选择由 _MaxRectsSelector 一次查询完成。
+    """
+
+    name = 'maxrects'
+
+    def _new_sheet(self, width, height):
+        return _MaxRectsSheet(width, height)
+
+    def _new_selector(self, width, height):
+        return _MaxRectsSelector(width, height)
+
+
+def _range_max(values: np.ndarray, start: np.ndarray, stop: np.ndarray) -> np.ndarray:
+    """区间最大值查询，start/stop 为闭区间端点数组
+
+    线段较少时直接用一次广播比较求解，线段较多时使用稀疏表。
+    """
+    if len(values) <= RANGE_MAX_BROADCAST:
+        index = np.arange(len(values))
+        inside = (index >= start[:, None]) & (index <= stop[:, None])
+        return np.where(inside, values, -np.inf).max(axis=1)
+    levels = [values]
+    k = 1
+    while (1 << k) <= len(values):
+        prev = levels[-1]
+        half = 1 << (k - 1)
+        levels.append(np.maximum(prev[:-half], prev[half:]))
+        k += 1
+    power = np.log2(stop - start + 1).astype(int)
+    result = np.empty(len(start))
+    for level in np.unique(power):
+        m = power == level
+        table = levels[level]
+        result[m] = np.maximum(table[start[m]], table[stop[m] - (1 << level) + 1])
+    return result
+
+
+class _SkylineSheet:
+    """Skyline 版面：轮廓线由若干水平线段组成，以三个 NumPy 数组存储"""
+
+    __slots__ = ('x', 'y', 'w', 'width', 'height')
+
+    def __init__(self, width: float, height: float):
+        self.x = np.array([0.0])
+        self.y = np.array([0.0])
+        self.w = np.array([float(width)])
+        self.width = float(width)
+        self.height = float(height)
+
+    def free_size(self):
+        return self.width, self.height - float(self.y.min())
+
+    def find(self, width: float, height: float):
+        """最低水平线优先：在所有线段起点中选择放置后顶部最低的位置"""
+        starts = np.flatnonzero(self.x + width <= self.width + EPSILON)
+        if not starts.size:
+            return None
+        stops = np.searchsorted(self.x, self.x[starts] + width - EPSILON, side='left') - 1
+        base = _range_max(self.y, starts, stops)
+        valid = base + height <= self.height + EPSILON
+        if not valid.any():
+            return None
+        starts = starts[valid]
+        base = base[valid]
+        best = np.lexsort((self.x[starts], base + height))[0]
+        return float(self.x[starts[best]]), float(base[best])
+
+    def place(self, x: float, y: float, width: float, height: float,
+              min_width: float = 0.0, min_height: float = 0.0):
+        """把 [x, x + width] 范围内的轮廓线抬高到 y + height，并合并等高的相邻线段
+
+        min_width、min_height 为之后图形的最小尺寸，轮廓线不需要据此裁剪，不使用。
+        """
+        right = x + width
+        ends = self.x + self.w
+        left = ends <= x + EPSILON
+        after = self.x >= right - EPSILON
+        # 与放置区域右端部分重叠的线段保留右侧剩余部分
+        tail = ~left & ~after & (ends > right + EPSILON)
+
+        xs = np.concatenate([self.x[left], [x], np.full(tail.sum(), right), self.x[after]])
+        ys = np.concatenate([self.y[left], [y + height], self.y[tail], self.y[after]])
+        ws = np.concatenate([self.w[left], [width], ends[tail] - right, self.w[after]])
+        # 放置区域左端部分重叠的线段截短
+        head = ~left & (self.x < x - EPSILON)
+        if head.any():
+            index = np.flatnonzero(head)[0]
+            xs = np.concatenate([[self.x[index]], xs])
+            ys = np.concatenate([[self.y[index]], ys])
+            ws = np.concatenate([[x - self.x[index]], ws])
+            order = np.argsort(xs, kind='stable')
+            xs, ys, ws = xs[order], ys[order], ws[order]
+
+        # 合并等高的相邻线段
+        starts = np.concatenate([[True], np.abs(np.diff(ys)) > EPSILON])
+        index = np.flatnonzero(starts)
+        self.x = xs[index]
+        self.y = ys[index]
+        self.w = np.add.reduceat(ws, index)
+
+
+class SkylinePacker(_FreeSheetPacker):
+    """Skyline 排样算法（最低水平线优先），速度快，适合数量很多的图形"""
+
+    name = 'skyline'
+
+    @staticmethod
+    def _sort_order(records):
+        # 按高度降序放置时轮廓线更平整
+        return np.lexsort((-records['width'], -records['height']))
+
+    def _new_sheet(self, width, height):
+        return _SkylineSheet(width, height)
+
+
+def _rotate_outline(points: np.ndarray, width: float, height: float, rotation: int) -> np.ndarray:
+    """把相对于外包矩形左下角的坐标逆时针旋转 rotation 度，结果仍相对于旋转后外包矩形的左下角"""
+    x, y = points[:, 0], points[:, 1]
+    if rotation == 90:
+        return np.column_stack([height - y, x])
+    if rotation == 180:
+        return np.column_stack([width - x, height - y])
+    if rotation == 270:
+        return np.column_stack([y, width - x])
+    return points
+
+
+def _outline_mask(outline, width: float, height: float, cell_x: float, cell_y: float) -> np.ndarray:
+    """把轮廓折线栅格化为占用格子（行对应 y，第0行在最下方），并填充外轮廓围住的区域
+
+    折线按不超过四分之一格的步长采样，经过的格子都标记为占用；
+    再把每行、每列首尾两个占用格子之间的格子填满，两者的交集包含外轮廓内的全部区域。
+    没有轮廓时整个外包矩形都视为占用。
+    """
+    rows = max(1, math.ceil(height / cell_y - EPSILON))
+    cols = max(1, math.ceil(width / cell_x - EPSILON))
+    if not outline:
+        return np.ones((rows, cols), dtype=bool)
+
+    starts = np.concatenate([points if len(points) == 1 else points[:-1] for points in outline])
+    ends = np.concatenate([points if len(points) == 1 else points[1:] for points in outline])
+    lengths = np.hypot((ends[:, 0] - starts[:, 0]) / cell_x, (ends[:, 1] - starts[:, 1]) / cell_y)
+    steps = np.ceil(lengths * 4).astype(np.int64) + 1
+    segment = np.repeat(np.arange(len(starts)), steps)
+    t = (np.arange(len(segment)) - np.repeat(np.cumsum(steps) - steps, steps)) / np.repeat(
+        np.maximum(steps - 1, 1), steps)
+    samples = starts[segment] + (ends[segment] - starts[segment]) * t[:, None]
+    col = np.clip((samples[:, 0] / cell_x).astype(np.int64), 0, cols - 1)
+    row = np.clip((samples[:, 1] / cell_y).astype(np.int64), 0, rows - 1)
+
+    mask = np.zeros((rows, cols), dtype=bool)
+    mask[row, col] = True
+    row_fill = np.logical_or.accumulate(mask, axis=1) & np.logical_or.accumulate(mask[:, ::-1], axis=1)[:, ::-1]
+    col_fill = np.logical_or.accumulate(mask, axis=0) & np.logical_or.accumulate(mask[::-1], axis=0)[::-1]
+    return mask | (row_fill & col_fill)
+
+
+def _dilate(mask: np.ndarray, radius_x: int, radius_y: int, cell_x: float, cell_y: float,
+            gap: float) -> np.ndarray:
+    """把占用格子向四周扩大 gap，结果比原掩码每边多 radius 个格子
+
+    相差 (dx, dy) 个格子的两个格子，边缘之间的最近距离为
+    ((|dx| - 1) * cell_x, (|dy| - 1) * cell_y)（负值取 0）；距离小于 gap 的偏移都属于结构元素。
+    按格子中心判断（椭圆）会使斜向间距小于 gap。
+    """
+    rows, cols = mask.shape
+    dilated = np.zeros((rows + 2 * radius_y, cols + 2 * radius_x), dtype=bool)
+    for dy in range(-radius_y, radius_y + 1):
+        for dx in range(-radius_x, radius_x + 1):
+            distance_x = max(abs(dx) - 1, 0) * cell_x
+            distance_y = max(abs(dy) - 1, 0) * cell_y
+            if distance_x ** 2 + distance_y ** 2 < gap ** 2 - EPSILON or (dx == 0 and dy == 0):
+                dilated[radius_y + dy:radius_y + dy + rows, radius_x + dx:radius_x + dx + cols] |= mask
+    return dilated
+
+
+def _fft_size(size: int) -> int:
+    """不小于 size 且只含因子 2、3、5 的整数（这种长度的 FFT 最快）"""
+    while True:
+        rest = size
+        for factor in (2, 3, 5):
+            while rest % factor == 0:
+                rest //= factor
+        if rest == 1:
+            return size
+        size += 1
+
+
+class _PartShape:
+    """一个图形在某个旋转角度下的占用格子，以及按版面 FFT 尺寸计算的互相关核频谱"""
+    __slots__ = ('rotation', 'mask', 'dilated', 'cells', 'kernel')
+
+    def __init__(self, rotation: int, mask: np.ndarray, dilated: np.ndarray):
+        self.rotation = rotation
+        self.mask = mask
+        self.dilated = dilated
+        self.cells = int(mask.sum())
+        self.kernel = None
+
+
+class _MaskSheet:
+    """真实外形排样的一个版面
+
+    已放置图形（含间隙）占据的格子记录在 occupied 中。一个图形在每个位置与已占用格子的
+    重叠数就是 occupied 与图形掩码的互相关，用 FFT 一次算出全部候选位置，
+    再取最低（其次最左）的无重叠位置。占用格子只会增加，放不下的图形之后同样放不下。
+    """
+
+    def __init__(self, rows: int, cols: int):
+        self.occupied = np.zeros((rows, cols))
+        self.free_cells = rows * cols
+        # FFT 补零到更快的长度；有效位置上图形不会越过版面，补零不影响结果
+        self.fft_shape = (_fft_size(rows), _fft_size(cols))
+        self.spectrum = None
+        self.failed = set()
+
+    def find(self, key, shapes):
+        """返回 (行, 列, 图形形状) 或 None，shapes 为各旋转角度的 _PartShape"""
+        if key in self.failed:
+            return None
+        rows, cols = self.occupied.shape
+        if self.spectrum is None:
+            self.spectrum = np.fft.rfft2(self.occupied, s=self.fft_shape)
+        best = None
+        for shape in shapes:
+            if shape.cells > self.free_cells:
+                continue
+            if shape.kernel is None:
+                shape.kernel = np.conj(np.fft.rfft2(shape.mask, s=self.fft_shape))
+            height, width = shape.mask.shape
+            overlap = np.fft.irfft2(self.spectrum * shape.kernel, s=self.fft_shape)
+            free = overlap[:rows - height + 1, :cols - width + 1] < 0.5
+            free_rows = np.flatnonzero(free.any(axis=1))
+            if not len(free_rows):
+                continue
+            row = int(free_rows[0])
+            col = int(np.argmax(free[row]))
+            # 放置后顶边最低者优先，其次最左
+            if best is None or (row + height, col) < (best[0] + best[2].mask.shape[0], best[1]):
+                best = (row, col, shape)
+        if best is None:
+            self.failed.add(key)
+        return best
+
+    def place(self, row: int, col: int, shape: _PartShape, radius_x: int, radius_y: int):
+        rows, cols = self.occupied.shape
+        top, left = row - radius_y, col - radius_x
+        dilated = shape.dilated[max(0, -top):, max(0, -left):]
+        top, left = max(0, top), max(0, left)
+        dilated = dilated[:rows - top, :cols - left]
+        region = self.occupied[top:top + dilated.shape[0], left:left + dilated.shape[1]]
+        region[dilated] = 1.0
+        self.free_cells = int(self.occupied.size - np.count_nonzero(self.occupied))
+        self.spectrum = None
+
+
+class ShapePacker(RectanglePacker):
+    """真实外形排样：按图形轮廓（box['outline']，见 dxf_outline）而不是外包矩形放置
+
+    版面划分为约 NEST_RESOLUTION 格宽的占用格子，图形轮廓栅格化后按 NEST_ROTATIONS
+    中的角度尝试放置，取放置后顶边最低的位置，图形可以嵌入其他图形的凹处。
+    图形之间的间隙通过把已放置图形的占用格子扩大 gap 实现。没有轮廓的图形按外包矩形放置。
+    格子数固定，一次放置的耗时与版面上已有的图形数无关。
+    """
+
+    name = 'shape'
+
+    def pack(self, boxes, container_width, container_height, gap, multi_sheet=False):
+        table = as_box_table(boxes)
+        cell = max(container_width, container_height) / NEST_RESOLUTION
+        cols = max(1, round(container_width / cell))
+        rows = max(1, round(container_height / cell))
+        cell_x, cell_y = container_width / cols, container_height / rows
+        radius_x = math.ceil(gap / cell_x - EPSILON) if gap > 0 else 0
+        radius_y = math.ceil(gap / cell_y - EPSILON) if gap > 0 else 0
+
+        shapes = {}
+        sheet_list = []
+        items, sheets, xs, ys, rotations = [], [], [], [], []
+        oversized = []
+        leftover = []
+        last_key = None
+        for item in _FreeSheetPacker._sort_order(table.records).tolist():
+            key = int(table.records['box'][item])
+            if key != last_key and last_key is not None:
+                # 相同图形按排序连续放置，换到下一个图形时释放上一个图形的核频谱
+                for shape in shapes[last_key]:
+                    shape.kernel = None
+            last_key = key
+            if key not in shapes:
+                shapes[key] = self._part_shapes(table.boxes[key], cell_x, cell_y, rows, cols,
+                                                gap, radius_x, radius_y)
+            if not shapes[key]:
+                if multi_sheet:
+                    print(f"警告: 文件 {table.box(item)['doc_info']['name']} 的尺寸超出容器，单独放置在一个版面上")
+                    oversized.append(item)
+                else:
+                    leftover.append(item)
+                continue
+
+            found = None
+            for index in range(max(0, len(sheet_list) - MAX_OPEN_SHEETS), len(sheet_list)):
+                found = sheet_list[index].find(key, shapes[key])
+                if found is not None:
+                    break
+            if found is None:
+                if sheet_list and not multi_sheet:
+                    leftover.append(item)
+                    continue
+                sheet_list.append(_MaskSheet(rows, cols))
+                index = len(sheet_list) - 1
+                found = sheet_list[index].find(key, shapes[key])
+
+            row, col, shape = found
+            sheet_list[index].place(row, col, shape, radius_x, radius_y)
+            items.append(item)
+            sheets.append(index)
+            xs.append(col * cell_x)
+            ys.append(row * cell_y)
+            rotations.append(shape.rotation)
+
+        opened = len(sheet_list)
+        items += oversized
+        sheets += range(opened, opened + len(oversized))
+        xs += [0.0] * len(oversized)
+        ys += [0.0] * len(oversized)
+        rotations += [0] * len(oversized)
+        placements = self._sheet_placements(table, items, sheets, xs, ys, container_width, container_height,
+                                            rotations)
+        if leftover:
+            placements = PlacementTable.concat(
+                [placements, self._overflow_placements(table, leftover, container_width, gap)])
+        return placements
+
+    @staticmethod
+    def _part_shapes(box, cell_x, cell_y, rows, cols, gap, radius_x, radius_y):
+        """图形在各旋转角度下放得进空版面的形状（掩码相同的角度只保留一个）"""
+        width, height = box['width'], box['height']
+        outline = box.get('outline')
+        shapes = []
+        for rotation in NEST_ROTATIONS:
+            turned = rotation % 180 == 90
+            rotated = [_rotate_outline(points, width, height, rotation) for points in outline] if outline else None
+            mask = _outline_mask(rotated, height if turned else width, width if turned else height,
+                                 cell_x, cell_y)
+            if mask.shape[0] > rows or mask.shape[1] > cols:
+                continue
+            if any(shape.mask.shape == mask.shape and np.array_equal(shape.mask, mask) for shape in shapes):
+                continue
+            shapes.append(_PartShape(rotation, mask, _dilate(mask, radius_x, radius_y, cell_x, cell_y, gap)))
+        return shapes
+
+
+PACKERS = {
+    GridPacker.name: GridPacker,
+    MaxRectsPacker.name: MaxRectsPacker,
+    SkylinePacker.name: SkylinePacker,
+    ShapePacker.name: ShapePacker,
+}
+
+
+def get_packer(name: str) -> RectanglePacker:
+    """按名称创建排样器"""
+    try:
+        return PACKERS[name]()
+    except KeyError:
+        raise ValueError(f"未知的排样算法: {name}") from None
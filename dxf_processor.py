@@ -1,59 +1,470 @@
 import ezdxf
 from ezdxf import bbox
+from ezdxf.addons import iterdxf
 import os
 import math
-from typing import List, Tuple, Dict
-import numpy as np
+import queue
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, wraps
+import time
+from typing import Iterator, List, Tuple, Dict, Optional
+from ezdxf.math import BoundingBox, Matrix44, Vec3
+
+from dxf_extents import EXTENTS_MODES, fast_extents
+from dxf_geometry import GeometryStore
+from dxf_index import DXFIndex
+from dxf_outline import part_outline
+from dxf_packers import ShapePacker, get_packer
+from dxf_records import BoxTable
+from dxf_stats import PipelineStats
+from dxf_stream import StreamingDXFWriter
+
+# 文件数少于该值时串行读取，进程池的启动开销大于并行带来的收益
+PARALLEL_MIN_FILES = 8
+
+# 多版面输出方式：'offset' 所有版面偏移排列在同一文件中，'files' 每个版面一个文件
+SHEET_OUTPUT_MODES = ('offset', 'files')
+
+# 合并文件输出方式：'flatten' 复制全部实体到模型空间，'blocks' 每个源文件一个块定义、每个放置一个块引用
+OUTPUT_MODES = ('flatten', 'blocks', 'stream')
+
+# 流式扫描时每批计算外包矩形的实体数，决定扫描过程中驻留内存的实体上限
+STREAM_BATCH_SIZE = 1000
+
+# iter_process 估算总体进度时各阶段所占的权重
+PROGRESS_WEIGHTS = {
+    'parse': 0.35,
+    'stream_scan': 0.35,
+    'extents': 0.25,
+    'pack': 0.10,
+    'copy': 0.25,
+    'save': 0.05,
+}
+
+
+class PipelineCancelled(BaseException):
+    """处理流程被取消
+
+    继承 BaseException（与 KeyboardInterrupt 一样），不会被各阶段中的 except Exception 当作普通错误处理。
+    """
+
+
+def _timed_call(worker, file_path: str):
+    """进程池工作函数包装：返回 (工作函数结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = worker(file_path)
+    return result, time.perf_counter() - start
+
+
+def _stage(name: str):
+    """方法装饰器：把方法的执行时间记录到 self.stats 的 name 阶段"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.stats.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _load_dxf_document(file_path: str):
+    """进程池工作函数：读取单个DXF文件，返回 (文档, 错误信息)"""
+    try:
+        return ezdxf.readfile(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _measure_entities(entities, extents_mode: str) -> BoundingBox:
+    """按指定模式计算一组实体的外包矩形"""
+    if extents_mode == 'ezdxf':
+        return bbox.extents(entities)
+    return fast_extents(entities, extents_mode)
+
+
+def _load_geometry(file_path: str):
+    """进程池工作函数（低内存模式）：读取文件并转换为紧凑几何存储，返回 (GeometryStore, 错误信息)"""
+    doc, error = _load_dxf_document(file_path)
+    if doc is None:
+        return None, error
+    try:
+        return GeometryStore.from_entities(doc.modelspace()), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _scan_geometry(file_path: str, extents_mode: str = 'ezdxf'):
+    """进程池工作函数（低内存模式）：读取文件，计算外包矩形并转换为紧凑几何存储
+    
+    完整文档在工作函数返回前释放，只有几何存储传回主进程。
+    返回 ((extmin, extmax, 实体数, 图层列表, GeometryStore), 错误信息)，没有几何实体时 extmin/extmax 为None
+    """
+    doc, error = _load_dxf_document(file_path)
+    if doc is None:
+        return None, error
+    try:
+        msp = doc.modelspace()
+        extents = _measure_entities(msp, extents_mode)
+        layers = sorted({entity.dxf.layer for entity in msp})
+        geometry = GeometryStore.from_entities(msp)
+        if not extents.has_data:
+            return (None, None, len(msp), layers, geometry), None
+        return (extents.extmin, extents.extmax, len(msp), layers, geometry), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _stream_scan_file(file_path: str, extents_mode: str = 'ezdxf'):
+    """进程池工作函数：流式扫描模型空间，不构建完整文档
+    
+    返回 ((extmin, extmax, 实体数, 图层列表), 错误信息)，没有几何实体时 extmin/extmax 为None。
+    流式扫描无法解析块引用等依赖文档其余部分的实体，扫描失败时改为完整读取该文件计算外包矩形
+    （文档在返回前释放，完整读取仍推迟到写出时），此时扫描结果和扫描失败的原因都会返回。
+    """
+    try:
+        extents = BoundingBox()
+        entity_count = 0
+        layers = set()
+        batch = []
+        for entity in iterdxf.modelspace(file_path):
+            entity_count += 1
+            layers.add(entity.dxf.layer)
+            batch.append(entity)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                extents.extend(_measure_entities(batch, extents_mode))
+                batch = []
+        if batch:
+            extents.extend(_measure_entities(batch, extents_mode))
+        if not extents.has_data:
+            return (None, None, entity_count, sorted(layers)), None
+        return (extents.extmin, extents.extmax, entity_count, sorted(layers)), None
+    except Exception as e:
+        reason = str(e)
+    doc, error = _load_dxf_document(file_path)
+    if doc is None:
+        return None, error
+    try:
+        msp = doc.modelspace()
+        extents = _measure_entities(msp, extents_mode)
+        layers = sorted({entity.dxf.layer for entity in msp})
+        if not extents.has_data:
+            return (None, None, len(msp), layers), reason
+        return (extents.extmin, extents.extmax, len(msp), layers), reason
+    except Exception as e:
+        return None, str(e)
+
+
+def _rotated_offset(box: Dict, rotation: float) -> Tuple[float, float]:
+    """绕原外包矩形左下角旋转 rotation 度后，新外包矩形左下角相对于旋转中心的偏移"""
+    angle = math.radians(rotation)
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    corners = [(0.0, 0.0), (box['width'], 0.0), (0.0, box['height']), (box['width'], box['height'])]
+    return (min(x * cos_a - y * sin_a for x, y in corners),
+            min(x * sin_a + y * cos_a for x, y in corners))
+
+
+def _placement_matrix(box: Dict, target: Tuple[float, float], rotation: float) -> Matrix44:
+    """放置变换矩阵：绕原外包矩形左下角旋转 rotation 度，再平移使旋转后外包矩形的左下角落在 target"""
+    extmin = Vec3(box['original_extmin'])
+    min_x, min_y = _rotated_offset(box, rotation)
+    return Matrix44.chain(
+        Matrix44.translate(-extmin.x, -extmin.y, 0),
+        Matrix44.z_rotate(math.radians(rotation)),
+        Matrix44.translate(target[0] - min_x, target[1] - min_y, 0),
+    )
+
+
+def _block_name(index: int, file_name: str) -> str:
+    """由源文件名生成合法的块名（去掉DXF名称中不允许的字符）"""
+    stem = re.sub(r'[<>/\\":;?*|=`,\s]+', '_', os.path.splitext(file_name)[0])
+    return f"PART{index + 1}_{stem}"
+
 
 class DXFProcessor:
-    def __init__(self):
+    def __init__(self, index_path: Optional[str] = None, low_memory: bool = False):
         self.documents = []
         self.bounding_boxes = []
+        self.load_errors = {}
+        self.output_paths = []
+        # 最近一次 create_merged_dxf 生成的文档，与 output_paths 一一对应，预览时无需重新读取输出文件
+        self.merged_docs = []
+        self.workers = None
+        self.parallel_threshold = PARALLEL_MIN_FILES
+        # 可选的持久化元数据索引，命中时无需解析文件即可得到外包矩形
+        self.index = DXFIndex(index_path) if index_path else None
+        # 各阶段耗时、每个文件的耗时和计数器，可通过 self.stats.add_hook() 注册回调
+        self.stats = PipelineStats()
+        # 设置后各阶段在处理完当前文件（或图形）时抛出 PipelineCancelled
+        self.cancel_event = None
+        # 低内存模式：文件读取后立即转换为紧凑几何存储（doc_info['geometry']，见 dxf_geometry），
+        # 不保留完整文档，合并文件直接从几何存储写出
+        self.low_memory = low_memory
+    
+    def cancel(self):
+        """请求取消正在进行的处理（由其他线程调用）"""
+        if self.cancel_event is None:
+            self.cancel_event = threading.Event()
+        self.cancel_event.set()
+    
+    def _progress(self, stage: str, done: int, total: int, file_path: Optional[str] = None):
+        """检查是否已请求取消，然后通过 self.stats 发出进度事件"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise PipelineCancelled(stage)
+        self.stats.progress(stage, done, total, file_path)
+        
+    def _map_files(self, worker, file_paths: List[str], stage: str) -> List[Tuple]:
+        """对一组文件执行工作函数，文件较多时使用进程池，结果保持输入顺序
+        
+        每个文件的耗时记录在 self.stats 的 stage 阶段下。
+        """
+        workers = self.workers if self.workers is not None else (os.cpu_count() or 1)
+        workers = min(workers, len(file_paths))
+        timed_worker = partial(_timed_call, worker)
+        total = len(file_paths)
+        if total:
+            self._progress(stage, 0, total)
+        
+        results = None
+        if workers > 1 and total >= self.parallel_threshold:
+            executor = None
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                results = []
+                for file_path, result in zip(file_paths, executor.map(timed_worker, file_paths)):
+                    results.append(result)
+                    self.stats.record_file(file_path, stage, result[1])
+                    self._progress(stage, len(results), total, file_path)
+            except Exception as e:
+                # 进程池不可用（如受限环境）时退回串行处理
+                print(f"并行处理不可用，改为串行处理: {e}")
+                results = None
+            finally:
+                if executor is not None:
+                    # 取消时不再等待尚未开始的文件
+                    executor.shutdown(wait=True, cancel_futures=True)
+        if results is None:
+            results = []
+            for file_path in file_paths:
+                results.append(timed_worker(file_path))
+                self.stats.record_file(file_path, stage, results[-1][1])
+                self._progress(stage, len(results), total, file_path)
         
-    def read_dxf_files(self, file_paths: List[str]) -> bool:
-        """读取多个DXF文件"""
+        return [result for result, _ in results]
+        
+    @_stage('read_dxf_files')
+    def read_dxf_files(self, file_paths: List[str], workers: Optional[int] = None,
+                       parallel_threshold: int = PARALLEL_MIN_FILES,
+                       defer_load: bool = False, quantities: Optional[List[int]] = None) -> bool:
+        """读取多个DXF文件
+        
+        workers 为进程数（None 表示使用全部CPU核心，1 表示串行读取）；
+        文件数少于 parallel_threshold 时总是串行读取。结果保持输入顺序，
+        每个失败的文件都会记录在 self.load_errors 中。
+        启用索引时，索引命中的文件推迟到 create_merged_dxf 需要实体时再解析；
+        defer_load 为True时所有文件都推迟解析（配合流式扫描使用）。低内存模式下也推迟解析，
+        由 calculate_bounding_boxes 在同一次读取中计算外包矩形并转换为紧凑几何存储。
+        
+        quantities 为每个文件需要排样的数量（默认各1个）。同一文件出现多次时
+        数量累加，每个文件只读取一次，数量记录在 doc_info['quantity'] 中。
+        """
         self.documents = []
+        self.load_errors = {}
+        self.workers = workers
+        self.parallel_threshold = parallel_threshold
+        
+        # 合并重复的文件，数量累加
+        if quantities is None:
+            quantities = [1] * len(file_paths)
+        unique_paths = {}
+        for file_path, quantity in zip(file_paths, quantities):
+            if not isinstance(quantity, int) or quantity < 1:
+                self.load_errors[file_path] = f"数量无效: {quantity}"
+                print(f"读取文件失败 {file_path}: 数量必须为正整数")
+                continue
+            key = os.path.normcase(os.path.abspath(file_path))
+            if key in unique_paths:
+                unique_paths[key] = (unique_paths[key][0], unique_paths[key][1] + quantity)
+            else:
+                unique_paths[key] = (file_path, quantity)
+        file_paths = [file_path for file_path, _ in unique_paths.values()]
+        quantity_of = dict(unique_paths.values())
+        
+        index_entries = {}
+        if self.index is not None:
+            for file_path in file_paths:
+                entry = self.index.lookup(file_path)
+                if entry is not None:
+                    index_entries[file_path] = entry
+        
+        defer_load = defer_load or self.low_memory
+        to_load = [] if defer_load else [path for path in file_paths if path not in index_entries]
+        loaded = dict(zip(to_load, self._map_files(_load_dxf_document, to_load, 'parse')))
         
         for file_path in file_paths:
-            try:
-                doc = ezdxf.readfile(file_path)
-                self.documents.append({
-                    'doc': doc,
+            if file_path in index_entries or defer_load:
+                if not os.path.isfile(file_path):
+                    self.load_errors[file_path] = "文件不存在"
+                    print(f"读取文件失败 {file_path}: 文件不存在")
+                    continue
+                doc_info = {
+                    'doc': None,
                     'file_path': file_path,
-                    'name': os.path.basename(file_path)
-                })
-                print(f"成功读取文件: {file_path}")
-            except Exception as e:
-                print(f"读取文件失败 {file_path}: {e}")
-                return False
+                    'name': os.path.basename(file_path),
+                    'quantity': quantity_of[file_path]
+                }
+                if file_path in index_entries:
+                    doc_info['index_entry'] = index_entries[file_path]
+                    self.stats.count('index_hits')
+                    print(f"索引命中，延迟读取文件: {file_path}")
+                else:
+                    self.stats.count('files_deferred')
+                    print(f"延迟读取文件: {file_path}")
+                self.documents.append(doc_info)
+                continue
+            
+            doc, error = loaded[file_path]
+            if doc is None:
+                self.stats.count('load_failures')
+                self.load_errors[file_path] = error
+                print(f"读取文件失败 {file_path}: {error}")
+                continue
+            self.documents.append({
+                'doc': doc,
+                'file_path': file_path,
+                'name': os.path.basename(file_path),
+                'quantity': quantity_of[file_path]
+            })
+            self.stats.count('files_loaded')
+            print(f"成功读取文件: {file_path}")
                 
+        return not self.load_errors
+    
+    def _ensure_documents(self, doc_infos: List[Dict]) -> bool:
+        """为尚未解析的文件（索引命中或延迟读取时）加载完整文档，低内存模式下加载紧凑几何存储"""
+        pending = []
+        seen = set()
+        for doc_info in doc_infos:
+            if doc_info['doc'] is None and doc_info.get('geometry') is None and id(doc_info) not in seen:
+                seen.add(id(doc_info))
+                pending.append(doc_info)
+        if not pending:
+            return True
+        
+        key = 'geometry' if self.low_memory else 'doc'
+        results = self._map_files(_load_geometry if self.low_memory else _load_dxf_document,
+                                  [info['file_path'] for info in pending], 'parse')
+        for doc_info, (loaded, error) in zip(pending, results):
+            if loaded is None:
+                self.load_errors[doc_info['file_path']] = error
+                print(f"读取文件失败 {doc_info['file_path']}: {error}")
+                return False
+            doc_info[key] = loaded
         return True
     
-    def calculate_bounding_boxes(self) -> bool:
-        """计算每个DXF文件的最小外包矩形"""
+    @_stage('calculate_bounding_boxes')
+    def calculate_bounding_boxes(self, extents_mode: str = 'ezdxf', streaming: bool = False) -> bool:
+        """计算每个DXF文件的最小外包矩形
+        
+        extents_mode 为 'ezdxf' 时使用 ezdxf.bbox.extents；
+        为 'exact' 或 'hull' 时使用 dxf_extents 中的向量化计算（见该模块说明）。
+        streaming 为True时，对尚未解析的文件逐批流式扫描模型空间实体，
+        不构建完整文档，完整读取推迟到 create_merged_dxf。
+        低内存模式下，尚未解析的文件在同一次读取中计算外包矩形并转换为紧凑几何存储，
+        已有的完整文档在计算外包矩形后也转换并释放。
+        """
+        if extents_mode != 'ezdxf' and extents_mode not in EXTENTS_MODES:
+            print(f"未知的外包矩形计算模式: {extents_mode}")
+            return False
+        
         self.bounding_boxes = []
         
-        for doc_info in self.documents:
+        # 由更粗略的方式（如 'hull'）算出的索引项不能用于更精确的计算，按未命中重新计算
+        for info in self.documents:
+            entry = info.get('index_entry')
+            if entry is not None and not DXFIndex.accepts(entry, extents_mode):
+                info['index_entry'] = None
+        
+        pending = [info for info in self.documents
+                   if info['doc'] is None and info.get('index_entry') is None]
+        scans = {}
+        if streaming:
+            results = self._map_files(partial(_stream_scan_file, extents_mode=extents_mode),
+                                      [info['file_path'] for info in pending], 'stream_scan')
+            for doc_info, (scan, error) in zip(pending, results):
+                if scan is None:
+                    print(f"读取文件失败 {doc_info['name']}: {error}")
+                    return False
+                if error is not None:
+                    print(f"流式扫描失败 {doc_info['name']}（{error}），已改为完整读取计算外包矩形")
+                    self.stats.count('stream_scan_fallbacks')
+                scans[id(doc_info)] = scan
+        elif self.low_memory:
+            results = self._map_files(partial(_scan_geometry, extents_mode=extents_mode),
+                                      [info['file_path'] for info in pending], 'parse')
+            for doc_info, (scan, error) in zip(pending, results):
+                if scan is None:
+                    self.load_errors[doc_info['file_path']] = error
+                    print(f"读取文件失败 {doc_info['file_path']}: {error}")
+                    return False
+                scans[id(doc_info)] = scan[:4]
+                doc_info['geometry'] = scan[4]
+                self.stats.count('files_loaded')
+        elif not self._ensure_documents(pending):
+            return False
+        
+        for number, doc_info in enumerate(self.documents, 1):
+            self._progress('extents', number - 1, len(self.documents), doc_info['file_path'])
             try:
-                doc = doc_info['doc']
-                msp = doc.modelspace()
-                
-                # 计算包围盒
-                bounding_box = bbox.extents(msp)
+                entry = doc_info.get('index_entry')
+                scan = scans.get(id(doc_info))
+                if entry is not None:
+                    # 索引命中，直接使用缓存的外包矩形
+                    bounding_box = BoundingBox([Vec3(entry['extmin']), Vec3(entry['extmax'])])
+                    entity_count = entry['entity_count']
+                    layers = entry['layers']
+                elif scan is not None:
+                    extmin, extmax, entity_count, layers = scan
+                    bounding_box = BoundingBox([extmin, extmax]) if extmin is not None else BoundingBox()
+                else:
+                    doc = doc_info['doc']
+                    msp = doc.modelspace()
+                    
+                    # 计算包围盒
+                    start = time.perf_counter()
+                    bounding_box = _measure_entities(msp, extents_mode)
+                    self.stats.record_file(doc_info['file_path'], 'extents', time.perf_counter() - start)
+                    entity_count = len(msp)
+                    layers = sorted({entity.dxf.layer for entity in msp})
+                    if self.low_memory:
+                        doc_info['geometry'] = GeometryStore.from_entities(msp)
+                        doc_info['doc'] = None
+                    
                 if bounding_box.has_data:
                     extent = bounding_box.extmax - bounding_box.extmin
                     width = extent.x
                     height = extent.y
                     
+                    if entry is None and self.index is not None:
+                        doc_info['index_entry'] = self.index.update(
+                            doc_info['file_path'], bounding_box.extmin, bounding_box.extmax,
+                            entity_count, layers, extents_mode)
+                    
                     self.bounding_boxes.append({
                         'doc_info': doc_info,
                         'bbox': bounding_box,
                         'width': width,
                         'height': height,
                         'original_extmin': bounding_box.extmin.copy(),
-                        'original_extmax': bounding_box.extmax.copy()
+                        'original_extmax': bounding_box.extmax.copy(),
+                        'entity_count': entity_count,
+                        'layers': layers,
+                        'quantity': doc_info.get('quantity', 1)
                     })
-                    print(f"文件 {doc_info['name']} 的外包矩形: {width:.2f} x {height:.2f}")
+                    self.stats.count('entities', entity_count)
+                    print(f"文件 {doc_info['name']} 的外包矩形: {width:.2f} x {height:.2f}"
+                          f" (数量 {doc_info.get('quantity', 1)})")
                 else:
                     print(f"警告: 文件 {doc_info['name']} 没有找到几何实体")
                     return False
@@ -61,180 +472,380 @@ class DXFProcessor:
             except Exception as e:
                 print(f"计算外包矩形失败 {doc_info['name']}: {e}")
                 return False
+        self._progress('extents', len(self.documents), len(self.documents))
+        
+        if self.index is not None:
+            try:
+                self.index.save()
+            except Exception as e:
+                print(f"保存索引文件失败 {self.index.index_path}: {e}")
                 
         return True
     
-    def pack_rectangles(self, container_width: float = 100.0, container_height: float = 100.0, gap: float = 0.5) -> List[Dict]:
-        """网格排样算法 - 从左到右，从上到下排列，然后整体居中"""
-        # 按面积降序排序
-        sorted_boxes = sorted(self.bounding_boxes, 
-                            key=lambda x: x['width'] * x['height'], 
-                            reverse=True)
-        
-        # 计算网格行列数
-        total_area = sum(box['width'] * box['height'] for box in sorted_boxes)
-        avg_width = sum(box['width'] for box in sorted_boxes) / len(sorted_boxes) if sorted_boxes else 1
-        avg_height = sum(box['height'] for box in sorted_boxes) / len(sorted_boxes) if sorted_boxes else 1
-        
-        # 估算网格尺寸
-        grid_cols = max(1, int(math.sqrt(len(sorted_boxes) * avg_width / avg_height * container_height / container_width)))
-        grid_rows = max(1, math.ceil(len(sorted_boxes) / grid_cols))
-        
-        # 动态调整网格大小直到能容纳所有图形
-        while True:
-            # 计算每个网格单元的大小
-            max_width_in_col = [0] * grid_cols
-            max_height_in_row = [0] * grid_rows
-            
-            # 为每个图形分配网格位置并计算行列最大尺寸
-            for i, box in enumerate(sorted_boxes):
-                row = i // grid_cols
-                col = i % grid_cols
-                if row < grid_rows and col < grid_cols:
-                    max_width_in_col[col] = max(max_width_in_col[col], box['width'])
-                    max_height_in_row[row] = max(max_height_in_row[row], box['height'])
-            
-            # 计算总宽度和高度
-            total_width = sum(max_width_in_col) + (grid_cols - 1) * gap
-            total_height = sum(max_height_in_row) + (grid_rows - 1) * gap
-            
-            # 检查是否适合容器
-            if total_width <= container_width and total_height <= container_height:
-                break
-            
-            # 如果不适合，增加网格尺寸
-            if total_width > container_width:
-                grid_cols += 1
-            if total_height > container_height:
-                grid_rows = max(1, math.ceil(len(sorted_boxes) / grid_cols))
-            
-            # 避免无限循环
-            if grid_cols > len(sorted_boxes):
-                grid_cols = len(sorted_boxes)
-                grid_rows = 1
-                break
-        
-        # 重新计算行列最大尺寸
-        max_width_in_col = [0] * grid_cols
-        max_height_in_row = [0] * grid_rows
-        
-        for i, box in enumerate(sorted_boxes):
-            row = i // grid_cols
-            col = i % grid_cols
-            if row < grid_rows and col < grid_cols:
-                max_width_in_col[col] = max(max_width_in_col[col], box['width'])
-                max_height_in_row[row] = max(max_height_in_row[row], box['height'])
-        
-        # 计算整体偏移以居中放置
-        total_width = sum(max_width_in_col) + (grid_cols - 1) * gap
-        total_height = sum(max_height_in_row) + (grid_rows - 1) * gap
-        offset_x = (container_width - total_width) / 2
-        offset_y = (container_height - total_height) / 2
-        
-        # 计算每个图形的位置
-        placements = []
-        current_y = offset_y
-        
-        for row in range(grid_rows):
-            current_x = offset_x
-            for col in range(grid_cols):
-                index = row * grid_cols + col
-                if index < len(sorted_boxes):
-                    box = sorted_boxes[index]
-                    # 在网格单元内居中放置
-                    pos_x = current_x + (max_width_in_col[col] - box['width']) / 2
-                    pos_y = current_y + (max_height_in_row[row] - box['height']) / 2
-                    
-                    placements.append({
-                        'box': box,
-                        'position': (pos_x, pos_y),
-                        'rotation': 0
-                    })
-                current_x += max_width_in_col[col] + gap
-            if row < grid_rows - 1:  # 非最后一行才更新Y坐标
-                current_y += max_height_in_row[row] + gap
+    @_stage('extract_outlines')
+    def _ensure_outlines(self):
+        """为真实外形排样提取各图形的轮廓，保存在外包矩形的 'outline' 中（只提取一次）
+
+        尚未解析的文件先加载文档（低内存模式下为紧凑几何存储，写入临时文档后提取）。
+        无法提取轮廓的图形不保存轮廓，排样时按外包矩形放置。
+        """
+        pending = [box for box in self.bounding_boxes if 'outline' not in box]
+        if not pending or not self._ensure_documents([box['doc_info'] for box in pending]):
+            return
+        for box in pending:
+            doc_info = box['doc_info']
+            try:
+                if doc_info['doc'] is not None:
+                    entities = doc_info['doc'].modelspace()
+                else:
+                    entities = ezdxf.new('R2010').modelspace()
+                    doc_info['geometry'].emit(entities)
+                box['outline'] = part_outline(entities, box['original_extmin'], box['width'], box['height'])
+            except Exception as e:
+                print(f"提取轮廓失败 {doc_info['name']}: {e}，按外包矩形排样")
+                box['outline'] = None
+    
+    @_stage('pack_rectangles')
+    def pack_rectangles(self, container_width: float = 100.0, container_height: float = 100.0, gap: float = 0.5,
+                        multi_sheet: bool = False, algorithm: str = 'grid') -> List[Dict]:
+        """排样布局
+        
+        algorithm 选择排样算法（见 dxf_packers）：'grid' 网格排样（默认），
+        'maxrects'、'skyline'，或按图形轮廓排样的 'shape'。multi_sheet 为True时，
+        一个容器放不下的图形依次溢出到第2、3…个版面。
         
+        数量大于1的文件按数量展开为多个图形，它们共享同一个外包矩形记录
+        （placement['box'] 指向同一个字典），几何数据只保存一份。
+        返回 PlacementTable（见 dxf_records），可按 placement 字典的方式访问。
+        """
+        if algorithm == ShapePacker.name:
+            self._ensure_outlines()
+        boxes = BoxTable.from_quantities(self.bounding_boxes)
+        self._progress('pack', 0, 1)
+        placements = get_packer(algorithm).pack(boxes, container_width, container_height,
+                                                gap, multi_sheet)
+        self._progress('pack', 1, 1)
+        self.stats.count('placements', len(placements))
         return placements
     
-    def create_merged_dxf(self, placements: List[Dict], output_path: str = "merged_output.dxf") -> bool:
-        """创建合并后的DXF文件"""
+    @_stage('create_merged_dxf')
+    def create_merged_dxf(self, placements: List[Dict], output_path: str = "merged_output.dxf",
+                          container_width: float = 100.0, container_height: float = 100.0,
+                          sheet_output: str = 'offset', output_mode: str = 'flatten') -> bool:
+        """创建合并后的DXF文件
+        
+        多版面排样结果按 sheet_output 输出：'offset' 时所有版面按 sheet_origin
+        偏移后写入同一文件；'files' 时每个版面写入一个文件（文件名追加 _sheetN）。
+        实际写出的文件路径记录在 self.output_paths 中，对应的文档保留在
+        self.merged_docs 中（可直接用于生成预览）。
+        
+        output_mode 为 'flatten'（默认）时把每个放置的全部实体复制到模型空间；
+        为 'blocks' 时每个源文件只写一次块定义，每个放置写一个块引用（INSERT），
+        同一文件放置多次时输出文件小得多；为 'stream' 时与 'flatten' 输出相同的实体，
+        但逐个图形写入文件，不在内存中保留合并文档（self.merged_docs 为空，见 _stream_merged_dxf）。
+        """
+        if sheet_output not in SHEET_OUTPUT_MODES:
+            print(f"未知的版面输出方式: {sheet_output}")
+            return False
+        if output_mode not in OUTPUT_MODES:
+            print(f"未知的输出方式: {output_mode}")
+            return False
+        
         try:
-            # 创建新的DXF文档
-            merged_doc = ezdxf.new('R2010')
-            merged_msp = merged_doc.modelspace()
+            # 索引命中的文件此时才需要解析（流式写出时逐个文件解析）
+            if output_mode != 'stream' and \
+                    not self._ensure_documents([p['box']['doc_info'] for p in placements]):
+                return False
             
-            # 添加边框以显示10x10cm区域
-            self._add_border(merged_msp, 100.0, 100.0)
+            sheets = sorted({p.get('sheet', 0) for p in placements})
+            if sheet_output == 'files' and len(sheets) > 1:
+                root, ext = os.path.splitext(output_path)
+                outputs = [([p for p in placements if p.get('sheet', 0) == sheet],
+                            f"{root}_sheet{sheet + 1}{ext}", False) for sheet in sheets]
+            else:
+                outputs = [(placements, output_path, True)]
             
-            # 复制并放置每个图形
-            for placement in placements:
-                box = placement['box']
-                pos_x, pos_y = placement['position']
-                rotation = placement.get('rotation', 0)
+            self.output_paths = []
+            self.merged_docs = []
+            copied = 0
+            for number, (sheet_placements, path, use_origin) in enumerate(outputs):
+                if output_mode == 'stream':
+                    if not self._stream_merged_dxf(sheet_placements, path, container_width, container_height,
+                                                   use_origin, progress=(copied, len(placements))):
+                        return False
+                    copied += len(sheet_placements)
+                    self.stats.count('output_files')
+                    self.output_paths.append(path)
+                    print(f"合并后的DXF文件已保存: {path}")
+                    continue
                 
-                # 计算平移向量
-                original_min = box['original_extmin']
-                target_min = ezdxf.math.Vec3(pos_x, pos_y, 0)
-                translation_vector = target_min - original_min
+                merged_doc = self._build_merged_doc(sheet_placements, container_width,
+                                                    container_height, use_origin, output_mode,
+                                                    progress=(copied, len(placements)))
+                copied += len(sheet_placements)
                 
-                # 如果有旋转，则先将实体复制到临时空间进行旋转
-                if rotation != 0:
-                    # 创建临时模型空间用于旋转操作
-                    temp_doc = ezdxf.new()
-                    temp_msp = temp_doc.modelspace()
-                    
-                    # 复制实体到临时空间（不进行平移）
-                    self._copy_entities(box['doc_info']['doc'].modelspace(), temp_msp, ezdxf.math.Vec3(0, 0, 0))
-                    
-                    # 对临时空间中的所有实体进行旋转
-                    for entity in temp_msp:
-                        if hasattr(entity, 'rotate_z'):
-                            # 使用角度制旋转
-                            entity.rotate_z(math.radians(rotation))
-                    
-                    # 将旋转后的实体复制到目标文件并应用平移
-                    self._copy_entities(temp_msp, merged_msp, translation_vector)
-                else:
-                    # 复制实体并应用平移
-                    self._copy_entities(box['doc_info']['doc'].modelspace(), 
-                                      merged_msp, translation_vector)
-            
-            # 保存文件
-            merged_doc.saveas(output_path)
-            print(f"合并后的DXF文件已保存: {output_path}")
+                # 保存文件
+                self._progress('save', number, len(outputs), path)
+                with self.stats.stage('save_dxf'):
+                    merged_doc.saveas(path)
+                self._progress('save', number + 1, len(outputs), path)
+                self.stats.count('output_files')
+                self.output_paths.append(path)
+                self.merged_docs.append(merged_doc)
+                print(f"合并后的DXF文件已保存: {path}")
             return True
             
         except Exception as e:
             print(f"创建合并DXF文件失败: {e}")
             return False
     
-    def _add_border(self, msp, width: float, height: float):
+    def iter_process(self, file_paths: List[str], output_path: str = "merged_output.dxf",
+                     container_width: float = 100.0, container_height: float = 100.0, gap: float = 0.5,
+                     quantities: Optional[List[int]] = None, workers: Optional[int] = None,
+                     extents_mode: str = 'ezdxf', streaming: bool = False, multi_sheet: bool = False,
+                     algorithm: str = 'grid', sheet_output: str = 'offset', output_mode: str = 'flatten',
+                     cancel_event: Optional[threading.Event] = None) -> Iterator[Dict]:
+        """执行完整流程（读取、计算外包矩形、排样、生成合并文件），逐个产生进度事件
+        
+        流程在后台线程中执行，本生成器依次产生：
+        - {'event': 'progress', 'stage': 阶段, 'done': 已完成数, 'total': 总数,
+           'file_path': 当前文件, 'fraction': 总体进度(0~1，按 PROGRESS_WEIGHTS 估算)}，
+          阶段为 'parse'、'stream_scan'、'extents'、'pack'、'copy' 或 'save'；
+        - 最后一个事件 {'event': 'finished', 'ok': 是否成功, 'cancelled': 是否被取消,
+          'placements': 排样结果, 'error': 错误信息}。
+        
+        设置 cancel_event（或调用 self.cancel()、提前关闭生成器）后，流程在处理完
+        当前文件或图形时停止，最后一个事件的 cancelled 为True；等待事件时按 Ctrl+C 也会取消。
+        
+        output_mode 为 'stream' 时按 streaming=True 处理：源文件推迟到写出时才解析，
+        否则读取阶段就会把全部文档载入内存，流式写出也就不能限制内存峰值。
+        流式扫描处理不了的文件（如含块引用）改为完整读取计算外包矩形，输出方式不影响能合并哪些文件。
+        """
+        streaming = streaming or output_mode == 'stream'
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        events = queue.Queue()
+        progress = {}
+        fraction = 0.0
+        
+        def hook(event, name, data):
+            if event == 'progress':
+                events.put(('progress', name, data))
+        
+        def work():
+            result = {'event': 'finished', 'ok': False, 'cancelled': False, 'placements': [], 'error': None}
+            try:
+                if not self.read_dxf_files(file_paths, workers=workers, defer_load=streaming,
+                                           quantities=quantities):
+                    result['error'] = "读取DXF文件失败"
+                elif not self.calculate_bounding_boxes(extents_mode=extents_mode, streaming=streaming):
+                    result['error'] = "计算外包矩形失败"
+                else:
+                    placements = self.pack_rectangles(container_width, container_height, gap,
+                                                      multi_sheet=multi_sheet, algorithm=algorithm)
+                    result['placements'] = placements
+                    if self.create_merged_dxf(placements, output_path, container_width, container_height,
+                                              sheet_output=sheet_output, output_mode=output_mode):
+                        result['ok'] = True
+                    else:
+                        result['error'] = "创建合并DXF文件失败"
+            except PipelineCancelled:
+                result['cancelled'] = True
+                result['error'] = "已取消"
+            except Exception as e:
+                result['error'] = str(e)
+            events.put(('finished', None, result))
+        
+        self.stats.add_hook(hook)
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        finished = False
+        try:
+            while True:
+                try:
+                    kind, stage, data = events.get()
+                except KeyboardInterrupt:
+                    # 在主线程中迭代时按 Ctrl+C 等同于取消，继续等待流程停止
+                    self.cancel_event.set()
+                    continue
+                if kind == 'finished':
+                    finished = True
+                    yield data
+                    return
+                progress[stage] = data['done'] / data['total'] if data['total'] else 1.0
+                # 同一阶段可能再次出现（如延迟解析的文件在生成合并文件前才读取），总体进度只增不减
+                fraction = max(fraction, min(sum(PROGRESS_WEIGHTS.get(name, 0.0) * value
+                                                 for name, value in progress.items()), 1.0))
+                yield {'event': 'progress', 'stage': stage, 'done': data['done'], 'total': data['total'],
+                       'file_path': data['file_path'], 'fraction': fraction}
+        finally:
+            # 调用方在流程结束前停止迭代时取消流程；等待后台线程退出后清除取消状态，
+            # 否则之后对同一处理器的调用都会被当作已取消
+            if not finished:
+                self.cancel_event.set()
+            worker.join()
+            self.cancel_event = None
+            self.stats.remove_hook(hook)
+    
+    def _build_merged_doc(self, placements: List[Dict], container_width: float,
+                          container_height: float, use_origin: bool, output_mode: str = 'flatten',
+                          progress: Tuple[int, int] = (0, 0)):
+        """构建合并后的DXF文档，use_origin 为True时按版面原点偏移
+        
+        progress 为 (此前已复制的图形数, 全部图形数)，用于发出 'copy' 进度事件。
+        """
+        # 创建新的DXF文档
+        merged_doc = ezdxf.new('R2010')
+        merged_msp = merged_doc.modelspace()
+        
+        # 为每个版面添加边框以显示容器区域
+        origins = self._sheet_origins(placements, use_origin)
+        for origin in origins.values():
+            self._add_border(merged_msp, container_width, container_height, origin)
+        
+        # 复制并放置每个图形
+        block_names = {}
+        done, total = progress
+        total = total or len(placements)
+        for placement in placements:
+            self._progress('copy', done, total, placement['box']['doc_info']['file_path'])
+            done += 1
+            box = placement['box']
+            pos_x, pos_y = placement['position']
+            rotation = placement.get('rotation', 0)
+            origin_x, origin_y = origins[placement.get('sheet', 0)]
+            target = (pos_x + origin_x, pos_y + origin_y)
+            
+            if output_mode == 'blocks':
+                # 每个源文件只定义一次块（按文件路径区分），块基点为原外包矩形左下角
+                doc_info = box['doc_info']
+                key = os.path.normcase(os.path.abspath(doc_info['file_path']))
+                name = block_names.get(key)
+                if name is None:
+                    name = _block_name(len(block_names), doc_info['name'])
+                    block = merged_doc.blocks.new(name, base_point=Vec3(box['original_extmin']))
+                    self._copy_part(doc_info, block)
+                    block_names[key] = name
+                # 块引用绕插入点旋转，插入点取旋转后外包矩形左下角对齐 target 的位置
+                min_x, min_y = _rotated_offset(box, rotation)
+                merged_msp.add_blockref(name, (target[0] - min_x, target[1] - min_y),
+                                        dxfattribs={'rotation': rotation})
+            else:
+                # 旋转和平移合并为一个变换矩阵，每个实体只复制、变换一次
+                matrix = _placement_matrix(box, target, rotation)
+                self._copy_part(box['doc_info'], merged_msp, matrix)
+        self._progress('copy', done, total)
+        
+        return merged_doc
+    
+    @staticmethod
+    def _sheet_origins(placements: List[Dict], use_origin: bool) -> Dict[int, Tuple[float, float]]:
+        """各版面在合并文件中的原点，use_origin 为False时都在 (0, 0)"""
+        origins = {}
+        for placement in placements:
+            origin = placement.get('sheet_origin', (0.0, 0.0)) if use_origin else (0.0, 0.0)
+            origins[placement.get('sheet', 0)] = origin
+        if not origins:
+            origins[0] = (0.0, 0.0)
+        return origins
+    
+    def _stream_merged_dxf(self, placements: List[Dict], output_path: str, container_width: float,
+                           container_height: float, use_origin: bool,
+                           progress: Tuple[int, int] = (0, 0)) -> bool:
+        """流式写出合并文件（输出内容与 'flatten' 相同，见 dxf_stream）
+        
+        文件头和各表在开始时就写入文件；之后每个放置的实体复制、变换后立即写出并释放。
+        同一源文件的放置连续写出，尚未解析的文件（索引命中、延迟读取或低内存模式）在写出前
+        才加载，写完即释放，因此内存峰值取决于最大的单个图形，而不是全部输入和副本之和。
+        """
+        groups = {}
+        for placement in placements:
+            groups.setdefault(id(placement['box']['doc_info']), []).append(placement)
+        origins = self._sheet_origins(placements, use_origin)
+        done, total = progress
+        total = total or len(placements)
+        
+        writer = StreamingDXFWriter(output_path)
+        try:
+            with self.stats.stage('stream_dxf'):
+                for origin in origins.values():
+                    self._add_border(writer.modelspace, container_width, container_height, origin)
+                writer.write_modelspace()
+                
+                for group in groups.values():
+                    doc_info = group[0]['box']['doc_info']
+                    loaded_here = doc_info['doc'] is None and doc_info.get('geometry') is None
+                    if not self._ensure_documents([doc_info]):
+                        writer.abort()
+                        return False
+                    for placement in group:
+                        self._progress('copy', done, total, doc_info['file_path'])
+                        done += 1
+                        box = placement['box']
+                        origin_x, origin_y = origins[placement.get('sheet', 0)]
+                        target = (placement['position'][0] + origin_x, placement['position'][1] + origin_y)
+                        matrix = _placement_matrix(box, target, placement.get('rotation', 0))
+                        self._copy_part(doc_info, writer.modelspace, matrix)
+                        writer.write_modelspace()
+                    if loaded_here:
+                        doc_info['doc'] = None
+                        doc_info.pop('geometry', None)
+                self._progress('copy', done, total)
+                
+                self._progress('save', 0, 1, output_path)
+                writer.close()
+                self._progress('save', 1, 1, output_path)
+        except BaseException:
+            writer.abort()
+            raise
+        return True
+    
+    def _add_border(self, msp, width: float, height: float, origin: Tuple[float, float] = (0.0, 0.0)):
         """添加边框"""
+        x, y = origin
         points = [
-            (0, 0),
-            (width, 0),
-            (width, height),
-            (0, height),
-            (0, 0)
+            (x, y),
+            (x + width, y),
+            (x + width, y + height),
+            (x, y + height),
+            (x, y)
         ]
         
         msp.add_lwpolyline(points)
     
-    def _copy_entities(self, source_msp, target_msp, translation: ezdxf.math.Vec3):
-        """复制实体并应用平移"""
+    def _copy_part(self, doc_info: Dict, target_msp, matrix: Optional[Matrix44] = None) -> int:
+        """复制一个图形的全部实体：有完整文档时复制实体，否则从紧凑几何存储写出"""
+        if doc_info['doc'] is not None:
+            return self._copy_entities(doc_info['doc'].modelspace(), target_msp, matrix)
+        return self._emit_geometry(doc_info['geometry'], target_msp, matrix)
+    
+    @_stage('copy_entities')
+    def _emit_geometry(self, geometry: GeometryStore, target_msp, matrix: Optional[Matrix44] = None) -> int:
+        """从紧凑几何存储写出实体并应用变换矩阵，返回写出失败的实体数量"""
+        copied, failed = geometry.emit(target_msp, matrix)
+        self.stats.count('entities_copied', copied)
+        self.stats.count('copy_failures', failed)
+        return failed
+    
+    @_stage('copy_entities')
+    def _copy_entities(self, source_msp, target_msp, matrix: Optional[Matrix44] = None) -> int:
+        """复制实体并应用变换矩阵（为None时原样复制），返回复制失败的实体数量"""
+        failed = 0
+        copied = 0
         for entity in source_msp:
             try:
-                # 复制实体
+                # 复制实体并一次性应用旋转和平移
                 copied_entity = entity.copy()
-                
-                # 应用平移 - 修复translate方法调用
-                if hasattr(copied_entity, 'translate'):
-                    # translate方法需要三个参数：dx, dy, dz
-                    copied_entity.translate(translation.x, translation.y, translation.z)
+                if matrix is not None:
+                    copied_entity.transform(matrix)
                 
                 # 添加到目标模型空间
                 target_msp.add_entity(copied_entity)
+                copied += 1
                 
             except Exception as e:
-                print(f"复制实体失败: {e}")
-                continue
\ No newline at end of file
+                failed += 1
+                print(f"复制实体失败 {entity.dxftype()}: {e}")
+                continue
+        self.stats.count('entities_copied', copied)
+        self.stats.count('copy_failures', failed)
+        return failed
@@ -0,0 +1,574 @@
+"""轻量级栅格预览后端
+
+把DXF几何展开为 NumPy 折线/多边形数组，直接用 Pillow 绘制到目标分辨率的图像上，
+不经过 ezdxf drawing Frontend 和 matplotlib，实体很多时预览速度快一个数量级。
+只支持预览需要的常用实体（直线、多段线、圆、圆弧、椭圆、样条曲线、填充、文字、块引用等），
+其他实体按 ezdxf.path 展开；外观与 matplotlib 后端接近，但不绘制线型和填充图案。
+
+render_layout 不需要合并后的文档：每个源图形按内容摘要、缩放比例和旋转角度缓存一张缩略图
+（ThumbnailCache），预览图由缩略图按排样位置拼贴而成，同样的图形重新排样后预览几乎不耗时。
+"""
+import collections
+import functools
+import hashlib
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from ezdxf import colors
+from ezdxf import path as ezdxf_path
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+
+from dxf_extents import fast_extents
+from dxf_processor import _load_dxf_document
+
+# 与 ezdxf drawing 默认主题一致的背景色
+BACKGROUND = (33, 40, 48)
+
+# 曲线展开的最大弦高误差（像素）
+FLATTEN_PIXELS = 0.5
+
+# 外围留白（占图形尺寸的比例），与 matplotlib 后端的 ax.margins(0.1) 一致
+MARGIN = 0.1
+
+# 字体候选（优先使用中文字体）
+FONT_CANDIDATES = ('simhei.ttf', 'msyh.ttc', 'NotoSansCJK-Regular.ttc', 'wqy-microhei.ttc',
+                   'DejaVuSans-Bold.ttf', 'DejaVuSans.ttf', 'arial.ttf')
+
+# 缩略图缓存默认容量（字节，按 RGBA 像素计算）
+DEFAULT_THUMBNAIL_BYTES = 64 * 1024 * 1024
+
+# 缩略图四周留出的像素，容纳线宽和超出外包矩形的文字
+THUMBNAIL_PADDING = 2
+
+# 拼贴预览的缩放比例取 2 的 1/SCALE_STEPS 次幂的整数倍，排样变化引起的微小比例变化不会使缓存失效
+SCALE_STEPS = 8
+
+_fonts = {}
+
+
+def load_font(size: int):
+    """按像素大小加载字体（带缓存），找不到可用字体时使用 Pillow 内置字体"""
+    size = max(int(size), 1)
+    font = _fonts.get(size)
+    if font is None:
+        for name in FONT_CANDIDATES:
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        else:
+            try:
+                font = ImageFont.load_default(size)
+            except TypeError:
+                # Pillow 10.1 之前的内置字体是固定大小的位图字体，不接受 size 参数
+                font = ImageFont.load_default()
+        _fonts[size] = font
+    return font
+
+
+class _Scene:
+    """展开后的几何：折线、填充多边形组和文字，坐标为图纸坐标"""
+
+    def __init__(self, doc, tolerance: float):
+        self.doc = doc
+        self.tolerance = tolerance
+        self.lines = []     # (顶点数组 (n, 2), 颜色)
+        self.fills = []     # ([顶点数组, ...], 颜色)，多个边界按奇偶规则填充
+        self.texts = []     # (文字, 插入点, 高度(图纸单位), 旋转角度, 颜色)
+        self.layer_colors = {}
+        for layer in doc.layers:
+            if layer.is_off() or layer.is_frozen():
+                self.layer_colors[layer.dxf.name.lower()] = None
+            else:
+                self.layer_colors[layer.dxf.name.lower()] = colors.aci2rgb(abs(layer.color) or 7)
+
+    def color(self, entity, parent_color):
+        """解析实体颜色，所在图层关闭或冻结时返回None"""
+        layer_color = self.layer_colors.get(entity.dxf.layer.lower(), (255, 255, 255))
+        if layer_color is None:
+            return None
+        if entity.dxf.hasattr('true_color'):
+            return entity.rgb
+        aci = entity.dxf.color
+        if aci == colors.BYLAYER:
+            return layer_color
+        if aci == colors.BYBLOCK:
+            return parent_color or (255, 255, 255)
+        if aci == 7:
+            return (255, 255, 255)
+        return colors.aci2rgb(aci)
+
+    def add_entities(self, entities, parent_color=None):
+        for entity in entities:
+            try:
+                self.add_entity(entity, parent_color)
+            except Exception:
+                continue
+
+    def add_entity(self, entity, parent_color=None):
+        dxftype = entity.dxftype()
+        color = self.color(entity, parent_color)
+        if color is None:
+            return
+        if dxftype == 'INSERT':
+            self.add_entities(entity.virtual_entities(), color)
+        elif dxftype == 'LINE':
+            start, end = entity.dxf.start, entity.dxf.end
+            self.lines.append((np.array([[start.x, start.y], [end.x, end.y]]), color))
+        elif dxftype == 'LWPOLYLINE':
+            vertices = np.array(entity.get_points('xyb'), dtype=float).reshape(-1, 3)
+            self._add_outline(self._bulge_polyline(vertices, entity.closed), color, entity)
+        elif dxftype in ('CIRCLE', 'ARC'):
+            center = entity.dxf.center
+            radius = entity.dxf.radius
+            if dxftype == 'CIRCLE':
+                start, end = 0.0, 2 * math.pi
+            else:
+                start = math.radians(entity.dxf.start_angle)
+                end = math.radians(entity.dxf.end_angle)
+                if end <= start:
+                    end += 2 * math.pi
+            self.lines.append((self._arc_points(center.x, center.y, radius, start, end), color))
+        elif dxftype == 'HATCH':
+            self._add_hatch(entity, color)
+        elif dxftype in ('SOLID', 'TRACE', '3DFACE'):
+            vertices = entity.wcs_vertices()
+            if dxftype != '3DFACE' and len(vertices) == 4:
+                # SOLID/TRACE 的第3、4个顶点顺序与多边形顺序相反
+                vertices = [vertices[0], vertices[1], vertices[3], vertices[2]]
+            points = np.array([(v.x, v.y) for v in vertices])
+            if dxftype == '3DFACE':
+                self.lines.append((np.vstack([points, points[:1]]), color))
+            else:
+                self.fills.append(([points], color))
+        elif dxftype == 'POINT':
+            location = entity.dxf.location
+            self.lines.append((np.array([[location.x, location.y], [location.x, location.y]]), color))
+        elif dxftype == 'TEXT':
+            if entity.dxf.halign or entity.dxf.valign:
+                insert = entity.dxf.get('align_point', entity.dxf.insert)
+            else:
+                insert = entity.dxf.insert
+            self.texts.append((entity.plain_text(), (insert.x, insert.y), entity.dxf.height,
+                               entity.dxf.rotation, color))
+        elif dxftype == 'MTEXT':
+            insert = entity.dxf.insert
+            self.texts.append((entity.plain_text(), (insert.x, insert.y), entity.dxf.char_height,
+                               entity.get_rotation(), color))
+        else:
+            # 其他实体（带圆弧的多段线、椭圆、样条曲线等）按 ezdxf.path 展开
+            path = ezdxf_path.make_path(entity)
+            points = self._flatten(path)
+            if points is not None:
+                self._add_outline(points, color, entity)
+
+    def _add_outline(self, points: np.ndarray, color, entity):
+        """多段线宽度不为0时按填充绘制（与CAD显示一致），否则按线条绘制"""
+        width = entity.dxf.get('const_width', 0) if entity.dxftype() == 'LWPOLYLINE' else 0
+        self.lines.append((points, color) if not width else (points, color, width))
+
+    def _arc_points(self, cx: float, cy: float, radius: float, start: float, end: float) -> np.ndarray:
+        # 由弦高误差确定分段数（end 小于 start 时按顺时针展开）
+        step = 2 * math.acos(max(-1.0, 1 - self.tolerance / radius)) if radius > self.tolerance else math.pi / 2
+        count = max(int(math.ceil(abs(end - start) / max(step, 1e-3))), 4)
+        angles = np.linspace(start, end, count + 1)
+        return np.column_stack([cx + radius * np.cos(angles), cy + radius * np.sin(angles)])
+
+    def _bulge_polyline(self, vertices: np.ndarray, closed: bool) -> np.ndarray:
+        """展开带凸度的多段线顶点 (x, y, bulge)，圆弧段按弦高误差分段"""
+        if closed and len(vertices):
+            vertices = np.vstack([vertices, vertices[:1]])
+        points = vertices[:, :2]
+        bulges = vertices[:-1, 2]
+        arcs = np.flatnonzero(np.abs(bulges) > 1e-12)
+        if not arcs.size:
+            return points
+        pieces = []
+        last = 0
+        for index in arcs:
+            pieces.append(points[last:index + 1])
+            (x1, y1), (x2, y2) = points[index], points[index + 1]
+            bulge = bulges[index]
+            chord = math.hypot(x2 - x1, y2 - y1)
+            if chord < 1e-12:
+                last = index + 1
+                continue
+            # 圆心位于弦中点的法线上，距离为 chord/2 * (1 - b^2) / (2b)
+            offset = chord / 2 * (1 - bulge * bulge) / (2 * bulge)
+            cx = (x1 + x2) / 2 - (y2 - y1) / chord * offset
+            cy = (y1 + y2) / 2 + (x2 - x1) / chord * offset
+            sweep = 4 * math.atan(bulge)
+            start = math.atan2(y1 - cy, x1 - cx)
+            arc = self._arc_points(cx, cy, math.hypot(x1 - cx, y1 - cy), start, start + sweep)
+            pieces.append(arc[1:-1])
+            last = index + 1
+        pieces.append(points[last:])
+        return np.vstack(pieces)
+
+    def _add_hatch_paths(self, hatch) -> Optional[List[np.ndarray]]:
+        """只有多段线边界的填充直接按顶点展开，含其他边界类型时返回None"""
+        polygons = []
+        for boundary in hatch.paths:
+            if not hasattr(boundary, 'vertices'):
+                return None
+            vertices = np.array(boundary.vertices, dtype=float).reshape(-1, 3)
+            if len(vertices) >= 3:
+                polygons.append(self._bulge_polyline(vertices, True))
+        return polygons
+
+    def _flatten(self, path) -> Optional[np.ndarray]:
+        if not len(path):
+            return None
+        return np.array([(v.x, v.y) for v in path.flattening(self.tolerance)])
+
+    def _add_hatch(self, hatch, color):
+        polygons = self._add_hatch_paths(hatch)
+        if polygons is None:
+            polygons = []
+            for path in ezdxf_path.from_hatch(hatch):
+                points = self._flatten(path)
+                if points is not None and len(points) >= 3:
+                    polygons.append(points)
+        if not polygons:
+            return
+        if hatch.dxf.solid_fill:
+            self.fills.append((polygons, color))
+        else:
+            # 图案填充只绘制边界
+            for points in polygons:
+                self.lines.append((np.vstack([points, points[:1]]), color))
+
+
+def _fit_scale(span_x: float, span_y: float, width_px: int, height_px: int) -> float:
+    """四周保留 MARGIN 比例空白时，图形完整放入图像的缩放比例（像素/图纸单位）"""
+    return min(width_px / (span_x * (1 + 2 * MARGIN)), height_px / (span_y * (1 + 2 * MARGIN)))
+
+
+class _Canvas:
+    """把图纸坐标映射到图像像素并绘制"""
+
+    def __init__(self, extmin: Tuple[float, float], extmax: Tuple[float, float],
+                 width_px: int, height_px: int, scale: Optional[float] = None,
+                 mode: str = 'RGB', background=BACKGROUND):
+        span_x = max(extmax[0] - extmin[0], 1e-9)
+        span_y = max(extmax[1] - extmin[1], 1e-9)
+        # 等比例缩放并居中（未指定 scale 时四周保留 MARGIN 比例的空白）
+        self.scale = scale or _fit_scale(span_x, span_y, width_px, height_px)
+        self.offset_x = width_px / 2 - (extmin[0] + span_x / 2) * self.scale
+        self.offset_y = height_px / 2 + (extmin[1] + span_y / 2) * self.scale
+        self.image = Image.new(mode, (width_px, height_px), background)
+        self.draw = ImageDraw.Draw(self.image, 'RGBA')
+
+    def to_pixels(self, points: np.ndarray) -> np.ndarray:
+        pixels = np.empty_like(points, dtype=float)
+        pixels[:, 0] = points[:, 0] * self.scale + self.offset_x
+        pixels[:, 1] = self.offset_y - points[:, 1] * self.scale
+        return pixels
+
+    def xy(self, x: float, y: float) -> Tuple[float, float]:
+        return x * self.scale + self.offset_x, self.offset_y - y * self.scale
+
+    def draw_scene(self, scene: _Scene):
+        for polygons, color in scene.fills:
+            self._fill(polygons, color)
+        for item in scene.lines:
+            points, color = item[0], item[1]
+            pixels = self.to_pixels(points).ravel().tolist()
+            if len(item) == 3:
+                width = max(int(round(item[2] * self.scale)), 1)
+                self.draw.line(pixels, fill=color, width=width, joint='curve')
+            else:
+                self.draw.line(pixels, fill=color, width=1)
+        for text, insert, height, rotation, color in scene.texts:
+            self.text(text, insert, height, rotation, color)
+
+    def _fill(self, polygons: List[np.ndarray], color):
+        if len(polygons) == 1:
+            self.draw.polygon(self.to_pixels(polygons[0]).ravel().tolist(), fill=color)
+            return
+        # 多个边界按奇偶规则填充：在局部掩码上逐个异或
+        pixels = [self.to_pixels(points) for points in polygons]
+        stacked = np.vstack(pixels)
+        left, top = np.floor(stacked.min(axis=0)).astype(int)
+        right, bottom = np.ceil(stacked.max(axis=0)).astype(int)
+        size = (max(right - left + 1, 1), max(bottom - top + 1, 1))
+        mask = Image.new('1', size, 0)
+        for points in pixels:
+            layer = Image.new('1', size, 0)
+            ImageDraw.Draw(layer).polygon((points - (left, top)).ravel().tolist(), fill=1)
+            mask = ImageChops.logical_xor(mask, layer)
+        self.image.paste(color, (int(left), int(top)), mask)
+
+    def text(self, text: str, insert: Tuple[float, float], height: float, rotation: float,
+             color, background=None):
+        """在图纸坐标 insert（左下/基线）处绘制文字，height 为图纸单位的字高"""
+        size = int(round(height * self.scale * 1.4))
+        if size < 4 or not text:
+            return
+        font = load_font(size)
+        x, y = self.xy(*insert)
+        if abs(rotation) < 0.5:
+            box = self.draw.multiline_textbbox((x, y), text, font=font, anchor='ld')
+            if background:
+                self.draw.rectangle(box, fill=background)
+            self.draw.multiline_text((x, y), text, fill=color, font=font, anchor='ld')
+            return
+        # 旋转的文字先画到单独的图层上再旋转粘贴
+        box = self.draw.multiline_textbbox((0, 0), text, font=font, anchor='la')
+        layer = Image.new('RGBA', (box[2] + 2, box[3] + 2), background or (0, 0, 0, 0))
+        ImageDraw.Draw(layer).multiline_text((0, 0), text, fill=color, font=font, anchor='la')
+        rotated = layer.rotate(rotation, expand=True)
+        # 图层绕中心旋转，求原左下角在旋转后图层中的位置，使其与插入点对齐
+        angle = math.radians(rotation)
+        dx, dy = -layer.width / 2, layer.height / 2
+        corner_x = rotated.width / 2 + dx * math.cos(angle) + dy * math.sin(angle)
+        corner_y = rotated.height / 2 - dx * math.sin(angle) + dy * math.cos(angle)
+        self.image.paste(rotated, (int(round(x - corner_x)), int(round(y - corner_y))), rotated)
+
+    def dimension(self, start: Tuple[float, float], end: Tuple[float, float], color, width: int = 1):
+        """绘制带双向箭头的虚线尺寸线（图纸坐标）"""
+        x1, y1 = self.xy(*start)
+        x2, y2 = self.xy(*end)
+        length = math.hypot(x2 - x1, y2 - y1)
+        if length < 1:
+            return
+        ux, uy = (x2 - x1) / length, (y2 - y1) / length
+        dash = 4.0
+        position = 0.0
+        while position < length:
+            stop = min(position + dash, length)
+            self.draw.line([x1 + ux * position, y1 + uy * position, x1 + ux * stop, y1 + uy * stop],
+                           fill=color, width=width)
+            position += dash * 2
+        arrow = min(6.0, length / 3)
+        for (px, py), (dx, dy) in (((x1, y1), (ux, uy)), ((x2, y2), (-ux, -uy))):
+            self.draw.line([px, py, px + (dx - dy * 0.5) * arrow, py + (dy + dx * 0.5) * arrow],
+                           fill=color, width=width)
+            self.draw.line([px, py, px + (dx + dy * 0.5) * arrow, py + (dy - dx * 0.5) * arrow],
+                           fill=color, width=width)
+
+
+@functools.lru_cache(maxsize=1024)
+def _label_image(text: str, font_px: int, vertical: bool) -> Image.Image:
+    """带半透明底色的标注文字图层（白色），同样的标注只渲染一次"""
+    font = load_font(font_px)
+    box = font.getbbox(text, anchor='lt')
+    layer = Image.new('RGBA', (box[2] + 4, box[3] + 4), (0, 0, 0, 51))
+    ImageDraw.Draw(layer).text((2, 2), text, fill=(255, 255, 255), font=font, anchor='lt')
+    if vertical:
+        layer = layer.rotate(90, expand=True)
+    return layer
+
+
+def _label(canvas: _Canvas, text: str, center: Tuple[float, float], font_px: int, vertical: bool = False):
+    """以 center 为中心绘制标注文字"""
+    layer = _label_image(text, font_px, vertical)
+    x, y = canvas.xy(*center)
+    canvas.image.paste(layer, (int(x - layer.width / 2), int(y - layer.height / 2)), layer)
+
+
+def _render(doc, placements, output_path, figsize, dpi) -> Image.Image:
+    msp = doc.modelspace()
+    extents = fast_extents(msp, 'hull')
+    if not extents.has_data:
+        raise ValueError("文档中没有几何实体")
+    width_px, height_px = int(figsize[0] * dpi), int(figsize[1] * dpi)
+    canvas = _Canvas((extents.extmin.x, extents.extmin.y), (extents.extmax.x, extents.extmax.y),
+                     width_px, height_px)
+    scene = _Scene(doc, FLATTEN_PIXELS / canvas.scale)
+    scene.add_entities(msp)
+    canvas.draw_scene(scene)
+
+    if placements:
+        _annotate(canvas, placements, dpi)
+    if output_path:
+        canvas.image.save(output_path, dpi=(dpi, dpi), compress_level=1)
+    return canvas.image
+
+
+def _placement_rect(placement: Dict) -> Tuple[float, float, float, float]:
+    """放置后的外包矩形 (x, y, 宽, 高)，坐标已加上版面原点"""
+    origin_x, origin_y = placement.get('sheet_origin', (0.0, 0.0))
+    box = placement['box']
+    if placement.get('rotation', 0) % 180 == 90:
+        width, height = box['height'], box['width']
+    else:
+        width, height = box['width'], box['height']
+    return placement['position'][0] + origin_x, placement['position'][1] + origin_y, width, height
+
+
+def _annotate(canvas: _Canvas, placements: List[Dict], dpi: int):
+    """为每个放置的图形添加白色尺寸标注"""
+    font_px = max(int(dpi * 8 / 72), 6)
+    for placement in placements:
+        pos_x, pos_y, width, height = _placement_rect(placement)
+        canvas.dimension((pos_x, pos_y - 1), (pos_x + width, pos_y - 1), (255, 255, 255))
+        _label(canvas, f'{width:.1f}mm', (pos_x + width / 2, pos_y - 3), font_px)
+        canvas.dimension((pos_x - 1, pos_y), (pos_x - 1, pos_y + height), (255, 255, 255))
+        _label(canvas, f'{height:.1f}mm', (pos_x - 3, pos_y + height / 2), font_px, vertical=True)
+
+
+def render_dxf(doc, output_path: Optional[str] = None, figsize=(10, 10), dpi=150) -> Image.Image:
+    """把DXF文档栅格化为 Pillow 图像（output_path 不为None时同时保存）"""
+    return _render(doc, None, output_path, figsize, dpi)
+
+
+def render_with_annotations(doc, placements: List[Dict], output_path: Optional[str] = None,
+                            figsize=(10, 10), dpi=150) -> Image.Image:
+    """栅格化DXF文档并为每个放置的图形添加白色尺寸标注"""
+    return _render(doc, placements, output_path, figsize, dpi)
+
+
+class ThumbnailCache:
+    """按像素字节数限制总容量的LRU缩略图缓存（线程安全）
+
+    键为 (源图形内容摘要, 缩放比例, 旋转角度)，值为透明背景的 RGBA 缩略图。
+    内容摘要按文件内容计算，并按路径+大小+修改时间记住，文件变化后缓存自然失效。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_THUMBNAIL_BYTES):
+        self.max_bytes = max_bytes
+        self.items = collections.OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.digests = {}
+        self.lock = threading.Lock()
+
+    def content_key(self, doc_info: Dict) -> Optional[str]:
+        """源文件内容的摘要，文件不存在（如内存中的文档）时返回None"""
+        path = doc_info.get('file_path')
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        signature = (os.path.normcase(os.path.abspath(path)), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            digest = self.digests.get(signature)
+        if digest is None:
+            sha1 = hashlib.sha1()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    sha1.update(chunk)
+            digest = sha1.hexdigest()
+            with self.lock:
+                self.digests[signature] = digest
+        return digest
+
+    def get(self, key) -> Optional[Image.Image]:
+        with self.lock:
+            image = self.items.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, key, image: Image.Image):
+        size = image.width * image.height * 4
+        with self.lock:
+            if key in self.items:
+                old = self.items.pop(key)
+                self.total_bytes -= old.width * old.height * 4
+            self.items[key] = image
+            self.total_bytes += size
+            # 超出容量时淘汰最久未使用的项（至少保留刚加入的一项）
+            while self.total_bytes > self.max_bytes and len(self.items) > 1:
+                _, evicted = self.items.popitem(last=False)
+                self.total_bytes -= evicted.width * evicted.height * 4
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.digests.clear()
+            self.total_bytes = 0
+
+    def info(self) -> Dict:
+        with self.lock:
+            return {'entries': len(self.items), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+    def thumbnail(self, box: Dict, scale: float, rotation: float) -> Image.Image:
+        """取得图形按 scale 缩放、旋转 rotation 度（90的整数倍）后的缩略图，没有缓存时渲染"""
+        rotation = int(round(rotation)) % 360
+        digest = self.content_key(box['doc_info'])
+        key = (digest, scale, rotation) if digest is not None else None
+        image = self.get(key) if key is not None else None
+        if image is None:
+            image = _render_thumbnail(box, scale, rotation)
+            if key is not None:
+                self.put(key, image)
+        return image
+
+
+def _render_thumbnail(box: Dict, scale: float, rotation: int) -> Image.Image:
+    """把单个源图形按原外包矩形栅格化为透明背景的缩略图，再按放置角度旋转"""
+    doc = box['doc_info'].get('doc')
+    if doc is None:
+        # 延迟加载（命中索引或流式扫描）的文件在这里才解析
+        doc, error = _load_dxf_document(box['doc_info']['file_path'])
+        if doc is None:
+            raise ValueError(f"读取文件失败 {box['doc_info']['file_path']}: {error}")
+    extmin, extmax = box['original_extmin'], box['original_extmax']
+    width_px = int(math.ceil(box['width'] * scale)) + 2 * THUMBNAIL_PADDING
+    height_px = int(math.ceil(box['height'] * scale)) + 2 * THUMBNAIL_PADDING
+    canvas = _Canvas((extmin[0], extmin[1]), (extmax[0], extmax[1]), width_px, height_px,
+                     scale=scale, mode='RGBA', background=(0, 0, 0, 0))
+    scene = _Scene(doc, FLATTEN_PIXELS / scale)
+    scene.add_entities(doc.modelspace())
+    canvas.draw_scene(scene)
+    image = canvas.image
+    if rotation:
+        # Pillow 的旋转方向（屏幕上逆时针）与图纸中的逆时针旋转一致。
+        # Image.Transpose 在 Pillow 9.1 才加入，更早的版本只有模块级常量
+        methods = getattr(Image, 'Transpose', Image)
+        transpose = {90: methods.ROTATE_90, 180: methods.ROTATE_180,
+                     270: methods.ROTATE_270}.get(rotation)
+        image = image.transpose(transpose) if transpose is not None else image.rotate(rotation, expand=True)
+    return image
+
+
+def render_layout(placements: List[Dict], container_width: float, container_height: float,
+                  output_path: Optional[str] = None, figsize=(10, 10), dpi=150,
+                  cache: Optional[ThumbnailCache] = None, annotate: bool = True) -> Image.Image:
+    """用缓存的缩略图按排样结果拼贴出合并结果预览（不需要合并后的文档）
+
+    画布范围取各版面的容器和全部图形，缩放比例向下取到 2 的 1/SCALE_STEPS 次幂，
+    同一容器的不同排样使用相同比例，已渲染过的图形直接从缓存中取出。
+    """
+    cache = cache if cache is not None else ThumbnailCache()
+    origins = {placement.get('sheet', 0): placement.get('sheet_origin', (0.0, 0.0)) for placement in placements}
+    rects = [(x, y, container_width, container_height) for x, y in (origins.values() or [(0.0, 0.0)])]
+    rects += [_placement_rect(placement) for placement in placements]
+    min_x = min(x for x, _, _, _ in rects)
+    min_y = min(y for _, y, _, _ in rects)
+    max_x = max(x + w for x, _, w, _ in rects)
+    max_y = max(y + h for _, y, _, h in rects)
+
+    width_px, height_px = int(figsize[0] * dpi), int(figsize[1] * dpi)
+    scale = _fit_scale(max(max_x - min_x, 1e-9), max(max_y - min_y, 1e-9), width_px, height_px)
+    scale = 2.0 ** (math.floor(math.log2(scale) * SCALE_STEPS) / SCALE_STEPS)
+    canvas = _Canvas((min_x, min_y), (max_x, max_y), width_px, height_px, scale=scale)
+
+    # 容器边框（与合并文件中的边框一致）
+    for x, y, w, h in rects[:len(origins) or 1]:
+        corners = np.array([(x, y), (x + w, y), (x + w, y + h), (x, y + h), (x, y)], dtype=float)
+        canvas.draw.line(canvas.to_pixels(corners).ravel().tolist(), fill=(255, 255, 255), width=1)
+
+    for placement in placements:
+        pos_x, pos_y, _, height = _placement_rect(placement)
+        image = cache.thumbnail(placement['box'], scale, placement.get('rotation', 0))
+        left, top = canvas.xy(pos_x, pos_y + height)
+        canvas.image.paste(image, (int(round(left)) - THUMBNAIL_PADDING, int(round(top)) - THUMBNAIL_PADDING),
+                           image)
+
+    if annotate and placements:
+        _annotate(canvas, placements, dpi)
+    if output_path:
+        canvas.image.save(output_path, dpi=(dpi, dpi), compress_level=1)
+    return canvas.image
@@ -0,0 +1,158 @@
+"""排样用的紧凑记录
+
+BoxTable 和 PlacementTable 把外包矩形和排样结果保存在 NumPy 结构化数组中，
+排样器直接对宽、高、面积等列做向量化的排序和归约。外包矩形字典只保存一份
+（同一文件放置多次时共享），记录中只保存它在 boxes 列表中的序号。
+
+PlacementTable 是只读序列，元素 Placement 是带 __slots__ 的轻量视图，支持与原来的
+placement 字典相同的访问方式，可直接交给 create_merged_dxf 和 DXFRenderer：
+
+    placement['box'], placement['position'], placement.get('rotation', 0),
+    placement.get('sheet', 0), placement.get('sheet_origin', (0.0, 0.0))
+"""
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+BOX_DTYPE = np.dtype([('box', np.int32), ('width', np.float64), ('height', np.float64),
+                      ('area', np.float64)])
+
+PLACEMENT_DTYPE = np.dtype([('box', np.int32), ('x', np.float64), ('y', np.float64),
+                            ('rotation', np.int16), ('sheet', np.int32),
+                            ('origin_x', np.float64), ('origin_y', np.float64)])
+
+PLACEMENT_KEYS = ('box', 'position', 'rotation', 'sheet', 'sheet_origin')
+
+
+class BoxTable:
+    """待排样的图形：records 每行一个图形，boxes 为去重后的外包矩形字典"""
+    __slots__ = ('boxes', 'records')
+
+    def __init__(self, boxes: List[Dict], records: np.ndarray):
+        self.boxes = boxes
+        self.records = records
+
+    @classmethod
+    def from_boxes(cls, boxes: Sequence[Dict]) -> 'BoxTable':
+        """由外包矩形字典列表创建（同一字典出现多次时只保存一份）"""
+        unique = {}
+        index = np.fromiter((unique.setdefault(id(box), (len(unique), box))[0] for box in boxes),
+                            dtype=np.int32, count=len(boxes))
+        return cls._build([box for _, box in unique.values()], index)
+
+    @classmethod
+    def from_quantities(cls, boxes: List[Dict]) -> 'BoxTable':
+        """按每个外包矩形的 quantity 展开，相同图形连续排列"""
+        counts = np.fromiter((box.get('quantity', 1) for box in boxes), dtype=np.int64, count=len(boxes))
+        return cls._build(list(boxes), np.repeat(np.arange(len(boxes), dtype=np.int32), counts))
+
+    @classmethod
+    def _build(cls, boxes: List[Dict], index: np.ndarray) -> 'BoxTable':
+        widths = np.fromiter((box['width'] for box in boxes), dtype=np.float64, count=len(boxes))
+        heights = np.fromiter((box['height'] for box in boxes), dtype=np.float64, count=len(boxes))
+        records = np.empty(len(index), dtype=BOX_DTYPE)
+        records['box'] = index
+        records['width'] = widths[index]
+        records['height'] = heights[index]
+        records['area'] = records['width'] * records['height']
+        return cls(boxes, records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def box(self, item: int) -> Dict:
+        """第 item 个图形的外包矩形字典"""
+        return self.boxes[self.records['box'][item]]
+
+
+def as_box_table(boxes) -> BoxTable:
+    """排样器的输入可以是 BoxTable 或外包矩形字典列表"""
+    return boxes if isinstance(boxes, BoxTable) else BoxTable.from_boxes(boxes)
+
+
+class Placement:
+    """PlacementTable 中一行的只读视图，按 placement 字典的键访问"""
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table: 'PlacementTable', index: int):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key: str):
+        record = self.table.records[self.index]
+        if key == 'box':
+            return self.table.boxes[record['box']]
+        if key == 'position':
+            return float(record['x']), float(record['y'])
+        if key == 'rotation':
+            return int(record['rotation'])
+        if key == 'sheet':
+            return int(record['sheet'])
+        if key == 'sheet_origin':
+            return float(record['origin_x']), float(record['origin_y'])
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        return self[key] if key in PLACEMENT_KEYS else default
+
+    def __contains__(self, key) -> bool:
+        return key in PLACEMENT_KEYS
+
+    def keys(self):
+        return PLACEMENT_KEYS
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in PLACEMENT_KEYS}
+
+    def __repr__(self) -> str:
+        return f"Placement({self.to_dict()!r})"
+
+
+class PlacementTable(Sequence):
+    """排样结果：records 每行一个放置的图形，boxes 为外包矩形字典（records['box'] 为序号）"""
+    __slots__ = ('boxes', 'records')
+
+    def __init__(self, boxes: List[Dict], records: np.ndarray):
+        self.boxes = boxes
+        self.records = records
+
+    @classmethod
+    def build(cls, boxes: List[Dict], box_index, x, y, rotation=0, sheet=0,
+              origin_x=0.0, origin_y=0.0) -> 'PlacementTable':
+        """由各列（数组或标量）创建"""
+        records = np.empty(len(box_index), dtype=PLACEMENT_DTYPE)
+        records['box'] = box_index
+        records['x'] = x
+        records['y'] = y
+        records['rotation'] = rotation
+        records['sheet'] = sheet
+        records['origin_x'] = origin_x
+        records['origin_y'] = origin_y
+        return cls(boxes, records)
+
+    @classmethod
+    def concat(cls, tables: List['PlacementTable'], boxes: Optional[List[Dict]] = None) -> 'PlacementTable':
+        """拼接共享同一 boxes 列表的多个结果"""
+        boxes = boxes if boxes is not None else (tables[0].boxes if tables else [])
+        records = np.concatenate([table.records for table in tables]) if tables else \
+            np.empty(0, dtype=PLACEMENT_DTYPE)
+        return cls(boxes, records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PlacementTable(self.boxes, self.records[index])
+        if index < 0:
+            index += len(self.records)
+        if not 0 <= index < len(self.records):
+            raise IndexError(index)
+        return Placement(self, index)
+
+    def __iter__(self) -> Iterator[Placement]:
+        return (Placement(self, index) for index in range(len(self.records)))
+
+    def to_dicts(self) -> List[Dict]:
+        """转换为 placement 字典列表"""
+        return [placement.to_dict() for placement in self]
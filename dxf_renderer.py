@@ -1,17 +1,87 @@
-import ezdxf
-from ezdxf.addons.drawing import RenderContext, Frontend
-from ezdxf.addons.drawing.matplotlib import MatplotlibBackend
-from ezdxf import bbox
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import numpy as np
-import matplotlib.font_manager as fm
+import threading
+
+# 预览渲染后端：matplotlib（ezdxf 绘图插件，效果最完整）、raster（NumPy/Pillow 直接栅格化，速度快得多）
+# 或 thumbnails（按排样位置拼贴缓存的单个图形缩略图，重新排样后预览几乎不耗时）
+PREVIEW_BACKENDS = ('matplotlib', 'raster', 'thumbnails')
+
+# matplotlib、ezdxf 绘图插件和 dxf_raster 的导入约占命令行启动时间的一半，
+# 只在第一次渲染时导入，不生成预览的合并不需要付出这部分开销
+_pyplot = None
+_pyplot_lock = threading.Lock()
+
+
+def _load_pyplot():
+    """首次使用时导入 matplotlib 并设置中文字体（只设置一次，之后不再修改全局配置）"""
+    global _pyplot
+    with _pyplot_lock:
+        if _pyplot is None:
+            import matplotlib.pyplot as plt
+            # 尝试设置中文字体以避免警告
+            plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial Unicode MS']
+            plt.rcParams['axes.unicode_minus'] = False
+            _pyplot = plt
+    return _pyplot
+
 
 class DXFRenderer:
-    """DXF渲染器，用于将DXF文件渲染为图像"""
+    """DXF渲染器，用于将DXF文件渲染为图像
+    
+    保存图像时使用面向对象的 Figure 接口，不依赖 pyplot 的当前图形状态。
+    backend='raster' 时改用 dxf_raster 直接栅格化，适合图形很多时的快速预览；
+    backend='thumbnails' 时结果预览由 thumbnail_cache 中的单个图形缩略图拼贴而成。
+    """
+    
+    # 进程内共用的缩略图缓存（LRU），同一图形在不同排样之间只渲染一次；第一次使用时创建
+    thumbnail_cache = None
+    
+    @staticmethod
+    def get_thumbnail_cache():
+        """返回进程内共用的缩略图缓存"""
+        import dxf_raster
+        with _pyplot_lock:
+            if DXFRenderer.thumbnail_cache is None:
+                DXFRenderer.thumbnail_cache = dxf_raster.ThumbnailCache()
+        return DXFRenderer.thumbnail_cache
+    
+    @staticmethod
+    def _new_figure(output_path, figsize, dpi):
+        """创建绘图环境：保存图像时使用独立的 Figure，显示图像时使用 pyplot 窗口"""
+        plt = _load_pyplot()
+        if output_path is None:
+            return plt.subplots(figsize=figsize, dpi=dpi)
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=figsize, dpi=dpi)
+        FigureCanvasAgg(fig)
+        return fig, fig.add_subplot(1, 1, 1)
+    
+    @staticmethod
+    def _finish_figure(fig, output_path, dpi, **savefig_kwargs):
+        """保存图像（output_path 不为None时）或显示图像"""
+        if output_path:
+            fig.savefig(output_path, dpi=dpi, **savefig_kwargs)
+        else:
+            plt = _load_pyplot()
+            plt.show()
+            plt.close(fig)
+    
+    @staticmethod
+    def _placement_xy(placement):
+        """返回图形在合并文件中的左下角坐标（多版面排样时加上版面原点）"""
+        pos_x, pos_y = placement['position']
+        origin_x, origin_y = placement.get('sheet_origin', (0.0, 0.0))
+        return pos_x + origin_x, pos_y + origin_y
+    
+    @staticmethod
+    def _placement_size(placement):
+        """返回图形放置后的宽高（旋转90/270度时宽高互换）"""
+        box = placement['box']
+        if placement.get('rotation', 0) % 180 == 90:
+            return box['height'], box['width']
+        return box['width'], box['height']
     
     @staticmethod
-    def render_dxf_to_image(doc, output_path=None, figsize=(10, 10), dpi=150):
+    def render_dxf_to_image(doc, output_path=None, figsize=(10, 10), dpi=150, backend='matplotlib'):
         """
         将DXF文档渲染为图像
         
@@ -20,14 +90,22 @@ class DXFRenderer:
             output_path: 输出图像路径，如果为None则显示图像而不保存
             figsize: 图像大小
             dpi: 图像分辨率
+            backend: 渲染后端，'matplotlib' 或 'raster'
         """
         try:
-            # 创建绘图环境
-            fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+            if backend == 'raster':
+                import dxf_raster
+                image = dxf_raster.render_dxf(doc, output_path, figsize, dpi)
+                if output_path:
+                    print(f"图像已保存至: {output_path}")
+                else:
+                    image.show()
+                return True
             
-            # 尝试设置中文字体以避免警告
-            plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial Unicode MS']
-            plt.rcParams['axes.unicode_minus'] = False
+            # 创建绘图环境
+            fig, ax = DXFRenderer._new_figure(output_path, figsize, dpi)
+            from ezdxf.addons.drawing import RenderContext, Frontend
+            from ezdxf.addons.drawing.matplotlib import MatplotlibBackend
             
             # 创建渲染上下文和后端
             ctx = RenderContext(doc)
@@ -44,15 +122,10 @@ class DXFRenderer:
             ax.set_title('DXF结果预览')
             
             # 保存或显示图像
+            DXFRenderer._finish_figure(fig, output_path, dpi, bbox_inches='tight', pad_inches=0.1)
             if output_path:
-                plt.savefig(output_path, dpi=dpi, bbox_inches='tight', pad_inches=0.1)
-                plt.close(fig)
                 print(f"图像已保存至: {output_path}")
-                return True
-            else:
-                plt.show()
-                plt.close(fig)
-                return True
+            return True
                 
         except Exception as e:
             print(f"渲染DXF文件时出错: {e}")
@@ -74,24 +147,26 @@ class DXFRenderer:
         """
         try:
             # 创建绘图环境
-            fig, ax = plt.subplots(1, 1, figsize=figsize, dpi=dpi)
+            fig, ax = DXFRenderer._new_figure(output_path, figsize, dpi)
+            import matplotlib
+            import matplotlib.patches as patches
+            import numpy as np
             
-            # 尝试设置中文字体以避免警告
-            plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial Unicode MS']
-            plt.rcParams['axes.unicode_minus'] = False
-            
-            # 绘制容器边界
-            container = patches.Rectangle((0, 0), container_width, container_height, 
-                                       linewidth=2, edgecolor='black', facecolor='none')
-            ax.add_patch(container)
+            # 绘制容器边界（多版面排样时每个版面一个）
+            sheet_origins = {p.get('sheet', 0): p.get('sheet_origin', (0.0, 0.0)) for p in placements}
+            if not sheet_origins:
+                sheet_origins[0] = (0.0, 0.0)
+            for origin in sheet_origins.values():
+                container = patches.Rectangle(origin, container_width, container_height, 
+                                           linewidth=2, edgecolor='black', facecolor='none')
+                ax.add_patch(container)
             
             # 绘制每个放置的矩形
-            colors = plt.cm.Set3(np.linspace(0, 1, len(placements)))
+            colors = matplotlib.colormaps['Set3'](np.linspace(0, 1, len(placements)))
             for i, placement in enumerate(placements):
                 box = placement['box']
-                pos_x, pos_y = placement['position']
-                width = box['width']
-                height = box['height']
+                pos_x, pos_y = DXFRenderer._placement_xy(placement)
+                width, height = DXFRenderer._placement_size(placement)
                 rotation = placement.get('rotation', 0)
                 name = box['doc_info']['name']
                 
@@ -123,31 +198,30 @@ class DXFRenderer:
                        ha='center', va='center', rotation=90, fontsize=7, color='blue', weight='bold')
             
             # 设置坐标轴
-            ax.set_xlim(0, container_width)
+            ax.set_xlim(0, max(x for x, _ in sheet_origins.values()) + container_width)
             ax.set_ylim(0, container_height)
             ax.set_aspect('equal')
             ax.grid(True, linestyle='--', alpha=0.7)
             ax.set_xlabel('X (mm)')
             ax.set_ylabel('Y (mm)')
-            ax.set_title('排样结果预览')
+            if len(sheet_origins) > 1:
+                ax.set_title(f'排样结果预览（{len(sheet_origins)}个版面）')
+            else:
+                ax.set_title('排样结果预览')
             
             # 保存或显示图像
+            DXFRenderer._finish_figure(fig, output_path, dpi, bbox_inches='tight')
             if output_path:
-                plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
-                plt.close(fig)
                 print(f"排样预览图像已保存至: {output_path}")
-                return True
-            else:
-                plt.show()
-                plt.close(fig)
-                return True
+            return True
                 
         except Exception as e:
             print(f"渲染排样结果时出错: {e}")
             return False
     
     @staticmethod
-    def render_final_result_with_annotations(doc, placements, output_path=None, figsize=(10, 10), dpi=150):
+    def render_final_result_with_annotations(doc, placements, output_path=None, figsize=(10, 10), dpi=150,
+                                             backend='matplotlib'):
         """
         将最终DXF结果渲染为图像，并添加每个子项的尺寸标注（白色）
         
@@ -157,14 +231,22 @@ class DXFRenderer:
             output_path: 输出图像路径，如果为None则显示图像而不保存
             figsize: 图像大小
             dpi: 图像分辨率
+            backend: 渲染后端，'matplotlib' 或 'raster'
         """
         try:
-            # 创建绘图环境
-            fig, ax = plt.subplots(figsize=figsize, dpi=dpi)
+            if backend == 'raster':
+                import dxf_raster
+                image = dxf_raster.render_with_annotations(doc, placements, output_path, figsize, dpi)
+                if output_path:
+                    print(f"带标注的结果预览图像已保存至: {output_path}")
+                else:
+                    image.show()
+                return True
             
-            # 尝试设置中文字体以避免警告
-            plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans', 'Arial Unicode MS']
-            plt.rcParams['axes.unicode_minus'] = False
+            # 创建绘图环境
+            fig, ax = DXFRenderer._new_figure(output_path, figsize, dpi)
+            from ezdxf.addons.drawing import RenderContext, Frontend
+            from ezdxf.addons.drawing.matplotlib import MatplotlibBackend
             
             # 创建渲染上下文和后端
             ctx = RenderContext(doc)
@@ -178,9 +260,8 @@ class DXFRenderer:
             # 添加每个子项的尺寸标注（仅长宽，使用白色，虚线，小箭头）
             for i, placement in enumerate(placements):
                 box = placement['box']
-                pos_x, pos_y = placement['position']
-                width = box['width']
-                height = box['height']
+                pos_x, pos_y = DXFRenderer._placement_xy(placement)
+                width, height = DXFRenderer._placement_size(placement)
                 name = box['doc_info']['name']
                 
                 # 添加尺寸标注线（白色，虚线，小箭头）
@@ -204,16 +285,70 @@ class DXFRenderer:
             ax.set_title('DXF结果预览（带子项尺寸标注）')
             
             # 保存或显示图像
+            DXFRenderer._finish_figure(fig, output_path, dpi, bbox_inches='tight', pad_inches=0.1)
             if output_path:
-                plt.savefig(output_path, dpi=dpi, bbox_inches='tight', pad_inches=0.1)
-                plt.close(fig)
                 print(f"带标注的结果预览图像已保存至: {output_path}")
-                return True
-            else:
-                plt.show()
-                plt.close(fig)
-                return True
+            return True
                 
         except Exception as e:
             print(f"渲染带标注的DXF文件时出错: {e}")
-            return False
\ No newline at end of file
+            return False
+    
+    @staticmethod
+    def render_layout_preview(placements, container_width, container_height, output_path=None,
+                              figsize=(10, 10), dpi=150):
+        """
+        用缓存的单个图形缩略图按排样结果拼贴出带尺寸标注的结果预览，不需要合并后的文档
+        
+        Args:
+            placements: 排样结果列表
+            container_width: 容器宽度
+            container_height: 容器高度
+            output_path: 输出图像路径，如果为None则显示图像而不保存
+            figsize: 图像大小
+            dpi: 图像分辨率
+        """
+        try:
+            import dxf_raster
+            image = dxf_raster.render_layout(placements, container_width, container_height, output_path,
+                                             figsize, dpi, cache=DXFRenderer.get_thumbnail_cache())
+            if output_path:
+                print(f"带标注的结果预览图像已保存至: {output_path}")
+            else:
+                image.show()
+            return True
+        except Exception as e:
+            print(f"拼贴结果预览时出错: {e}")
+            return False
+    
+    @staticmethod
+    def render_previews(placements, container_width, container_height, placement_path, results,
+                        backend='matplotlib'):
+        """
+        渲染排样预览图和最终结果预览图
+        
+        Args:
+            placements: 排样结果列表
+            container_width: 容器宽度
+            container_height: 容器高度
+            placement_path: 排样预览图路径
+            results: [(合并后的ezdxf文档对象, 该文档中的排样结果, 预览图路径)]，
+                     每个版面单独输出时每个文件一项
+            backend: 结果预览的渲染后端，'matplotlib'、'raster' 或 'thumbnails'
+                     （thumbnails 不使用 results 中的文档，只按排样结果拼贴）
+        
+        Returns:
+            (排样预览是否成功, [各结果预览是否成功])
+        """
+        # 依次渲染：matplotlib 不是线程安全的，多线程同时渲染收益也很小
+        placement_ok = DXFRenderer.render_placements_to_image(placements, container_width,
+                                                              container_height, placement_path)
+        if backend == 'thumbnails':
+            result_oks = [DXFRenderer.render_layout_preview(doc_placements, container_width,
+                                                            container_height, path)
+                          for _, doc_placements, path in results]
+        else:
+            result_oks = [DXFRenderer.render_final_result_with_annotations(doc, doc_placements, path,
+                                                                           backend=backend)
+                          for doc, doc_placements, path in results]
+        return placement_ok, result_oks
@@ -0,0 +1,432 @@
+import asyncio
+import base64
+import collections
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Tuple
+
+from dxf_batch import split_quantity
+
+# 每个工作进程文档缓存的默认上限（按源文件字节数计算）
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# 请求体大小上限
+MAX_BODY_BYTES = 512 * 1024 * 1024
+
+# 延迟统计保留的最近请求数
+LATENCY_WINDOW = 1000
+
+HTTP_STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class DocumentCache:
+    """按源文件大小限制总容量的LRU文档缓存
+
+    缓存项为 (文档, 外包矩形记录)，键为路径+大小+修改时间或上传内容的摘要，
+    文件变化后自然失效。淘汰缓存项时调用 on_evict(键, 缓存项)。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES,
+                 on_evict: Optional[Callable[[object, object], None]] = None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.items = collections.OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key, value, size: int):
+        if key in self.items:
+            self.total_bytes -= self.items.pop(key)[1]
+        self.items[key] = (value, size)
+        self.total_bytes += size
+        # 超出容量时淘汰最久未使用的项（至少保留刚加入的一项）
+        while self.total_bytes > self.max_bytes and len(self.items) > 1:
+            evicted_key, (evicted, evicted_size) = self.items.popitem(last=False)
+            self.total_bytes -= evicted_size
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted)
+
+    def info(self) -> Dict:
+        return {'entries': len(self.items), 'bytes': self.total_bytes, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+# 工作进程中的全局文档缓存，由 _init_worker 创建
+_cache = None
+
+# 工作进程保存上传文件的目录，与文档缓存同生命周期。缓存的文档记录了源文件路径，
+# 上传文件不能放在单次请求的临时目录中。目录位于服务创建的上传根目录下、按进程区分
+# （各进程的缓存各自淘汰文件），服务停止时由主进程整体删除：
+# 工作进程通过 os._exit 退出，进程内注册的清理函数不会执行
+_upload_dir = None
+
+
+def _discard_upload(key, value):
+    """文档缓存淘汰上传的文件时删除对应的文件"""
+    if key[0] == 'upload':
+        with contextlib.suppress(OSError):
+            os.remove(value[2])
+
+
+def _init_worker(cache_bytes: int, upload_root: str):
+    """工作进程初始化：预先导入 ezdxf 和 matplotlib，创建文档缓存和上传文件目录"""
+    global _cache, _upload_dir
+    _cache = DocumentCache(cache_bytes, on_evict=_discard_upload)
+    _upload_dir = os.path.join(upload_root, str(os.getpid()))
+    os.makedirs(_upload_dir, exist_ok=True)
+    import ezdxf  # noqa: F401
+    import dxf_processor  # noqa: F401
+    import dxf_renderer
+    # dxf_renderer 在第一次渲染时才导入 matplotlib，工作进程中提前导入，请求时不再等待
+    dxf_renderer._load_pyplot()
+
+
+def _measure(doc) -> Dict:
+    """计算文档的外包矩形记录（与索引项格式相同，calculate_bounding_boxes 可直接使用）"""
+    from dxf_processor import _measure_entities
+    msp = doc.modelspace()
+    extents = _measure_entities(msp, 'ezdxf')
+    if not extents.has_data:
+        raise ValueError("没有找到几何实体")
+    return {
+        'extmin': tuple(extents.extmin),
+        'extmax': tuple(extents.extmax),
+        'entity_count': len(msp),
+        'layers': sorted({entity.dxf.layer for entity in msp}),
+    }
+
+
+def _load_input(item: Dict) -> Tuple[Dict, int]:
+    """读取一个输入（文件路径或上传内容），优先使用缓存，返回 (doc_info, 数量)
+
+    上传的内容写入 _upload_dir，在缓存项被淘汰之前一直保留。
+    """
+    import ezdxf
+
+    quantity = int(item.get('quantity', 1))
+    if 'data' in item:
+        data = base64.b64decode(item['data'])
+        name = os.path.basename(item.get('name') or 'upload.dxf')
+        key = ('upload', hashlib.sha1(data).hexdigest())
+        size = len(data)
+        path = os.path.join(_upload_dir, f"{key[1][:12]}_{name}")
+    else:
+        path = os.path.abspath(item['path'])
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        key = ('file', os.path.normcase(path), stat.st_size, stat.st_mtime_ns)
+        size = stat.st_size
+        data = None
+
+    cached = _cache.get(key)
+    if cached is None:
+        if data is not None:
+            with open(path, 'wb') as f:
+                f.write(data)
+        doc = ezdxf.readfile(path)
+        cached = (doc, _measure(doc), path)
+        _cache.put(key, cached, size)
+    doc, entry, path = cached
+    return {'doc': doc, 'file_path': path, 'name': name, 'quantity': quantity,
+            'index_entry': entry}, quantity
+
+
+def _merge_job(request: Dict) -> Dict:
+    """工作进程函数：执行一次合并请求"""
+    from dxf_processor import DXFProcessor
+    from dxf_renderer import DXFRenderer
+
+    start = time.perf_counter()
+    log = io.StringIO()
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(log):
+        try:
+            processor = DXFProcessor()
+            merged = {}
+            for item in request['inputs']:
+                doc_info, quantity = _load_input(item)
+                key = id(doc_info['doc'])
+                if key in merged:
+                    merged[key]['quantity'] += quantity
+                else:
+                    merged[key] = doc_info
+            processor.documents = list(merged.values())
+            load_seconds = time.perf_counter() - start
+
+            width, height = request['container']
+            if not processor.calculate_bounding_boxes():
+                raise RuntimeError("计算外包矩形失败")
+            placements = processor.pack_rectangles(width, height, request['gap'],
+                                                   multi_sheet=request['multi_sheet'],
+                                                   algorithm=request['algorithm'])
+            output_path = request.get('output') or os.path.join(work_dir, 'merged.dxf')
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            if not processor.create_merged_dxf(placements, output_path, width, height,
+                                               sheet_output=request['sheet_output'],
+                                               output_mode=request['output_mode']):
+                raise RuntimeError("创建合并文件失败")
+
+            result = {
+                'ok': True,
+                'outputs': processor.output_paths if request.get('output') else [],
+                'placements': [{'name': p['box']['doc_info']['name'],
+                                'position': list(p['position']),
+                                'rotation': p.get('rotation', 0),
+                                'sheet': p.get('sheet', 0)} for p in placements],
+                'sheets': len({p.get('sheet', 0) for p in placements}),
+            }
+            if request.get('return_dxf', True):
+                files = []
+                for path in processor.output_paths:
+                    with open(path, 'rb') as f:
+                        files.append({'name': os.path.basename(path),
+                                      'data': base64.b64encode(f.read()).decode('ascii')})
+                result['files'] = files
+            if request.get('preview'):
+                preview_path = os.path.join(work_dir, 'placement_preview.png')
+                DXFRenderer.render_placements_to_image(placements, width, height, preview_path)
+                with open(preview_path, 'rb') as f:
+                    result['preview'] = base64.b64encode(f.read()).decode('ascii')
+            result['timings'] = {'load': load_seconds,
+                                 'stages': {name: record['seconds']
+                                            for name, record in processor.stats.stages.items()}}
+        except Exception as e:
+            lines = log.getvalue().strip().splitlines()
+            result = {'ok': False, 'error': f"{e}" + (f"（{lines[-1]}）" if lines else "")}
+    result['worker_pid'] = os.getpid()
+    result['cache'] = _cache.info()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _output_path(output: str, output_root: str) -> str:
+    """把请求中的输出路径解析为 output_root 下的绝对路径，不允许写到 output_root 之外"""
+    if not isinstance(output, str) or not output:
+        raise ValueError(f"无效的输出路径: {output!r}")
+    root = os.path.realpath(output_root)
+    path = os.path.realpath(os.path.join(root, output))
+    if os.path.isabs(output) or os.path.commonpath([root, path]) != root:
+        raise ValueError(f"输出路径必须是输出目录 {root} 下的相对路径: {output}")
+    return path
+
+
+def _normalize_request(body: Dict, defaults: Dict, output_root: str) -> Dict:
+    """校验并补全合并请求参数"""
+    inputs = []
+    for item in body.get('inputs') or []:
+        if isinstance(item, str):
+            path, quantity = split_quantity(item)
+            inputs.append({'path': path, 'quantity': quantity})
+        elif isinstance(item, dict) and ('path' in item or 'data' in item):
+            inputs.append(item)
+        else:
+            raise ValueError(f"无效的输入: {item!r}")
+    if not inputs:
+        raise ValueError("缺少 inputs")
+    request = dict(defaults)
+    request.update({key: body[key] for key in ('gap', 'algorithm', 'multi_sheet', 'sheet_output',
+                                               'output_mode', 'preview', 'return_dxf', 'output')
+                    if key in body})
+    container = body.get('container', defaults['container'])
+    request['container'] = (float(container[0]), float(container[1]))
+    request['gap'] = float(request['gap'])
+    request['inputs'] = inputs
+    if request.get('output'):
+        request['output'] = _output_path(request['output'], output_root)
+    return request
+
+
+class MergeService:
+    """本地HTTP合并服务
+
+    POST /merge   提交合并请求（JSON），在预热的工作进程池中执行
+    GET  /metrics 队列长度、处理中的请求数、延迟统计和各工作进程的缓存状态
+    GET  /health  健康检查
+
+    请求示例：
+        {"inputs": ["D:/parts/a.dxf:12", {"name": "b.dxf", "data": "<base64>", "quantity": 3}],
+         "container": [300, 200], "gap": 2, "algorithm": "maxrects", "preview": true}
+    响应中 files 为合并后的DXF文件（base64），preview 为排样预览图（PNG，base64）。
+    请求中的 output 为相对于 output_root（默认为启动时的工作目录）的路径，不能指向该目录之外。
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8765, workers: Optional[int] = None,
+                 cache_bytes: int = DEFAULT_CACHE_BYTES, defaults: Optional[Dict] = None,
+                 output_root: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.output_root = os.path.abspath(output_root or os.getcwd())
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_bytes = cache_bytes
+        self.defaults = {
+            'container': (100.0, 100.0),
+            'gap': 8.0,
+            'algorithm': 'grid',
+            'multi_sheet': False,
+            'sheet_output': 'offset',
+            'output_mode': 'flatten',
+            'preview': False,
+            'return_dxf': True,
+        }
+        self.defaults.update(defaults or {})
+        self.executor = None
+        self.upload_root = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.worker_cache = {}
+        self.started = time.time()
+
+    def metrics(self) -> Dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(q):
+            return latencies[min(int(q * len(latencies)), len(latencies) - 1)] if latencies else None
+
+        return {
+            'workers': self.workers,
+            'queue_depth': max(self.pending - self.workers, 0),
+            'in_flight': min(self.pending, self.workers),
+            'completed': self.completed,
+            'failed': self.failed,
+            'uptime_seconds': time.time() - self.started,
+            'latency_seconds': {
+                'count': len(latencies),
+                'mean': sum(latencies) / len(latencies) if latencies else None,
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'max': latencies[-1] if latencies else None,
+            },
+            'worker_cache': {str(pid): info for pid, info in self.worker_cache.items()},
+        }
+
+    async def merge(self, body: Dict) -> Tuple[int, Dict]:
+        try:
+            request = _normalize_request(body, self.defaults, self.output_root)
+        except Exception as e:
+            return 400, {'ok': False, 'error': str(e)}
+        start = time.perf_counter()
+        self.pending += 1
+        executor = self.executor
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(executor, _merge_job, request)
+        except BrokenProcessPool as e:
+            # 工作进程异常退出（如内存不足被终止）后进程池不可再用：
+            # 本次请求失败，换一个新的进程池继续服务之后的请求
+            self.failed += 1
+            if self.executor is executor:
+                print(f"工作进程异常退出，重新创建进程池: {e!r}")
+                self._new_executor()
+                executor.shutdown(wait=False, cancel_futures=True)
+            return 500, {'ok': False, 'error': f"工作进程异常退出: {e!r}",
+                         'latency': time.perf_counter() - start}
+        finally:
+            self.pending -= 1
+        self.latencies.append(time.perf_counter() - start)
+        self.worker_cache[result.pop('worker_pid')] = result.pop('cache')
+        result['latency'] = time.perf_counter() - start
+        if result['ok']:
+            self.completed += 1
+            return 200, result
+        self.failed += 1
+        return 500, result
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            status, payload = await self._dispatch(reader)
+        except Exception as e:
+            status, payload = 500, {'ok': False, 'error': str(e)}
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write((f"HTTP/1.1 {status} {HTTP_STATUS.get(status, '')}\r\n"
+                      f"Content-Type: application/json; charset=utf-8\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      f"Connection: close\r\n\r\n").encode('ascii') + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader: asyncio.StreamReader) -> Tuple[int, Dict]:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) < 2:
+            return 400, {'ok': False, 'error': "无效的请求"}
+        method, target = request_line[0].upper(), request_line[1].split('?')[0]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if target == '/health':
+            return 200, {'ok': True}
+        if target == '/metrics':
+            return 200, self.metrics()
+        if target != '/merge':
+            return 404, {'ok': False, 'error': f"未知的路径: {target}"}
+        if method != 'POST':
+            return 405, {'ok': False, 'error': "请使用 POST"}
+
+        length = int(headers.get('content-length', 0))
+        if length > MAX_BODY_BYTES:
+            return 413, {'ok': False, 'error': "请求体过大"}
+        try:
+            body = json.loads((await reader.readexactly(length)).decode('utf-8'))
+        except Exception as e:
+            return 400, {'ok': False, 'error': f"无法解析请求体: {e}"}
+        return await self.merge(body)
+
+    def _new_executor(self):
+        """创建工作进程池（各进程的缓存统计随旧进程一起丢弃）"""
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.cache_bytes, self.upload_root))
+        self.worker_cache = {}
+
+    async def serve(self):
+        self.upload_root = tempfile.mkdtemp(prefix='dxf_service_')
+        self._new_executor()
+        try:
+            # 提前启动并预热全部工作进程
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(self.executor, os.getpid)
+                                   for _ in range(self.workers)])
+            server = await asyncio.start_server(self.handle, self.host, self.port)
+            print(f"合并服务已启动: http://{self.host}:{self.port}（{self.workers} 个工作进程）")
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(cancel_futures=True)
+            shutil.rmtree(self.upload_root, ignore_errors=True)
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("服务已停止")
+
+
+def parse_address(address: str) -> Tuple[str, int]:
+    """解析 [主机:]端口 形式的监听地址"""
+    host, sep, port = address.rpartition(':')
+    return (host if sep and host else '127.0.0.1'), int(port)
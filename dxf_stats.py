@@ -0,0 +1,144 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+
+def _windows_peak_bytes() -> Optional[int]:
+    """Windows 上通过 GetProcessMemoryInfo 读取当前进程的工作集峰值（字节），失败时返回None"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    try:
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        kernel32 = ctypes.WinDLL('kernel32')
+        psapi = ctypes.WinDLL('psapi')
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS),
+                                               wintypes.DWORD]
+        if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+            return None
+        return int(counters.PeakWorkingSetSize)
+    except (AttributeError, OSError):
+        return None
+
+
+def peak_rss_bytes(children: bool = False) -> Optional[int]:
+    """当前进程（children 为True时为已结束的子进程中最大者）的内存占用峰值（字节），平台不支持时返回None
+
+    Windows 没有 resource 模块，当前进程的峰值改用 GetProcessMemoryInfo 读取；子进程的峰值无法获取。
+    """
+    if resource is None:
+        if sys.platform == 'win32' and not children:
+            return _windows_peak_bytes()
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为KB，macOS 上为字节
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PipelineStats:
+    """处理流程的耗时和计数统计
+
+    - 阶段耗时：stage() 上下文管理器记录每个阶段的累计耗时和调用次数
+    - 文件耗时：record_file() 记录每个文件在各阶段的耗时
+    - 计数器：count() 累加实体数量、复制失败数等
+    - 内存峰值：进程内存峰值（resource 或 Windows API 可用时），以及 tracemalloc 已启动时
+      （例如设置了环境变量 PYTHONTRACEMALLOC=1）的 Python 堆峰值
+
+    通过 add_hook() 注册的回调会在事件发生时被调用：
+    hook(event, name, data)，event 为 'stage_start'、'stage_end'、'file'、'count' 或 'progress'。
+    """
+
+    def __init__(self):
+        self.hooks = []
+        self.reset()
+
+    def reset(self):
+        """清空已记录的统计数据（保留回调）"""
+        self.stages = {}
+        self.files = {}
+        self.counters = {}
+        self.peak_traced = 0
+
+    def add_hook(self, hook: Callable[[str, str, Dict], None]):
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[str, str, Dict], None]):
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def _emit(self, event: str, name: str, data: Dict):
+        for hook in self.hooks:
+            try:
+                hook(event, name, data)
+            except Exception as e:
+                print(f"统计回调执行失败 {event} {name}: {e}")
+
+    @contextmanager
+    def stage(self, name: str):
+        """统计一个阶段的耗时，同名阶段多次调用时累加"""
+        self._emit('stage_start', name, {})
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            record = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            record['seconds'] += seconds
+            record['calls'] += 1
+            if tracemalloc.is_tracing():
+                self.peak_traced = max(self.peak_traced, tracemalloc.get_traced_memory()[1])
+            self._emit('stage_end', name, {'seconds': seconds})
+
+    def record_file(self, file_path: str, stage: str, seconds: float):
+        """记录单个文件在某个阶段的耗时"""
+        self.files.setdefault(file_path, {})[stage] = seconds
+        self._emit('file', stage, {'file_path': file_path, 'seconds': seconds})
+
+    def progress(self, stage: str, done: int, total: int, file_path: Optional[str] = None):
+        """报告阶段内的进度（已完成 done / 共 total 项），只通知回调，不记录"""
+        self._emit('progress', stage, {'done': done, 'total': total, 'file_path': file_path})
+
+    def count(self, name: str, value: int = 1):
+        """累加计数器"""
+        self.counters[name] = self.counters.get(name, 0) + value
+        self._emit('count', name, {'value': value})
+
+    def report(self) -> Dict:
+        """以字典形式返回全部统计数据"""
+        return {
+            'stages': {name: dict(record) for name, record in self.stages.items()},
+            'files': {path: dict(stages) for path, stages in self.files.items()},
+            'counters': dict(self.counters),
+            'memory': {
+                'peak_rss_bytes': peak_rss_bytes(),
+                'peak_children_rss_bytes': peak_rss_bytes(children=True),
+                'peak_traced_bytes': self.peak_traced if tracemalloc.is_tracing() or self.peak_traced else None,
+            },
+        }
+
+    def save(self, report_path: str):
+        """将统计报告写入JSON文件"""
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
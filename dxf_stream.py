@@ -0,0 +1,88 @@
+"""流式写出DXF文件
+
+StreamingDXFWriter 不在内存中构建完整的合并文档：创建时先由一个空文档（只有默认的
+表、块记录和对象）导出文件头、TABLES、BLOCKS 等各段并立即写入文件，ENTITIES 段
+留空；之后每次把加入 modelspace 的实体导出到文件并从文档中删除，最后写出 OBJECTS
+等剩余的段。
+
+实体在同一个文档中创建，句柄由文档依次分配，删除后不会重复使用。文件头中的
+$HANDSEED（下一个可用句柄）在写出时还不知道，先写入 HANDSEED_WIDTH 位的占位值，
+关闭时回到该位置写入实际值（补零的十六进制数）。
+
+扩展字典属于 OBJECTS 段，而 OBJECTS 段在实体之后才写出，因此流式写出的实体不保留扩展字典。
+"""
+import io
+import os
+
+import ezdxf
+from ezdxf.lldxf.tagwriter import TagWriter
+
+# $HANDSEED 占位的十六进制位数（DXF 句柄最多 16 位）
+HANDSEED_WIDTH = 16
+
+
+class StreamingDXFWriter:
+    """逐批写出模型空间实体的DXF文件
+
+    用法：
+        writer = StreamingDXFWriter(path)
+        writer.modelspace.add_line(...)   # 或复制实体到 writer.modelspace
+        writer.write_modelspace()         # 写出并删除模型空间中的实体，可多次调用
+        writer.close()                    # 出错时调用 writer.abort() 删除未写完的文件
+    """
+
+    def __init__(self, path: str, dxfversion: str = 'R2010'):
+        self.path = path
+        self.doc = ezdxf.new(dxfversion)
+        self.modelspace = self.doc.modelspace()
+        self.entity_count = 0
+
+        skeleton = io.StringIO()
+        self.doc.write(skeleton)
+        text = skeleton.getvalue()
+        seed_start = text.index('\n  9\n$HANDSEED\n  5\n') + len('\n  9\n$HANDSEED\n  5\n')
+        seed_end = text.index('\n', seed_start)
+        entities = text.index('\n  2\nENTITIES\n') + len('\n  2\nENTITIES\n')
+        self.tail = text[entities:]
+
+        self.stream = open(path, 'wt', encoding=self.doc.output_encoding, errors='dxfreplace')
+        self.stream.write(text[:seed_start])
+        self.stream.flush()
+        self.handseed_offset = self.stream.buffer.tell()
+        self.stream.write('0' * HANDSEED_WIDTH)
+        self.stream.write(text[seed_end:entities])
+        self.tagwriter = TagWriter(self.stream, dxfversion=self.doc.dxfversion, write_handles=True)
+
+    def write_modelspace(self) -> int:
+        """把模型空间中的全部实体写入文件并删除，返回写出的实体数"""
+        entity_space = self.modelspace.entity_space
+        for entity in entity_space:
+            if entity.has_extension_dict:
+                entity.discard_extension_dict()
+            entity.export_dxf(self.tagwriter)
+        count = len(entity_space)
+        # 整批销毁后清空实体空间并从数据库中移除（逐个 delete_entity 需要逐个从列表中删除）
+        for entity in entity_space:
+            entity.destroy()
+        entity_space.clear()
+        self.doc.entitydb.purge()
+        self.entity_count += count
+        return count
+
+    def close(self):
+        """写出剩余的段，并回填 $HANDSEED"""
+        self.write_modelspace()
+        self.stream.write(self.tail)
+        self.stream.close()
+        handseed = str(self.doc.entitydb.handles).rjust(HANDSEED_WIDTH, '0')
+        with open(self.path, 'r+b') as f:
+            f.seek(self.handseed_offset)
+            f.write(handseed.encode('ascii'))
+
+    def abort(self):
+        """放弃写出，删除未写完的文件"""
+        self.stream.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
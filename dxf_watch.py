@@ -0,0 +1,172 @@
+import os
+import time
+from functools import partial
+from typing import Dict, Optional, Tuple
+
+from dxf_processor import DXFProcessor, _load_dxf_document, _measure_entities
+
+# 轮询间隔（秒）
+POLL_INTERVAL = 1.0
+
+
+def _parse_file(file_path: str, extents_mode: str = 'ezdxf'):
+    """进程池工作函数：解析单个文件并计算外包矩形，返回 (doc_info, 错误信息)"""
+    doc, error = _load_dxf_document(file_path)
+    if doc is None:
+        return None, error
+    try:
+        msp = doc.modelspace()
+        extents = _measure_entities(msp, extents_mode)
+        if not extents.has_data:
+            return None, "没有找到几何实体"
+        return {
+            'doc': doc,
+            'file_path': file_path,
+            'name': os.path.basename(file_path),
+            'quantity': 1,
+            # 外包矩形已经算好，calculate_bounding_boxes 直接使用
+            'index_entry': {
+                'extmin': tuple(extents.extmin),
+                'extmax': tuple(extents.extmax),
+                'entity_count': len(msp),
+                'layers': sorted({entity.dxf.layer for entity in msp}),
+            },
+        }, None
+    except Exception as e:
+        return None, str(e)
+
+
+class DXFWatcher:
+    """监视目录中的DXF文件，文件变化时增量重新合并
+
+    已解析的文档和外包矩形保存在内存中，每次只重新解析新增或修改过的文件，
+    然后重新排样并写出合并文件。文件的大小或修改时间在相邻两次轮询中都不再变化
+    （即写入完成）后才会被处理。
+    """
+
+    def __init__(self, folder: str, output_path: str, container_width: float = 100.0,
+                 container_height: float = 100.0, gap: float = 8.0, algorithm: str = 'grid',
+                 multi_sheet: bool = False, sheet_output: str = 'offset',
+                 output_mode: str = 'flatten', extents_mode: str = 'ezdxf',
+                 interval: float = POLL_INTERVAL):
+        self.folder = folder
+        self.output_path = output_path
+        self.container_width = container_width
+        self.container_height = container_height
+        self.gap = gap
+        self.algorithm = algorithm
+        self.multi_sheet = multi_sheet
+        self.sheet_output = sheet_output
+        self.output_mode = output_mode
+        self.extents_mode = extents_mode
+        self.interval = interval
+        self.processor = DXFProcessor()
+        # 路径 -> (文件大小, 修改时间)，以及已解析文件的 doc_info
+        self.signatures = {}
+        self.pending = {}
+        self.cache = {}
+        self.merge_count = 0
+
+    def _is_sheet_output(self, file_path: str) -> bool:
+        """是否为按版面拆分输出的合并文件（输出名_sheetN.dxf）"""
+        root, ext = os.path.splitext(os.path.abspath(self.output_path))
+        name, file_ext = os.path.splitext(file_path)
+        prefix = root + '_sheet'
+        return (os.path.normcase(file_ext) == os.path.normcase(ext) and
+                os.path.normcase(name).startswith(os.path.normcase(prefix)) and
+                name[len(prefix):].isdigit())
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """列出目录中的DXF文件及其大小和修改时间（跳过合并输出文件本身）"""
+        outputs = {os.path.normcase(os.path.abspath(path))
+                   for path in [self.output_path] + self.processor.output_paths}
+        found = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith('.dxf'):
+                    continue
+                path = os.path.abspath(entry.path)
+                if os.path.normcase(path) in outputs or self._is_sheet_output(path):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                found[path] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def poll(self) -> bool:
+        """检查一次目录，有文件变化时增量更新并重新合并，返回是否重新合并"""
+        current = self._scan()
+        changed = False
+
+        # 删除的文件
+        for path in list(self.signatures):
+            if path not in current:
+                del self.signatures[path]
+                self.cache.pop(path, None)
+                print(f"文件已删除: {path}")
+                changed = True
+
+        # 新增或修改的文件，大小和修改时间稳定后才处理
+        ready = []
+        for path, signature in current.items():
+            if self.signatures.get(path) == signature:
+                self.pending.pop(path, None)
+                continue
+            if self.pending.get(path) != signature:
+                self.pending[path] = signature
+                continue
+            del self.pending[path]
+            self.signatures[path] = signature
+            ready.append(path)
+
+        if ready:
+            start = time.perf_counter()
+            results = self.processor._map_files(partial(_parse_file, extents_mode=self.extents_mode),
+                                                ready, 'parse')
+            for path, (doc_info, error) in zip(ready, results):
+                if doc_info is None:
+                    self.cache.pop(path, None)
+                    print(f"读取文件失败 {path}: {error}")
+                else:
+                    self.cache[path] = doc_info
+            print(f"已解析 {len(ready)} 个新增或修改的文件（{time.perf_counter() - start:.2f} 秒）")
+            changed = True
+
+        if changed:
+            self.merge()
+        return changed
+
+    def merge(self) -> bool:
+        """用内存中的文档重新排样并写出合并文件"""
+        if not self.cache:
+            print("目录中没有可合并的DXF文件")
+            return False
+        start = time.perf_counter()
+        processor = self.processor
+        processor.documents = [self.cache[path] for path in sorted(self.cache)]
+        if not processor.calculate_bounding_boxes():
+            return False
+        placements = processor.pack_rectangles(self.container_width, self.container_height, self.gap,
+                                               multi_sheet=self.multi_sheet, algorithm=self.algorithm)
+        if not processor.create_merged_dxf(placements, self.output_path, self.container_width,
+                                           self.container_height, sheet_output=self.sheet_output,
+                                           output_mode=self.output_mode):
+            return False
+        self.merge_count += 1
+        print(f"第 {self.merge_count} 次合并完成，{len(placements)} 个图形，"
+              f"耗时 {time.perf_counter() - start:.2f} 秒")
+        return True
+
+    def run(self, max_polls: Optional[int] = None):
+        """持续轮询目录，按 Ctrl+C 结束；max_polls 限制轮询次数（None 表示不限）"""
+        print(f"正在监视目录: {self.folder}（输出: {self.output_path}，按 Ctrl+C 结束）")
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                self.poll()
+                polls += 1
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print("已停止监视")
@@ -0,0 +1,261 @@
+"""预览图的分级缩放显示
+
+ImagePyramid 在设置图片时一次性生成逐级缩小一半的图像金字塔，缩放时从分辨率最接近的一级
+重采样，避免每次都对原图做整幅 LANCZOS 缩放。
+ZoomView 把画布划分为固定大小的图块，只重采样画布中可见的图块；滚轮和窗口大小变化经过防抖处理，
+交互过程中使用快速滤波，停止操作后再用高质量滤波重新绘制可见图块。
+"""
+import math
+import tkinter as tk
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageTk
+
+# 图块边长（显示像素）
+TILE_SIZE = 256
+
+# 金字塔最小一级的短边长度（像素）
+MIN_LEVEL_SIZE = 64
+
+# 滚轮和拖动的合并间隔（毫秒）：间隔内的多次事件只重新绘制一次
+INTERACT_MS = 16
+
+# 停止操作多久后（毫秒）用高质量滤波重新绘制
+SETTLE_MS = 150
+
+# 画布大小变化的防抖时间（毫秒）
+RESIZE_MS = 100
+
+# 最大放大倍数（相对于原图像素）和相对于适应窗口大小的最小缩小倍数
+MAX_ZOOM = 32.0
+MIN_FIT_RATIO = 0.125
+
+# 交互过程中和停止操作后使用的滤波（Image.Resampling 在 Pillow 9.1 才加入，更早的版本只有模块级常量）
+_RESAMPLING = getattr(Image, 'Resampling', Image)
+FAST_FILTER = _RESAMPLING.NEAREST
+QUALITY_FILTER = _RESAMPLING.LANCZOS
+
+
+class ImagePyramid:
+    """逐级缩小一半的图像金字塔，levels[0] 为原图"""
+
+    def __init__(self, image: Image.Image):
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        self.levels = [image]
+        while min(self.levels[-1].size) >= 2 * MIN_LEVEL_SIZE:
+            self.levels.append(self.levels[-1].reduce(2))
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.levels[0].size
+
+    def level_for(self, zoom: float) -> int:
+        """显示比例为 zoom（显示像素/原图像素）时使用的级别：分辨率不低于显示分辨率的最小一级"""
+        if zoom >= 1.0:
+            return 0
+        return min(int(math.floor(math.log2(1.0 / zoom))), len(self.levels) - 1)
+
+    def render(self, zoom: float, box: Tuple[int, int, int, int], resample=QUALITY_FILTER) -> Image.Image:
+        """按显示比例 zoom 渲染显示坐标中的矩形区域 box = (左, 上, 右, 下)"""
+        level = self.levels[self.level_for(zoom)]
+        factor_x = level.width / self.levels[0].width / zoom
+        factor_y = level.height / self.levels[0].height / zoom
+        left, top, right, bottom = box
+        source = (left * factor_x, top * factor_y,
+                  min(right * factor_x, level.width), min(bottom * factor_y, level.height))
+        return level.resize((right - left, bottom - top), resample, box=source)
+
+
+class ZoomView:
+    """在 Tk 画布上分块显示可缩放、可拖动的图片
+
+    - 滚轮以鼠标位置为中心缩放，按住左键拖动平移
+    - 画布大小变化时（防抖后）重新适应窗口大小；用户缩放过之后保持当前比例
+    """
+
+    def __init__(self, canvas: tk.Canvas, margin: int = 10):
+        self.canvas = canvas
+        self.margin = margin
+        self.pyramid = None
+        self.zoom = 1.0
+        self.fit_zoom = 1.0
+        self.fitted = True
+        # 画布左上角对应的显示坐标（图片左上角为原点）
+        self.offset = (0.0, 0.0)
+        # (列, 行) -> (画布项, PhotoImage, 是否为高质量)，只对 tile_zoom 有效
+        self.tiles: Dict[Tuple[int, int], Tuple[int, ImageTk.PhotoImage, bool]] = {}
+        self.tile_zoom = None
+        self.settle_job = None
+        self.interact_job = None
+        self.resize_job = None
+        self.drag_start = None
+
+        canvas.bind("<MouseWheel>", self.on_mouse_wheel)
+        canvas.bind("<Button-4>", self.on_mouse_wheel)
+        canvas.bind("<Button-5>", self.on_mouse_wheel)
+        canvas.bind("<ButtonPress-1>", self.on_press)
+        canvas.bind("<B1-Motion>", self.on_drag)
+        canvas.bind("<Configure>", self.on_configure)
+
+    def _canvas_size(self) -> Tuple[int, int]:
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        # 画布还未完全绘制时使用默认值
+        return (width if width > 1 else 350), (height if height > 1 else 250)
+
+    def _display_size(self) -> Tuple[float, float]:
+        width, height = self.pyramid.size
+        return width * self.zoom, height * self.zoom
+
+    def set_image(self, image: Optional[Image.Image]):
+        """显示新图片（None 时清空画布），构建金字塔并适应窗口大小"""
+        self._clear_tiles()
+        self.pyramid = ImagePyramid(image) if image is not None else None
+        self.reset()
+
+    def reset(self):
+        """恢复为适应窗口大小并居中"""
+        if self.pyramid is None:
+            return
+        canvas_width, canvas_height = self._canvas_size()
+        width, height = self.pyramid.size
+        self.fit_zoom = min((canvas_width - 2 * self.margin) / width,
+                            (canvas_height - 2 * self.margin) / height)
+        self.fit_zoom = max(self.fit_zoom, 1e-3)
+        self.zoom = self.fit_zoom
+        self.fitted = True
+        display_width, display_height = self._display_size()
+        self.offset = ((display_width - canvas_width) / 2, (display_height - canvas_height) / 2)
+        self.redraw(quality=True)
+
+    def zoom_by(self, factor: float, anchor: Optional[Tuple[float, float]] = None):
+        """以画布坐标 anchor（默认画布中心）为中心缩放 factor 倍"""
+        if self.pyramid is None:
+            return
+        zoom = min(max(self.zoom * factor, self.fit_zoom * MIN_FIT_RATIO), MAX_ZOOM)
+        if zoom == self.zoom:
+            return
+        if anchor is None:
+            canvas_width, canvas_height = self._canvas_size()
+            anchor = (canvas_width / 2, canvas_height / 2)
+        # 保持 anchor 下的图片位置不变
+        ratio = zoom / self.zoom
+        self.offset = ((self.offset[0] + anchor[0]) * ratio - anchor[0],
+                       (self.offset[1] + anchor[1]) * ratio - anchor[1])
+        self.zoom = zoom
+        self.fitted = False
+        self._schedule_fast_redraw()
+
+    def pan(self, dx: float, dy: float):
+        self.offset = (self.offset[0] - dx, self.offset[1] - dy)
+        self.fitted = False
+        self._schedule_fast_redraw()
+
+    def _schedule_fast_redraw(self):
+        if self.interact_job is None:
+            self.interact_job = self.canvas.after(INTERACT_MS, self._fast_redraw)
+
+    def _fast_redraw(self):
+        self.interact_job = None
+        self.redraw(quality=False)
+
+    def _clamp_offset(self):
+        """图片小于画布时居中，否则不允许拖出画布（保留 margin 的空白）"""
+        canvas_width, canvas_height = self._canvas_size()
+        display_width, display_height = self._display_size()
+        clamped = []
+        for offset, display, canvas in ((self.offset[0], display_width, canvas_width),
+                                        (self.offset[1], display_height, canvas_height)):
+            if display + 2 * self.margin <= canvas:
+                clamped.append((display - canvas) / 2)
+            else:
+                clamped.append(min(max(offset, -self.margin), display - canvas + self.margin))
+        self.offset = tuple(clamped)
+
+    def _clear_tiles(self):
+        for item, _, _ in self.tiles.values():
+            self.canvas.delete(item)
+        self.tiles = {}
+        self.tile_zoom = None
+
+    def redraw(self, quality: bool = True):
+        """绘制可见图块；quality 为False时用快速滤波，并在停止操作后补一次高质量绘制"""
+        for job in (self.settle_job, self.interact_job):
+            if job is not None:
+                self.canvas.after_cancel(job)
+        self.settle_job = self.interact_job = None
+        if self.pyramid is None:
+            self._clear_tiles()
+            return
+        self._clamp_offset()
+        if self.tile_zoom != self.zoom:
+            self._clear_tiles()
+            self.tile_zoom = self.zoom
+
+        canvas_width, canvas_height = self._canvas_size()
+        display_width, display_height = self._display_size()
+        display_width, display_height = int(math.ceil(display_width)), int(math.ceil(display_height))
+        offset_x, offset_y = self.offset
+        first_col = max(int(offset_x // TILE_SIZE), 0)
+        first_row = max(int(offset_y // TILE_SIZE), 0)
+        last_col = min(int((offset_x + canvas_width) // TILE_SIZE), (display_width - 1) // TILE_SIZE)
+        last_row = min(int((offset_y + canvas_height) // TILE_SIZE), (display_height - 1) // TILE_SIZE)
+
+        visible = set()
+        pending_quality = False
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                key = (col, row)
+                visible.add(key)
+                x, y = col * TILE_SIZE, row * TILE_SIZE
+                tile = self.tiles.get(key)
+                if tile is None or (quality and not tile[2]):
+                    box = (x, y, min(x + TILE_SIZE, display_width), min(y + TILE_SIZE, display_height))
+                    photo = ImageTk.PhotoImage(self.pyramid.render(
+                        self.zoom, box, QUALITY_FILTER if quality else FAST_FILTER))
+                    if tile is None:
+                        item = self.canvas.create_image(0, 0, image=photo, anchor=tk.NW)
+                    else:
+                        item = tile[0]
+                        self.canvas.itemconfigure(item, image=photo)
+                    tile = (item, photo, quality)
+                    self.tiles[key] = tile
+                self.canvas.coords(tile[0], x - offset_x, y - offset_y)
+                pending_quality = pending_quality or not tile[2]
+
+        # 移出画布的图块
+        for key in [key for key in self.tiles if key not in visible]:
+            self.canvas.delete(self.tiles.pop(key)[0])
+
+        if pending_quality:
+            self.settle_job = self.canvas.after(SETTLE_MS, self.redraw)
+
+    def on_mouse_wheel(self, event):
+        # Windows系统使用event.delta，Linux/Mac使用Button-4和Button-5
+        if event.num == 4 or event.delta > 0:
+            self.zoom_by(1.1, (event.x, event.y))
+        elif event.num == 5 or event.delta < 0:
+            self.zoom_by(1 / 1.1, (event.x, event.y))
+
+    def on_press(self, event):
+        self.drag_start = (event.x, event.y)
+
+    def on_drag(self, event):
+        if self.drag_start is None:
+            return
+        dx, dy = event.x - self.drag_start[0], event.y - self.drag_start[1]
+        self.drag_start = (event.x, event.y)
+        self.pan(dx, dy)
+
+    def on_configure(self, event):
+        # 拖动窗口边框时会连续触发，等大小稳定后再重新绘制
+        if self.resize_job is not None:
+            self.canvas.after_cancel(self.resize_job)
+        self.resize_job = self.canvas.after(RESIZE_MS, self._on_resized)
+
+    def _on_resized(self):
+        self.resize_job = None
+        if self.fitted:
+            self.reset()
+        else:
+            self.redraw(quality=True)
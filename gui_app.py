@@ -1,11 +1,12 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import os
+import multiprocessing
 import threading
-from dxf_processor import DXFProcessor
-from dxf_renderer import DXFRenderer
-import ezdxf
-from PIL import Image, ImageTk
+import time
+from dxf_layout_view import LayoutCanvas
+from dxf_zoom import ZoomView
+from PIL import Image
 
 class DXFMergeGUI:
     def __init__(self, root):
@@ -13,24 +14,36 @@ class DXFMergeGUI:
         self.root.title("DXF文件合并工具")
         self.root.geometry("800x700")
         
-        # 文件列表
+        # 最近一次合并生成的文档（用于预览）
+        self.merged_doc = None
+        
+        # 处理过程的取消标志（“取消”按钮设置）
+        self.cancel_event = threading.Event()
+        
+        # 文件列表及每个文件的数量
         self.input_files = []
+        self.input_quantities = []
+        
+        # 实时排样：读取过的外包矩形保存在 live_processor 中，修改设置后只重新排样
+        self.live_processor = None
+        self.live_files = None
+        self.live_loading = False
+        self.live_placements = None
+        self.live_container_size = None
+        self.relayout_job = None
+        # 排样和写出都在后台线程中使用 live_processor，同一时间只运行其中一个；
+        # 运行期间的设置变化记为 relayout_pending，结束后再排样一次
+        self.relayout_running = False
+        self.relayout_pending = False
+        self.live_committing = False
         
         # 图片相关变量
         self.layout_image = None
         self.result_image = None
-        self.layout_photo = None
-        self.result_photo = None
-        self.layout_scale = 1.0
-        self.result_scale = 1.0
         
-        # 创建界面
+        # 创建界面（预览画布的缩放、拖动和窗口大小变化由 ZoomView 处理）
         self.create_widgets()
         
-        # 绑定窗口大小变化事件
-        self.root.bind("<Configure>", self.on_window_configure)
-        self.configure_has_been_called = False
-        
     def create_widgets(self):
         # 主框架
         main_frame = ttk.Frame(self.root, padding="10")
@@ -64,6 +77,15 @@ class DXFMergeGUI:
         scrollbar = ttk.Scrollbar(file_frame, orient=tk.VERTICAL, command=self.file_listbox.yview)
         scrollbar.grid(row=1, column=2, sticky=(tk.N, tk.S), pady=(5, 0))
         self.file_listbox.configure(yscrollcommand=scrollbar.set)
+        self.file_listbox.bind("<<ListboxSelect>>", self.on_file_select)
+        
+        # 数量设置
+        quantity_frame = ttk.Frame(file_frame)
+        quantity_frame.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=(5, 0))
+        ttk.Label(quantity_frame, text="数量:").pack(side=tk.LEFT)
+        self.quantity_var = tk.IntVar(value=1)
+        ttk.Spinbox(quantity_frame, from_=1, to=9999, textvariable=self.quantity_var, width=6).pack(side=tk.LEFT, padx=(5, 5))
+        ttk.Button(quantity_frame, text="设置选中文件数量", command=self.set_quantity).pack(side=tk.LEFT)
         
         # 设置区域
         settings_frame = ttk.LabelFrame(main_frame, text="设置", padding="10")
@@ -99,6 +121,36 @@ class DXFMergeGUI:
         ttk.Entry(gap_frame, textvariable=self.gap_size_var, width=10).pack(side=tk.LEFT)
         ttk.Label(gap_frame, text=" mm").pack(side=tk.LEFT)
         
+        # 多版面设置
+        self.multi_sheet_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="放不下时溢出到多个版面",
+                        variable=self.multi_sheet_var).grid(row=3, column=1, sticky=tk.W, padx=(5, 0), pady=2)
+        
+        # 排样算法设置
+        ttk.Label(settings_frame, text="排样算法:").grid(row=4, column=0, sticky=tk.W, pady=2)
+        self.algorithm_var = tk.StringVar(value="grid")
+        ttk.Combobox(settings_frame, textvariable=self.algorithm_var, values=("grid", "maxrects", "skyline", "shape"),
+                     state="readonly", width=10).grid(row=4, column=1, sticky=tk.W, padx=(5, 0), pady=2)
+        
+        # 输出方式设置
+        self.use_blocks_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="以块引用输出（文件更小）",
+                        variable=self.use_blocks_var).grid(row=5, column=1, sticky=tk.W, padx=(5, 0), pady=2)
+        
+        # 预览方式设置
+        self.fast_preview_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="快速预览（缓存图形缩略图并拼贴）",
+                        variable=self.fast_preview_var).grid(row=6, column=1, sticky=tk.W, padx=(5, 0), pady=2)
+        
+        # 实时排样设置（修改容器尺寸、间隙等设置后立即在排样预览中重新排样）
+        self.live_layout_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text="实时排样（修改设置后立即更新排样预览，不写出文件）",
+                        variable=self.live_layout_var,
+                        command=self.toggle_live_layout).grid(row=7, column=1, sticky=tk.W, padx=(5, 0), pady=2)
+        for var in (self.container_width_var, self.container_height_var, self.gap_size_var,
+                    self.multi_sheet_var, self.algorithm_var):
+            var.trace_add('write', self.schedule_relayout)
+        
         # 操作按钮
         button_frame = ttk.Frame(main_frame)
         button_frame.grid(row=2, column=0, columnspan=2, pady=(0, 10))
@@ -106,11 +158,17 @@ class DXFMergeGUI:
         self.process_button = ttk.Button(button_frame, text="开始处理", command=self.start_processing)
         self.process_button.pack(side=tk.LEFT, padx=(0, 5))
         
+        self.cancel_button = ttk.Button(button_frame, text="取消", command=self.cancel_processing, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.LEFT, padx=(5, 5))
+        
+        self.commit_button = ttk.Button(button_frame, text="写出DXF", command=self.commit_layout, state=tk.DISABLED)
+        self.commit_button.pack(side=tk.LEFT, padx=(5, 5))
+        
         self.preview_button = ttk.Button(button_frame, text="生成预览", command=self.generate_preview, state=tk.DISABLED)
         self.preview_button.pack(side=tk.LEFT, padx=(5, 0))
         
-        # 进度条
-        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
+        # 进度条（处理时按总体进度显示，生成预览时为不确定模式）
+        self.progress = ttk.Progressbar(main_frame, mode='indeterminate', maximum=100)
         self.progress.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
         
         # 预览区域
@@ -140,9 +198,8 @@ class DXFMergeGUI:
         
         self.layout_canvas = tk.Canvas(layout_frame, bg='white')
         self.layout_canvas.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        self.layout_canvas.bind("<MouseWheel>", lambda event: self.on_mouse_wheel(event, "layout"))
-        self.layout_canvas.bind("<Button-4>", lambda event: self.on_mouse_wheel(event, "layout"))
-        self.layout_canvas.bind("<Button-5>", lambda event: self.on_mouse_wheel(event, "layout"))
+        self.layout_view = ZoomView(self.layout_canvas)
+        self.live_view = LayoutCanvas(self.layout_canvas)
         
         # 结果预览
         result_frame = ttk.Frame(preview_frame)
@@ -163,9 +220,7 @@ class DXFMergeGUI:
         
         self.result_canvas = tk.Canvas(result_frame, bg='white')
         self.result_canvas.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        self.result_canvas.bind("<MouseWheel>", lambda event: self.on_mouse_wheel(event, "result"))
-        self.result_canvas.bind("<Button-4>", lambda event: self.on_mouse_wheel(event, "result"))
-        self.result_canvas.bind("<Button-5>", lambda event: self.on_mouse_wheel(event, "result"))
+        self.result_view = ZoomView(self.result_canvas)
         
         # 状态栏
         self.status_var = tk.StringVar(value="就绪")
@@ -181,7 +236,37 @@ class DXFMergeGUI:
         for file in files:
             if file not in self.input_files:
                 self.input_files.append(file)
-                self.file_listbox.insert(tk.END, os.path.basename(file))
+                self.input_quantities.append(1)
+                self.file_listbox.insert(tk.END, self.file_label(len(self.input_files) - 1))
+        self.on_inputs_changed()
+                
+    def file_label(self, index):
+        """文件列表中显示的文本：文件名 × 数量"""
+        return f"{os.path.basename(self.input_files[index])} × {self.input_quantities[index]}"
+        
+    def on_file_select(self, event):
+        selection = self.file_listbox.curselection()
+        if selection:
+            self.quantity_var.set(self.input_quantities[selection[0]])
+            
+    def set_quantity(self):
+        selection = self.file_listbox.curselection()
+        if not selection:
+            messagebox.showwarning("警告", "请先选择文件")
+            return
+        try:
+            quantity = self.quantity_var.get()
+        except tk.TclError:
+            quantity = 0
+        if quantity < 1:
+            messagebox.showwarning("警告", "数量必须为正整数")
+            return
+        index = selection[0]
+        self.input_quantities[index] = quantity
+        self.file_listbox.delete(index)
+        self.file_listbox.insert(index, self.file_label(index))
+        self.file_listbox.selection_set(index)
+        self.on_inputs_changed()
                 
     def remove_file(self):
         selection = self.file_listbox.curselection()
@@ -189,6 +274,8 @@ class DXFMergeGUI:
             index = selection[0]
             self.file_listbox.delete(index)
             del self.input_files[index]
+            del self.input_quantities[index]
+            self.on_inputs_changed()
             
     def browse_output(self):
         filename = filedialog.asksaveasfilename(
@@ -200,6 +287,194 @@ class DXFMergeGUI:
         if filename:
             self.output_path_var.set(filename)
             
+    def toggle_live_layout(self):
+        if self.live_layout_var.get():
+            self.load_live_boxes()
+        else:
+            self.live_view.clear()
+            self.live_placements = None
+            self.commit_button.config(state=tk.DISABLED)
+            self.status_var.set("已关闭实时排样")
+            
+    def on_inputs_changed(self):
+        """文件列表或数量变化：只改数量时用已读取的外包矩形重新排样，否则重新读取"""
+        if not self.live_layout_var.get():
+            return
+        if self.live_processor is not None and self.live_files == self.input_files:
+            self.schedule_relayout()
+        else:
+            self.load_live_boxes()
+            
+    def load_live_boxes(self):
+        """在后台线程中读取文件并计算外包矩形，完成后开始实时排样"""
+        self.live_processor = None
+        self.live_placements = None
+        self.commit_button.config(state=tk.DISABLED)
+        if not self.input_files:
+            self.live_view.clear()
+            self.status_var.set("实时排样：请至少选择一个DXF文件")
+            return
+        if self.live_loading:
+            # 正在读取的结果返回时发现文件列表已变化，会重新读取
+            return
+        self.live_loading = True
+        self.status_var.set("实时排样：正在读取图形...")
+        files, quantities = list(self.input_files), list(self.input_quantities)
+        
+        def work():
+            try:
+                from dxf_processor import DXFProcessor
+                processor = DXFProcessor()
+                if not (processor.read_dxf_files(files, quantities=quantities) and
+                        processor.calculate_bounding_boxes()):
+                    processor = None
+            except Exception as e:
+                print(f"实时排样读取文件失败: {e}")
+                processor = None
+            self.root.after(0, lambda: self.live_boxes_loaded(processor, files))
+        
+        threading.Thread(target=work, daemon=True).start()
+        
+    def live_boxes_loaded(self, processor, files):
+        self.live_loading = False
+        if not self.live_layout_var.get():
+            return
+        if files != self.input_files:
+            self.load_live_boxes()
+            return
+        if processor is None:
+            self.status_var.set("实时排样：读取文件失败")
+            return
+        self.live_processor = processor
+        self.live_files = files
+        # 同时更新读取期间修改过的数量
+        self.on_inputs_changed()
+        
+    def schedule_relayout(self, *args):
+        """设置变化时在下一次空闲时重新排样（同一帧内的多次变化只排样一次）
+
+        排样或写出正在进行时只记下有新的变化，结束后再排样一次。
+        """
+        if self.live_processor is None or not self.live_layout_var.get() or self.relayout_job is not None:
+            return
+        if self.relayout_running or self.live_committing:
+            self.relayout_pending = True
+            return
+        self.relayout_job = self.root.after_idle(self.relayout)
+        
+    def relayout(self):
+        """用内存中的外包矩形在后台线程中重新排样，完成后把结果直接绘制在排样预览画布上
+
+        真实外形排样可能需要一秒以上，放在界面线程中会使窗口失去响应。
+        """
+        self.relayout_job = None
+        processor = self.live_processor
+        if processor is None:
+            return
+        if self.relayout_running or self.live_committing:
+            self.relayout_pending = True
+            return
+        try:
+            container_width = self.container_width_var.get()
+            container_height = self.container_height_var.get()
+            gap_size = self.gap_size_var.get()
+        except tk.TclError:
+            # 输入框正在编辑（为空或不是数字），保持上一次的排样
+            return
+        if container_width <= 0 or container_height <= 0 or gap_size < 0:
+            return
+        # 数量在排样开始前写入外包矩形，排样线程运行期间不修改
+        quantity_of = dict(zip(self.input_files, self.input_quantities))
+        for box in processor.bounding_boxes:
+            box['quantity'] = box['doc_info']['quantity'] = quantity_of.get(box['doc_info']['file_path'],
+                                                                             box['quantity'])
+        multi_sheet = self.multi_sheet_var.get()
+        algorithm = self.algorithm_var.get()
+        container_size = (container_width, container_height)
+        self.relayout_running = True
+        # 排样期间不能写出（写出的是排样开始前的结果，而且与排样共用同一个处理器）
+        self.commit_button.config(state=tk.DISABLED)
+        
+        def work():
+            start = time.perf_counter()
+            try:
+                placements = processor.pack_rectangles(container_width, container_height, gap_size,
+                                                       multi_sheet=multi_sheet, algorithm=algorithm)
+            except Exception as e:
+                print(f"实时排样失败: {e}")
+                placements = None
+            seconds = time.perf_counter() - start
+            self.root.after(0, lambda: self.relayout_done(processor, placements, container_size, seconds))
+        
+        threading.Thread(target=work, daemon=True).start()
+        
+    def relayout_done(self, processor, placements, container_size, seconds):
+        self.relayout_running = False
+        # 排样期间关闭了实时排样或重新读取了文件时丢弃结果
+        if processor is self.live_processor and self.live_layout_var.get():
+            if placements is None:
+                self.status_var.set("实时排样失败")
+            else:
+                if self.layout_view.pyramid is not None:
+                    self.layout_view.set_image(None)
+                self.live_view.show(placements, container_size[0], container_size[1])
+                self.live_placements = placements
+                self.live_container_size = container_size
+                sheets = len({placement.get('sheet', 0) for placement in placements})
+                self.status_var.set(f"实时排样：{len(placements)} 个图形，{sheets} 个版面"
+                                    f"（{seconds * 1000:.0f} 毫秒），点击“写出DXF”保存")
+            if self.live_placements is not None:
+                self.commit_button.config(state=tk.NORMAL)
+        if self.relayout_pending:
+            self.relayout_pending = False
+            self.schedule_relayout()
+        
+    def commit_layout(self):
+        """把当前的实时排样结果写出为DXF文件
+
+        写出期间暂停重新排样（写出和排样共用 live_processor），设置变化在写出完成后再排样。
+        """
+        if self.live_placements is None or self.relayout_running or self.live_committing:
+            return
+        self.live_committing = True
+        processor = self.live_processor
+        placements = self.live_placements
+        container_width, container_height = self.live_container_size
+        output_path = self.output_path_var.get()
+        output_mode = 'blocks' if self.use_blocks_var.get() else 'flatten'
+        self.commit_button.config(state=tk.DISABLED)
+        self.status_var.set("正在写出DXF文件...")
+        
+        def work():
+            try:
+                ok = processor.create_merged_dxf(placements, output_path, container_width,
+                                                 container_height, output_mode=output_mode)
+            except Exception as e:
+                print(f"写出DXF文件失败: {e}")
+                ok = False
+            self.root.after(0, lambda: self.layout_committed(ok, processor, placements, output_path,
+                                                             (container_width, container_height)))
+        
+        threading.Thread(target=work, daemon=True).start()
+        
+    def layout_committed(self, ok, processor, placements, output_path, container_size):
+        self.live_committing = False
+        if self.relayout_pending:
+            self.relayout_pending = False
+            self.schedule_relayout()
+        if self.live_placements is not None and not self.relayout_running:
+            self.commit_button.config(state=tk.NORMAL)
+        if not ok:
+            messagebox.showerror("错误", "写出DXF文件失败")
+            self.status_var.set("写出DXF文件失败")
+            return
+        self.output_path = output_path
+        self.merged_doc = processor.merged_docs[0] if processor.merged_docs else None
+        self.placements = placements
+        self.container_size = container_size
+        self.preview_button.config(state=tk.NORMAL)
+        self.status_var.set(f"文件已保存至: {output_path}")
+        
     def start_processing(self):
         if not self.input_files:
             messagebox.showwarning("警告", "请至少选择一个DXF文件")
@@ -207,47 +482,70 @@ class DXFMergeGUI:
             
         # 在后台线程中处理
         self.process_button.config(state=tk.DISABLED)
-        self.progress.start()
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress.config(mode='determinate', value=0)
         self.status_var.set("正在处理...")
+        self.cancel_event = threading.Event()
         
         thread = threading.Thread(target=self.process_files)
         thread.daemon = True
         thread.start()
         
+    def cancel_processing(self):
+        # 流程在处理完当前文件或图形后停止
+        self.cancel_event.set()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.status_var.set("正在取消...")
+        
     def process_files(self):
+        stage_names = {'parse': '正在读取DXF文件', 'stream_scan': '正在扫描DXF文件',
+                       'extents': '正在计算外包矩形', 'pack': '正在进行排样布局',
+                       'copy': '正在复制图形', 'save': '正在保存合并文件'}
         try:
-            # 创建处理器实例
+            # 创建处理器实例（ezdxf 在窗口显示后才导入，见 warm_up）
+            from dxf_processor import DXFProcessor
             processor = DXFProcessor()
-            
-            # 读取DXF文件
-            self.root.after(0, lambda: self.status_var.set("正在读取DXF文件..."))
-            if not processor.read_dxf_files(self.input_files):
-                raise Exception("读取DXF文件失败")
-                
-            # 计算外包矩形
-            self.root.after(0, lambda: self.status_var.set("正在计算外包矩形..."))
-            if not processor.calculate_bounding_boxes():
-                raise Exception("计算外包矩形失败")
-                
-            # 排样布局
             container_width = self.container_width_var.get()
             container_height = self.container_height_var.get()
             gap_size = self.gap_size_var.get()
-            
-            self.root.after(0, lambda: self.status_var.set("正在进行排样布局..."))
-            placements = processor.pack_rectangles(container_width, container_height, gap_size)
-            
-            # 创建合并文件
             output_path = self.output_path_var.get()
-            self.root.after(0, lambda: self.status_var.set("正在创建合并文件..."))
-            if not processor.create_merged_dxf(placements, output_path):
-                raise Exception("创建合并DXF文件失败")
+            output_mode = 'blocks' if self.use_blocks_var.get() else 'flatten'
+            
+            # 逐个读取进度事件更新进度条，界面更新限制为每个百分点（或阶段变化时）一次
+            result = None
+            shown = (None, -1)
+            for event in processor.iter_process(self.input_files, output_path, container_width,
+                                                container_height, gap_size,
+                                                quantities=self.input_quantities,
+                                                multi_sheet=self.multi_sheet_var.get(),
+                                                algorithm=self.algorithm_var.get(),
+                                                output_mode=output_mode,
+                                                cancel_event=self.cancel_event):
+                if event['event'] == 'finished':
+                    result = event
+                    break
+                percent = int(event['fraction'] * 100)
+                if (event['stage'], percent) == shown or self.cancel_event.is_set():
+                    continue
+                shown = (event['stage'], percent)
+                status = f"{stage_names.get(event['stage'], '正在处理')}... {event['done']}/{event['total']}"
+                self.root.after(0, lambda value=percent, text=status: (self.progress.config(value=value),
+                                                                        self.status_var.set(text)))
+            
+            if result['cancelled']:
+                self.root.after(0, lambda: self.status_var.set("处理已取消"))
+                return
+            if not result['ok']:
+                raise Exception(result['error'])
+            placements = result['placements']
                 
             self.output_path = output_path
+            self.merged_doc = processor.merged_docs[0] if processor.merged_docs else None
             self.placements = placements
             self.container_size = (container_width, container_height)
             
             # 启用预览按钮
+            self.root.after(0, lambda: self.progress.config(value=100))
             self.root.after(0, lambda: self.preview_button.config(state=tk.NORMAL))
             self.root.after(0, lambda: self.status_var.set(f"处理完成! 文件已保存至: {output_path}"))
             
@@ -257,12 +555,13 @@ class DXFMergeGUI:
             
         finally:
             self.root.after(0, lambda: self.process_button.config(state=tk.NORMAL))
-            self.root.after(0, lambda: self.progress.stop())
+            self.root.after(0, lambda: self.cancel_button.config(state=tk.DISABLED))
             
     def generate_preview(self):
         try:
             # 在后台线程中生成预览
             self.preview_button.config(state=tk.DISABLED)
+            self.progress.config(mode='indeterminate')
             self.progress.start()
             self.status_var.set("正在生成预览...")
             
@@ -278,22 +577,22 @@ class DXFMergeGUI:
             
     def create_previews(self):
         try:
-            # 生成排样预览图
+            # 同时生成排样预览图和带标注的结果预览图（直接使用内存中的合并文档）
             placement_preview = "placement_preview.png"
-            DXFRenderer.render_placements_to_image(
+            annotated_result_preview = "annotated_result_preview.png"
+            from dxf_renderer import DXFRenderer
+            if self.merged_doc is not None:
+                result_doc = self.merged_doc
+            else:
+                import ezdxf
+                result_doc = ezdxf.readfile(self.output_path)
+            DXFRenderer.render_previews(
                 self.placements,
                 self.container_size[0],
                 self.container_size[1],
-                placement_preview
-            )
-            
-            # 生成带标注的结果预览图
-            annotated_result_preview = "annotated_result_preview.png"
-            result_doc = ezdxf.readfile(self.output_path)
-            DXFRenderer.render_final_result_with_annotations(
-                result_doc, 
-                self.placements, 
-                annotated_result_preview
+                placement_preview,
+                [(result_doc, self.placements, annotated_result_preview)],
+                backend='thumbnails' if self.fast_preview_var.get() else 'matplotlib'
             )
             
             # 在主线程中更新界面
@@ -313,13 +612,12 @@ class DXFMergeGUI:
             # 加载并显示排样预览图
             if os.path.exists("placement_preview.png"):
                 self.layout_image = Image.open("placement_preview.png")
-                self.layout_scale = 1.0
+                self.live_view.clear()
                 self.display_image_on_canvas("layout")
             
             # 加载并显示带标注的结果预览图
             if os.path.exists("annotated_result_preview.png"):
                 self.result_image = Image.open("annotated_result_preview.png")
-                self.result_scale = 1.0
                 self.display_image_on_canvas("result")
                 
             self.status_var.set("预览图片已生成并显示")
@@ -327,87 +625,23 @@ class DXFMergeGUI:
             self.status_var.set(f"显示预览图片时出错: {str(e)}")
     
     def display_image_on_canvas(self, canvas_type):
-        if canvas_type == "layout" and self.layout_image:
-            # 调整图片大小
-            width, height = self.layout_image.size
-            
-            # 获取画布尺寸
-            canvas_width = self.layout_canvas.winfo_width()
-            canvas_height = self.layout_canvas.winfo_height()
-            
-            # 如果画布大小为0（窗口还未完全绘制），使用默认值
-            if canvas_width <= 1:
-                canvas_width = 350
-            if canvas_height <= 1:
-                canvas_height = 250
-            
-            # 计算自适应缩放比例
-            scale_x = (canvas_width - 20) / width
-            scale_y = (canvas_height - 20) / height
-            fit_scale = min(scale_x, scale_y)
-            
-            # 应用当前缩放因子
-            new_width = int(width * fit_scale * self.layout_scale)
-            new_height = int(height * fit_scale * self.layout_scale)
-            resized_img = self.layout_image.resize((new_width, new_height), Image.LANCZOS)
-            
-            # 转换为PhotoImage
-            self.layout_photo = ImageTk.PhotoImage(resized_img)
-            
-            # 在画布上显示图片
-            self.layout_canvas.delete("all")
-            x = canvas_width // 2
-            y = canvas_height // 2
-            self.layout_canvas.create_image(x, y, image=self.layout_photo, anchor=tk.CENTER)
-            
-        elif canvas_type == "result" and self.result_image:
-            # 调整图片大小
-            width, height = self.result_image.size
-            
-            # 获取画布尺寸
-            canvas_width = self.result_canvas.winfo_width()
-            canvas_height = self.result_canvas.winfo_height()
-            
-            # 如果画布大小为0（窗口还未完全绘制），使用默认值
-            if canvas_width <= 1:
-                canvas_width = 350
-            if canvas_height <= 1:
-                canvas_height = 250
-            
-            # 计算自适应缩放比例
-            scale_x = (canvas_width - 20) / width
-            scale_y = (canvas_height - 20) / height
-            fit_scale = min(scale_x, scale_y)
-            
-            # 应用当前缩放因子
-            new_width = int(width * fit_scale * self.result_scale)
-            new_height = int(height * fit_scale * self.result_scale)
-            resized_img = self.result_image.resize((new_width, new_height), Image.LANCZOS)
-            
-            # 转换为PhotoImage
-            self.result_photo = ImageTk.PhotoImage(resized_img)
-            
-            # 在画布上显示图片
-            self.result_canvas.delete("all")
-            x = canvas_width // 2
-            y = canvas_height // 2
-            self.result_canvas.create_image(x, y, image=self.result_photo, anchor=tk.CENTER)
+        # 构建图像金字塔并适应画布大小，之后缩放和拖动只重采样可见的图块
+        if canvas_type == "layout":
+            self.layout_view.set_image(self.layout_image)
+        elif canvas_type == "result":
+            self.result_view.set_image(self.result_image)
     
     def zoom_image(self, canvas_type, factor):
         if canvas_type == "layout":
-            self.layout_scale *= factor
-            self.display_image_on_canvas("layout")
+            self.layout_view.zoom_by(factor)
         elif canvas_type == "result":
-            self.result_scale *= factor
-            self.display_image_on_canvas("result")
+            self.result_view.zoom_by(factor)
     
     def reset_zoom(self, canvas_type):
         if canvas_type == "layout":
-            self.layout_scale = 1.0
-            self.display_image_on_canvas("layout")
+            self.layout_view.reset()
         elif canvas_type == "result":
-            self.result_scale = 1.0
-            self.display_image_on_canvas("result")
+            self.result_view.reset()
     
     def copy_to_clipboard(self, canvas_type):
         try:
@@ -451,33 +685,6 @@ class DXFMergeGUI:
             messagebox.showerror("错误", f"复制图片到剪贴板时出错:\n{str(e)}")
             self.status_var.set("复制图片失败")
     
-    def on_mouse_wheel(self, event, canvas_type):
-        # 处理鼠标滚轮事件进行缩放
-        # Windows系统使用event.delta，Linux/Mac使用Button-4和Button-5
-        if event.num == 4 or event.delta > 0:
-            self.zoom_image(canvas_type, 1.1)
-        elif event.num == 5 or event.delta < 0:
-            self.zoom_image(canvas_type, 0.9)
-    
-    def on_window_configure(self, event):
-        # 避免在初始化时重复调用
-        if not self.configure_has_been_called:
-            self.configure_has_been_called = True
-            return
-            
-        # 只有当事件源是主窗口时才刷新图片
-        if event.widget == self.root:
-            # 延迟执行以确保窗口大小已经稳定
-            self.root.after(100, self.refresh_images_on_resize)
-    
-    def refresh_images_on_resize(self):
-        # 当窗口大小改变时刷新图片显示
-        if self.layout_image or self.result_image:
-            if self.layout_image:
-                self.display_image_on_canvas("layout")
-            if self.result_image:
-                self.display_image_on_canvas("result")
-
     def save_image_as(self, canvas_type):
         try:
             # 获取要保存的图片
@@ -518,10 +725,19 @@ class DXFMergeGUI:
             messagebox.showerror("错误", f"保存图片时出错:\n{error_message}")
             self.status_var.set("保存图片失败")
     
+def warm_up():
+    """窗口显示后在后台导入 ezdxf 和处理模块，第一次处理时不再等待导入"""
+    try:
+        import dxf_processor  # noqa: F401
+    except Exception as e:
+        print(f"预先导入处理模块失败: {e}")
+
 def main():
     root = tk.Tk()
     app = DXFMergeGUI(root)
+    root.after(100, lambda: threading.Thread(target=warm_up, daemon=True).start())
     root.mainloop()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
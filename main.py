@@ -1,15 +1,127 @@
 from dxf_processor import DXFProcessor
-from dxf_renderer import DXFRenderer
-import ezdxf
-import sys
+from dxf_batch import run_manifest, split_quantity
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
 import os
+import sys
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DXF文件合并工具")
+    parser.add_argument("paths", nargs="*",
+                        help="输入DXF文件，最后一个参数为输出文件；输入文件可写成 文件:数量 指定排样数量")
+    parser.add_argument("--container", type=float, nargs=2, default=[100.0, 100.0], metavar=("W", "H"),
+                        help="容器尺寸（mm），默认 100 100")
+    parser.add_argument("--gap", type=float, default=8.0,
+                        help="图形之间的间隙（mm），默认 8")
+    parser.add_argument("--manifest", default=None,
+                        help="批处理作业清单（.json 或 .csv），每个作业有各自的输入、容器、间隙和输出路径")
+    parser.add_argument("--watch", default=None, metavar="DIR",
+                        help="监视目录中的DXF文件，文件变化时增量重新合并到输出文件（唯一的位置参数为输出文件）")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="监视模式的轮询间隔（秒），默认 1")
+    parser.add_argument("--serve", default=None, metavar="[HOST:]PORT",
+                        help="以本地HTTP服务方式运行（POST /merge 合并，GET /metrics 查看指标）")
+    parser.add_argument("--cache-mb", type=int, default=256,
+                        help="服务模式下每个工作进程的文档缓存上限（按源文件大小，MB），默认 256")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="并行读取DXF文件的进程数（默认使用全部CPU核心，1 表示串行）")
+    parser.add_argument("--extents", choices=["ezdxf", "exact", "hull"], default="ezdxf",
+                        help="外包矩形计算方式：ezdxf（默认）、exact（向量化精确计算）、hull（向量化控制点估算）")
+    parser.add_argument("--stream", action="store_true",
+                        help="流式扫描计算外包矩形，不在内存中构建完整文档（适合超大文件）")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="低内存模式：读取后立即把图形转换为紧凑的数组表示并释放完整文档，合并文件从数组直接写出")
+    parser.add_argument("--multi-sheet", action="store_true",
+                        help="一个容器放不下时溢出到多个版面，而不是超出容器")
+    parser.add_argument("--sheet-output", choices=["offset", "files"], default="offset",
+                        help="多版面输出方式：offset 同一文件中偏移排列（默认），files 每个版面一个文件")
+    parser.add_argument("--algorithm", choices=["grid", "maxrects", "skyline", "shape"], default="grid",
+                        help="排样算法：grid 网格（默认）、maxrects 最大空闲矩形、skyline 最低水平线、"
+                             "shape 按图形轮廓的真实外形排样")
+    parser.add_argument("--output-mode", choices=["flatten", "blocks", "stream"], default="flatten",
+                        help="合并文件输出方式：flatten 复制全部实体（默认），blocks 每个源文件一个块定义、每个图形一个块引用，"
+                             "stream 与 flatten 相同但逐个图形写入文件，不在内存中保留合并文档")
+    parser.add_argument("--no-preview", action="store_true",
+                        help="只生成合并文件，不生成预览图（不加载渲染模块，启动更快）")
+    parser.add_argument("--preview-backend", choices=["matplotlib", "raster", "thumbnails"], default="matplotlib",
+                        help="结果预览的渲染方式：matplotlib（默认）、raster（NumPy/Pillow 直接栅格化，快得多）"
+                             "或 thumbnails（按排样位置拼贴缓存的单个图形缩略图）")
+    parser.add_argument("--progress", action="store_true",
+                        help="显示单行进度（读取、外包矩形、排样、复制、保存），不逐个打印文件信息；按 Ctrl+C 取消")
+    parser.add_argument("--profile", default=None, metavar="REPORT.json",
+                        help="将各阶段耗时、每个文件的耗时、计数器和内存峰值写入JSON报告；"
+                             "设置环境变量 PYTHONTRACEMALLOC=1 时报告中还包括 Python 堆的峰值（会明显变慢）")
+    parser.add_argument("--index", default=None,
+                        help="元数据索引文件路径，命中索引的文件无需解析即可排样")
+    return parser.parse_args(argv)
 
 def main():
+    args = parse_args()
+    if args.manifest:
+        # 批处理模式：命令行中的容器、间隙等参数作为清单的默认值
+        defaults = {
+            'container': tuple(args.container),
+            'gap': args.gap,
+            'algorithm': args.algorithm,
+            'multi_sheet': args.multi_sheet,
+            'sheet_output': args.sheet_output,
+            'output_mode': args.output_mode,
+        }
+        summary = run_manifest(args.manifest, workers=args.workers, defaults=defaults,
+                               extents_mode=args.extents)
+        if args.profile:
+            with open(args.profile, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            print(f"性能报告已保存至: {args.profile}")
+        return
+    if args.serve:
+        # 服务和监视模式只在使用时导入，普通合并不需要
+        from dxf_service import MergeService, parse_address
+        host, port = parse_address(args.serve)
+        defaults = {
+            'container': tuple(args.container),
+            'gap': args.gap,
+            'algorithm': args.algorithm,
+            'multi_sheet': args.multi_sheet,
+            'sheet_output': args.sheet_output,
+            'output_mode': args.output_mode,
+        }
+        MergeService(host, port, workers=args.workers, cache_bytes=args.cache_mb * 1024 * 1024,
+                     defaults=defaults).run()
+        return
+    if args.watch:
+        from dxf_watch import DXFWatcher
+        output_file = args.paths[-1] if args.paths else os.path.join(args.watch, "merged_result.dxf")
+        watcher = DXFWatcher(args.watch, output_file, args.container[0], args.container[1], args.gap,
+                             algorithm=args.algorithm, multi_sheet=args.multi_sheet,
+                             sheet_output=args.sheet_output, output_mode=args.output_mode,
+                             extents_mode=args.extents, interval=args.interval)
+        watcher.processor.workers = args.workers
+        watcher.run()
+        return
+    processor = DXFProcessor(index_path=args.index, low_memory=args.low_memory)
+    try:
+        run(args, processor)
+    finally:
+        if args.profile:
+            try:
+                processor.stats.save(args.profile)
+                print(f"性能报告已保存至: {args.profile}")
+            except Exception as e:
+                print(f"保存性能报告失败: {e}")
+
+def run(args, processor):
+    
     # 检查是否提供了命令行参数
-    if len(sys.argv) > 1:
+    if args.paths:
         # 命令行模式
-        input_files = sys.argv[1:-1]  # 除最后一个外的所有参数都是输入文件
-        output_file = sys.argv[-1]    # 最后一个参数是输出文件
+        inputs = [split_quantity(arg) for arg in args.paths[:-1]]  # 除最后一个外的所有参数都是输入文件
+        input_files = [path for path, _ in inputs]
+        quantities = [count for _, count in inputs]
+        output_file = args.paths[-1]   # 最后一个参数是输出文件
     else:
         # 默认模式
         input_files = [
@@ -19,27 +131,38 @@ def main():
             # 添加你的DXF文件路径
         ]
         output_file = "merged_result.dxf"
+        quantities = None
     
-    container_size = (100.0, 100.0)  # 10cm x 10cm
-    generate_preview = True  # 是否生成预览图像
-    gap_size = 8.0  # 图形之间的间隙，单位mm
+    container_size = tuple(args.container)  # 默认 10cm x 10cm
+    generate_preview = not args.no_preview  # 是否生成预览图像
+    gap_size = args.gap  # 图形之间的间隙，单位mm
     
-    # 创建处理器实例
-    processor = DXFProcessor()
+    if args.progress:
+        placements = run_with_progress(args, processor, input_files, quantities, output_file)
+        if placements is not None and generate_preview:
+            generate_previews(args, processor, placements, container_size)
+        return
+    
+    # 流式写出时源文件也推迟到写出时才解析，否则读取阶段就会载入全部文档；
+    # 流式扫描处理不了的文件（如含块引用）会改为完整读取，与 flatten 一样能合并
+    streaming = args.stream or args.output_mode == 'stream'
     
     # 1. 读取DXF文件
     print("步骤1: 读取DXF文件...")
-    if not processor.read_dxf_files(input_files):
+    if not processor.read_dxf_files(input_files, workers=args.workers, defer_load=streaming,
+                                    quantities=quantities):
         return
     
     # 2. 计算外包矩形
     print("\n步骤2: 计算外包矩形...")
-    if not processor.calculate_bounding_boxes():
+    if not processor.calculate_bounding_boxes(extents_mode=args.extents, streaming=streaming):
         return
     
     # 3. 排样布局
     print("\n步骤3: 排样布局...")
-    placements = processor.pack_rectangles(container_size[0], container_size[1], gap_size)
+    placements = processor.pack_rectangles(container_size[0], container_size[1], gap_size,
+                                           multi_sheet=args.multi_sheet,
+                                           algorithm=args.algorithm)
     
     # 显示排样结果
     print("\n排样结果:")
@@ -48,36 +171,94 @@ def main():
         pos = placement['position']
         rotation = placement.get('rotation', 0)
         print(f"图形 {i+1}: {box['doc_info']['name']}")
+        if args.multi_sheet:
+            print(f"  版面: {placement.get('sheet', 0) + 1}")
         print(f"  位置: ({pos[0]:.2f}, {pos[1]:.2f})")
         print(f"  尺寸: {box['width']:.2f} x {box['height']:.2f}")
         if rotation != 0:
             print(f"  旋转: {rotation}度")
     
-    # 4. 生成排样结果预览图
-    if generate_preview:
-        print("\n步骤4: 生成排样预览图...")
-        DXFRenderer.render_placements_to_image(
-            placements, 
-            container_size[0], 
-            container_size[1], 
-            "placement_preview.png"
-        )
-    
-    # 5. 创建合并文件
-    print("\n步骤5: 创建合并文件...")
-    if processor.create_merged_dxf(placements, output_file):
-        print(f"处理完成! 文件已保存至: {output_file}")
+    # 4. 创建合并文件
+    print("\n步骤4: 创建合并文件...")
+    if processor.create_merged_dxf(placements, output_file, container_size[0], container_size[1],
+                                   sheet_output=args.sheet_output, output_mode=args.output_mode):
+        print(f"处理完成! 文件已保存至: {', '.join(processor.output_paths)}")
         
-        # 6. 生成最终结果预览图
+        # 5. 同时生成排样预览图和最终结果预览图（直接使用内存中的合并文档）
         if generate_preview:
-            print("\n步骤6: 生成最终结果预览图...")
-            try:
-                result_doc = ezdxf.readfile(output_file)
-                DXFRenderer.render_final_result_with_annotations(result_doc, placements, "annotated_result_preview.png")
-            except Exception as e:
-                print(f"生成带标注的最终结果预览图失败: {e}")
+            generate_previews(args, processor, placements, container_size)
     else:
         print("处理失败!")
 
+def run_with_progress(args, processor, input_files, quantities, output_file):
+    """用 iter_process 执行步骤1~4，在 stderr 上显示一行进度；按 Ctrl+C 取消
+    
+    各阶段的逐个文件输出不再打印，失败时只显示最后几行。返回排样结果，失败或取消时返回None。
+    """
+    stage_names = {'parse': '读取文件', 'stream_scan': '流式扫描', 'extents': '计算外包矩形',
+                   'pack': '排样布局', 'copy': '复制图形', 'save': '保存文件'}
+    log = io.StringIO()
+    events = processor.iter_process(input_files, output_file, args.container[0], args.container[1], args.gap,
+                                    quantities=quantities, workers=args.workers, extents_mode=args.extents,
+                                    streaming=args.stream, multi_sheet=args.multi_sheet,
+                                    algorithm=args.algorithm, sheet_output=args.sheet_output,
+                                    output_mode=args.output_mode)
+    result = None
+    with contextlib.redirect_stdout(log):
+        while result is None:
+            try:
+                for event in events:
+                    if event['event'] == 'finished':
+                        result = event
+                        break
+                    name = os.path.basename(event['file_path']) if event['file_path'] else ''
+                    line = (f"[{event['fraction'] * 100:5.1f}%] {stage_names.get(event['stage'], event['stage'])} "
+                            f"{event['done']}/{event['total']} {name}")
+                    sys.stderr.write('\r' + line[:79].ljust(79))
+                    sys.stderr.flush()
+            except KeyboardInterrupt:
+                # 请求取消后继续读取事件，直到流程在当前文件或图形处理完后停止
+                processor.cancel()
+    sys.stderr.write('\n')
+    
+    if result['cancelled']:
+        print("处理已取消")
+        return None
+    if not result['ok']:
+        lines = log.getvalue().strip().splitlines()
+        print("\n".join(lines[-5:]))
+        print(f"处理失败! {result['error']}")
+        return None
+    print(f"处理完成! {len(result['placements'])} 个图形，文件已保存至: {', '.join(processor.output_paths)}")
+    return result['placements']
+
+def generate_previews(args, processor, placements, container_size):
+    print("\n步骤5: 生成预览图...")
+    try:
+        # 渲染模块（及其导入的 matplotlib）只在生成预览时加载
+        from dxf_renderer import DXFRenderer
+        backend = args.preview_backend
+        docs = processor.merged_docs
+        if not docs:
+            # 流式写出时没有保留合并文档，结果预览按排样结果拼贴缩略图
+            backend = 'thumbnails'
+            docs = [None] * len(processor.output_paths)
+        if len(docs) == 1:
+            results = [(docs[0], placements, "annotated_result_preview.png")]
+        else:
+            # 每个版面单独输出时，逐个生成预览，标注坐标不再叠加版面原点
+            results = []
+            for sheet, doc in enumerate(docs):
+                sheet_placements = [dict(p, sheet_origin=(0.0, 0.0)) for p in placements
+                                    if p.get('sheet', 0) == sheet]
+                results.append((doc, sheet_placements, f"annotated_result_preview_sheet{sheet + 1}.png"))
+        with processor.stats.stage('render_previews'):
+            DXFRenderer.render_previews(placements, container_size[0], container_size[1],
+                                        "placement_preview.png", results,
+                                        backend=backend)
+    except Exception as e:
+        print(f"生成预览图失败: {e}")
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file